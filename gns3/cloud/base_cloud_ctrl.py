@@ -26,7 +26,10 @@ from collections import namedtuple
 import hashlib
 import os
 import logging
-from io import StringIO, BytesIO
+import threading
+import json
+import tempfile
+from io import StringIO
 
 from libcloud.compute.base import NodeAuthSSHKey
 from libcloud.storage.types import ContainerAlreadyExistsError, ContainerDoesNotExistError, ObjectDoesNotExistError
@@ -34,12 +37,104 @@ from libcloud.storage.types import ContainerAlreadyExistsError, ContainerDoesNot
 from .exceptions import ItemNotFound, KeyPairExists, MethodNotAllowed
 from .exceptions import OverLimit, BadRequest, ServiceUnavailable
 from .exceptions import Unauthorized, ApiError
+from .transfer_scheduler import ProgressFile, TransferCancelled
+from .segmented_transfer import SEGMENT_SIZE, SegmentedUpload, SegmentedDownload, blob_segments_name
+from .project_sync import SYNC_MANIFEST_SUFFIX, block_name
 
 
 KeyPair = namedtuple("KeyPair", ['name'], verbose=False)
 log = logging.getLogger(__name__)
 
 
+def project_manifest_name(project_object_name):
+    """
+    Return the name of the object mapping the images of a project to their MD5.
+    """
+
+    if project_object_name.endswith('.zip'):
+        project_object_name = project_object_name[:-4]
+    elif project_object_name.endswith(SYNC_MANIFEST_SUFFIX):
+        project_object_name = project_object_name[:-len(SYNC_MANIFEST_SUFFIX)]
+    return project_object_name + '.images.json'
+
+# files are hashed by chunks of this size, so images are never read in memory at once
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# path -> (size, mtime, md5), files which have not changed are not hashed again
+_hash_cache = {}
+_hash_cache_lock = threading.Lock()
+# file the cache is saved to, so it survives a restart
+_hash_cache_path = None
+
+
+def load_hash_cache(path):
+    """
+    Loads the MD5 saved in a file, the cache is then saved
+    to this file each time a file is hashed.
+
+    :param path: path of the cache file
+    """
+
+    global _hash_cache_path
+    with _hash_cache_lock:
+        if path == _hash_cache_path:
+            return
+        _hash_cache_path = path
+        try:
+            with open(path) as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            return
+        for file_path, entry in entries.items():
+            # the files deleted since are forgotten
+            if file_path not in _hash_cache and os.path.isfile(file_path):
+                _hash_cache[file_path] = tuple(entry)
+
+
+def _save_hash_cache():
+    """
+    Saves the cache, must be called with the cache lock held.
+    """
+
+    if _hash_cache_path is None:
+        return
+    try:
+        os.makedirs(os.path.dirname(_hash_cache_path), exist_ok=True)
+        with open(_hash_cache_path + '.tmp', 'w') as f:
+            json.dump(_hash_cache, f)
+        os.replace(_hash_cache_path + '.tmp', _hash_cache_path)
+    except OSError as e:
+        log.warning("could not save the file hashes to {}: {}".format(_hash_cache_path, e))
+
+
+def md5_file(file_path):
+    """
+    Returns the MD5 hex digest of a file, hashed by chunks.
+    The digest is cached until the size or modification time of the file changes.
+
+    :param file_path: path to the file
+    :return: MD5 hex digest
+    """
+
+    file_path = os.path.abspath(file_path)
+    stat = os.stat(file_path)
+    with _hash_cache_lock:
+        cached = _hash_cache.get(file_path)
+    if cached is not None and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    md5 = hashlib.md5()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b''):
+            md5.update(chunk)
+    digest = md5.hexdigest()
+
+    with _hash_cache_lock:
+        _hash_cache[file_path] = (stat.st_size, stat.st_mtime_ns, digest)
+        _save_hash_cache()
+    return digest
+
+
 def parse_exception(exception):
     """
     Parse the exception to separate the HTTP status code from the text.
@@ -64,6 +159,73 @@ def parse_exception(exception):
     return status, error_text
 
 
+class ContainerIndex(object):
+
+    """
+    Names of the objects in a storage container, listed once and then kept
+    up to date with the uploads and deletions made through the controller.
+    """
+
+    def __init__(self, container):
+        self.container = container
+        self._lock = threading.Lock()
+        self._names = set(obj.name for obj in container.list_objects())
+        # object name -> content of its .md5 object
+        self._hashes = {}
+
+    def __contains__(self, name):
+        with self._lock:
+            return name in self._names
+
+    def names(self, prefix=''):
+        """ Return the sorted object names starting with prefix. """
+
+        with self._lock:
+            return sorted(name for name in self._names if name.startswith(prefix))
+
+    def add(self, name, md5=None):
+        """ Record an uploaded object, and its hash if known. """
+
+        with self._lock:
+            self._names.add(name)
+            if md5 is not None:
+                self._hashes[name] = md5
+            else:
+                self._hashes.pop(name, None)
+
+    def discard(self, name):
+        """ Forget a deleted object. """
+
+        with self._lock:
+            self._names.discard(name)
+            self._hashes.pop(name, None)
+
+    def cloud_hash(self, name, storage_driver=None):
+        """
+        Return the MD5 stored along an object, None if there is none.
+        The .md5 object is only downloaded the first time.
+
+        :param storage_driver: storage driver session to download it with, instead of the one of the container
+        """
+
+        with self._lock:
+            if name in self._hashes:
+                return self._hashes[name]
+            if name + '.md5' not in self._names:
+                return None
+
+        if storage_driver is None:
+            storage_driver = self.container.driver
+        hash_object = storage_driver.get_object(self.container.name, name + '.md5')
+        cloud_object_hash = ''
+        for chunk in storage_driver.download_object_as_stream(hash_object):
+            cloud_object_hash += chunk.decode('utf8')
+
+        with self._lock:
+            self._hashes[name] = cloud_object_hash
+        return cloud_object_hash
+
+
 class BaseCloudCtrl(object):
 
     """ Base class for interacting with a cloud provider API. """
@@ -80,10 +242,16 @@ class BaseCloudCtrl(object):
 
     GNS3_CONTAINER_NAME = 'GNS3'
 
+    # set by providers implementing put_manifest()
+    SEGMENTED_TRANSFERS = False
+
     def __init__(self, username, api_key):
         self.username = username
         self.api_key = api_key
 
+        self._container_index = None
+        self._container_index_lock = threading.Lock()
+
     def _handle_exception(self, status, error_text, response_overrides=None):
         """ Raise an exception based on the HTTP status. """
 
@@ -216,39 +384,194 @@ class BaseCloudCtrl(object):
 
         return self.driver.list_key_pairs()
 
-    def upload_file(self, file_path, cloud_object_name):
+    def container_index(self, create=False):
         """
-        Uploads file to cloud storage (if it is not identical to a file already in cloud storage).
+        Return the index of the GNS3 container, the container is listed
+        only the first time.
+        :param create: create the container if it does not exist
+        :return: ContainerIndex instance
+        """
+
+        with self._container_index_lock:
+            if self._container_index is None:
+                if create:
+                    try:
+                        gns3_container = self.storage_driver.create_container(self.GNS3_CONTAINER_NAME)
+                    except ContainerAlreadyExistsError:
+                        gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
+                else:
+                    gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
+                self._container_index = ContainerIndex(gns3_container)
+            return self._container_index
+
+    def new_storage_driver(self):
+        """
+        Return a storage driver session for a transfer thread. Providers
+        whose storage driver is not thread safe return a new instance.
+        """
+
+        return self.storage_driver
+
+    def put_manifest(self, storage_driver, container, object_name, segments_prefix):
+        """
+        Create an object served as the concatenation of the objects starting with segments_prefix.
+        """
+
+        raise NotImplementedError
+
+    def segmented_upload(self, file_path, cloud_object_name, journal_dir, segment_size=SEGMENT_SIZE):
+        """
+        Prepare the upload of an image, its content is stored once by MD5 and
+        the name is a manifest object pointing to it.
         :param file_path: path to file to upload
         :param cloud_object_name: name of file saved in cloud storage
-        :return: True if file was uploaded, False if it was skipped because it already existed and was identical
+        :param journal_dir: directory of the journals used to resume uploads
+        :param segment_size: size of the segments
+        :return: SegmentedUpload instance, or None if the file must be uploaded with upload_file()
         """
-        try:
-            gns3_container = self.storage_driver.create_container(self.GNS3_CONTAINER_NAME)
-        except ContainerAlreadyExistsError:
-            gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
 
-        with open(file_path, 'rb') as file:
-            local_file_hash = hashlib.md5(file.read()).hexdigest()
+        if not self.SEGMENTED_TRANSFERS or not cloud_object_name.startswith('images/'):
+            return None
+        index = self.container_index(create=True)
+        local_file_hash = md5_file(file_path)
+        if cloud_object_name in index and index.cloud_hash(cloud_object_name) == local_file_hash:
+            return None
+        # the content may already be stored, under another name or for another project
+        complete = blob_segments_name(local_file_hash) in index
+        return SegmentedUpload(self, file_path, cloud_object_name, local_file_hash, journal_dir, segment_size,
+                               complete=complete)
+
+    def segmented_download(self, file_name, destination, file_hash=None):
+        """
+        Prepare the download of an image stored by MD5.
+        :param file_name: name of file in cloud storage to download
+        :param destination: local path to save file to
+        :param file_hash: MD5 of the file, read from its .md5 object if not given
+        :return: SegmentedDownload instance, or None if the file must be downloaded with download_file()
+        """
+
+        index = self.container_index()
+        if file_hash is None:
+            file_hash = index.cloud_hash(file_name)
+        if file_hash is None or blob_segments_name(file_hash) not in index:
+            return None
+        if os.path.isfile(destination) and md5_file(destination) == file_hash:
+            return None
+
+        segments = ''
+        for chunk in index.container.get_object(blob_segments_name(file_hash)).as_stream():
+            segments += chunk.decode('utf8')
+        return SegmentedDownload(self, file_name, destination, json.loads(segments))
+
+    def upload_project_manifest(self, project_object_name, images):
+        """
+        Store the images used by a project.
+        :param project_object_name: name of the project zip file or sync manifest in cloud storage
+        :param images: dictionary where keys are names of images in cloud storage and values their MD5
+        """
+
+        index = self.container_index(create=True)
+        name = project_manifest_name(project_object_name)
+        self.storage_driver.upload_object_via_stream(StringIO(json.dumps(images)), index.container, name)
+        index.add(name)
+
+    def project_manifest(self, project_object_name):
+        """
+        Return the images used by a project, as stored by upload_project_manifest(),
+        or None for projects exported without manifest.
+        """
+
+        return self._read_json(project_manifest_name(project_object_name))
 
-            cloud_hash_name = cloud_object_name + '.md5'
-            cloud_objects = [obj.name for obj in gns3_container.list_objects()]
+    def project_sync_manifest(self, project_object_name):
+        """
+        Return the sync manifest of a project exported incrementally (see project_sync).
+        """
 
-            # if the file and its hash are in object storage, and the local and storage file hashes match
-            # do not upload the file, otherwise upload it
-            if cloud_object_name in cloud_objects and cloud_hash_name in cloud_objects:
-                hash_object = gns3_container.get_object(cloud_hash_name)
-                cloud_object_hash = ''
-                for chunk in hash_object.as_stream():
-                    cloud_object_hash += chunk.decode('utf8')
+        return self._read_json(project_object_name)
 
-                if cloud_object_hash == local_file_hash:
-                    return False
+    def _read_json(self, name):
+        """ Return the content of a JSON object, None if there is no such object. """
+
+        index = self.container_index()
+        if name not in index:
+            return None
+        content = ''
+        for chunk in index.container.get_object(name).as_stream():
+            content += chunk.decode('utf8')
+        return json.loads(content)
+
+    def delete_project(self, project_object_name):
+        """
+        Delete a project, and the blocks of its files no other project refers to.
+
+        The stored image contents are never deleted: each one is referred to by
+        the image names it was uploaded under, and image names are never deleted
+        since projects exported without manifest, images uploaded from the
+        preferences and cloud instances use them by name. The blocks of a
+        project exported incrementally are kept as long as another sync
+        manifest refers to them.
+        """
+
+        blocks = set()
+        if project_object_name.endswith(SYNC_MANIFEST_SUFFIX):
+            for entry in self.project_sync_manifest(project_object_name)["files"].values():
+                blocks.update(entry["blocks"])
+        self.delete_file(project_object_name)
+        # the zip and the sync manifest of a project share its images manifest
+        base_name = project_manifest_name(project_object_name)[:-len('.images.json')]
+        index = self.container_index()
+        if base_name + '.zip' not in index and base_name + SYNC_MANIFEST_SUFFIX not in index:
+            self.delete_file(project_manifest_name(project_object_name))
+
+        if blocks:
+            self._collect_blocks(blocks)
+
+    def _collect_blocks(self, hashes):
+        """
+        Delete the project file blocks no sync manifest refers to anymore.
+        """
 
-            file.seek(0)
-            self.storage_driver.upload_object_via_stream(file, gns3_container, cloud_object_name)
-            self.storage_driver.upload_object_via_stream(StringIO(local_file_hash), gns3_container, cloud_hash_name)
-            return True
+        for name in self.container_index().names('projects/'):
+            if name.endswith(SYNC_MANIFEST_SUFFIX):
+                for entry in self.project_sync_manifest(name)["files"].values():
+                    hashes.difference_update(entry["blocks"])
+
+        log.info("Deleting {} unused project file blocks".format(len(hashes)))
+        for block_hash in hashes:
+            self._delete_object(block_name(block_hash))
+
+    def upload_file(self, file_path, cloud_object_name, storage_driver=None, progress=None, cancelled=None):
+        """
+        Uploads file to cloud storage (if it is not identical to a file already in cloud storage).
+        :param file_path: path to file to upload
+        :param cloud_object_name: name of file saved in cloud storage
+        :param storage_driver: storage driver session to use instead of self.storage_driver
+        :param progress: callable called with the number of bytes uploaded
+        :param cancelled: threading.Event aborting the upload when set
+        :return: True if file was uploaded, False if it was skipped because it already existed and was identical
+        """
+        if storage_driver is None:
+            storage_driver = self.storage_driver
+        index = self.container_index(create=True)
+        local_file_hash = md5_file(file_path)
+
+        # if the file and its hash are in object storage, and the local and storage file hashes match
+        # do not upload the file, otherwise upload it
+        if cloud_object_name in index and index.cloud_hash(cloud_object_name, storage_driver) == local_file_hash:
+            if progress is not None:
+                progress(os.path.getsize(file_path))
+            return False
+
+        with open(file_path, 'rb') as file:
+            if progress is not None:
+                file = ProgressFile(file, progress, cancelled or threading.Event())
+            storage_driver.upload_object_via_stream(file, index.container, cloud_object_name)
+        storage_driver.upload_object_via_stream(StringIO(local_file_hash), index.container,
+                                                cloud_object_name + '.md5')
+        index.add(cloud_object_name, local_file_hash)
+        index.add(cloud_object_name + '.md5')
+        return True
 
     def list_projects(self):
         """
@@ -257,66 +580,124 @@ class BaseCloudCtrl(object):
         """
 
         try:
-            gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
             projects = {
-                obj.name.replace('projects/', '').replace('.zip', ''): obj.name
-                for obj in gns3_container.list_objects()
-                if obj.name.startswith('projects/') and obj.name[-4:] == '.zip'
+                name.replace('projects/', '').replace('.zip', ''): name
+                for name in self.container_index().names('projects/')
+                if name[-4:] == '.zip'
             }
+            # projects exported incrementally, their last export replaces any zipped one
+            projects.update({
+                name[len('projects/'):-len(SYNC_MANIFEST_SUFFIX)]: name
+                for name in self.container_index().names('projects/')
+                if name.endswith(SYNC_MANIFEST_SUFFIX)
+            })
             return projects
         except ContainerDoesNotExistError:
             return []
 
-    def download_file(self, file_name, destination=None):
+    def download_file(self, file_name, destination=None, storage_driver=None, progress=None, cancelled=None):
         """
         Downloads file from cloud storage. If a file exists at destination, and it is identical to the file in cloud
         storage, it is not downloaded.
         :param file_name: name of file in cloud storage to download
         :param destination: local path to save file to (if None, returns file contents as a file-like object)
-        :return: A file-like object if file contents are returned, or None if file is saved to filesystem
+        :param storage_driver: storage driver session to use instead of self.storage_driver
+        :param progress: callable called with the number of bytes downloaded
+        :param cancelled: threading.Event aborting the download when set
+        :return: A file-like object (a temporary file) if file contents are returned,
+        or None if file is saved to filesystem
         """
 
-        gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
+        if storage_driver is None:
+            storage_driver = self.storage_driver
+        gns3_container = storage_driver.get_container(self.GNS3_CONTAINER_NAME)
         storage_object = gns3_container.get_object(file_name)
+        cloud_object_hash = self._read_hash(gns3_container, file_name)
+
+        if destination is None:
+            # not a SpooledTemporaryFile, zipfile needs seekable() which it lacks before Python 3.11
+            contents = tempfile.TemporaryFile()
+            try:
+                self._stream_object(storage_object, contents, file_name, cloud_object_hash, progress, cancelled)
+            except Exception:
+                contents.close()
+                raise
+            contents.seek(0)
+            return contents
+
+        # if a file exists at destination and its hash matches that of the
+        # file in cloud storage, don't download it
+        if os.path.isfile(destination) and md5_file(destination) == cloud_object_hash:
+            if progress is not None:
+                progress(storage_object.size)
+            return
+
+        # the file is downloaded next to the destination then renamed, so an
+        # interrupted download never leaves a truncated file at destination
+        fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(destination)),
+                                         prefix=os.path.basename(destination) + '.',
+                                         suffix='.download')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                self._stream_object(storage_object, f, file_name, cloud_object_hash, progress, cancelled)
+            os.replace(temp_path, destination)
+        except Exception:
+            os.remove(temp_path)
+            raise
 
-        if destination is not None:
-            if os.path.isfile(destination):
-                # if a file exists at destination and its hash matches that of the
-                # file in cloud storage, don't download it
-                with open(destination, 'rb') as f:
-                    local_file_hash = hashlib.md5(f.read()).hexdigest()
-
-                    hash_object = gns3_container.get_object(file_name + '.md5')
-                    cloud_object_hash = ''
-                    for chunk in hash_object.as_stream():
-                        cloud_object_hash += chunk.decode('utf8')
-
-                    if local_file_hash == cloud_object_hash:
-                        return
+    def _read_hash(self, gns3_container, file_name):
+        """ Return the content of the .md5 object of a file, None if it has none. """
 
-            storage_object.download(destination)
-        else:
-            contents = b''
-
-            for chunk in storage_object.as_stream():
-                contents += chunk
+        try:
+            hash_object = gns3_container.get_object(file_name + '.md5')
+        except ObjectDoesNotExistError:
+            return None
+        cloud_object_hash = ''
+        for chunk in hash_object.as_stream():
+            cloud_object_hash += chunk.decode('utf8')
+        return cloud_object_hash
 
-            return BytesIO(contents)
+    def _stream_object(self, storage_object, file, file_name, cloud_object_hash, progress=None, cancelled=None):
+        """
+        Writes an object to a file by chunks, checking its MD5 on the way.
+        """
 
-    def find_storage_image_names(self, images_to_find):
+        md5 = hashlib.md5()
+        for chunk in storage_object.as_stream():
+            if cancelled is not None and cancelled.is_set():
+                raise TransferCancelled()
+            file.write(chunk)
+            md5.update(chunk)
+            if progress is not None:
+                progress(len(chunk))
+        if cloud_object_hash is not None and md5.hexdigest() != cloud_object_hash:
+            raise ApiError("MD5 mismatch for {} downloaded from cloud storage".format(file_name))
+
+    def find_storage_image_names(self, images_to_find, manifest=None):
         """
         Maps names of image files to their full name in cloud storage
         :param images_to_find: list of image names to find
+        :param manifest: images of the project (see project_manifest()), looked up first
         :return: A dictionary where keys are image names, and values are the corresponding names of
         the files in cloud storage
         """
-        gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
-        images_in_storage = [obj.name for obj in gns3_container.list_objects() if obj.name.startswith('images/')]
+        index = self.container_index()
+        project_images = self._names_by_basename(manifest or [])
+        images_in_storage = self._names_by_basename(index.names('images/'))
 
         images = {}
         for image_name in images_to_find:
-            images_with_same_name =\
-                list(filter(lambda storage_image_name: storage_image_name.endswith(image_name), images_in_storage))
+            basename = image_name.rsplit('/', 1)[-1]
+            images_with_same_name = [name for name in project_images.get(basename, []) if name.endswith(image_name)]
+            if len(images_with_same_name) != 1:
+                images_with_same_name = [name for name in images_in_storage.get(basename, []) if name.endswith(image_name)]
+
+            if len(images_with_same_name) > 1:
+                # the same image stored under several paths is not ambiguous,
+                # images without hash cannot be told apart
+                hashes = set(index.cloud_hash(name) for name in images_with_same_name)
+                if len(hashes) == 1 and None not in hashes:
+                    images_with_same_name = images_with_same_name[:1]
 
             if len(images_with_same_name) == 1:
                 images[image_name] = images_with_same_name[0]
@@ -325,17 +706,29 @@ class BaseCloudCtrl(object):
 
         return images
 
+    @staticmethod
+    def _names_by_basename(names):
+        names_by_basename = {}
+        for name in names:
+            names_by_basename.setdefault(name.rsplit('/', 1)[-1], []).append(name)
+        return names_by_basename
+
     def delete_file(self, file_name):
-        gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
+        self._delete_object(file_name)
+        self._delete_object(file_name + '.md5')
+
+    def _delete_object(self, object_name):
+        # the container is not listed just to delete a file, the index is only updated if already loaded
+        index = self._container_index
+        if index is not None:
+            gns3_container = index.container
+        else:
+            gns3_container = self.storage_driver.get_container(self.GNS3_CONTAINER_NAME)
 
         try:
-            object_to_delete = gns3_container.get_object(file_name)
+            object_to_delete = gns3_container.get_object(object_name)
             object_to_delete.delete()
         except ObjectDoesNotExistError:
             pass
-
-        try:
-            hash_object = gns3_container.get_object(file_name + '.md5')
-            hash_object.delete()
-        except ObjectDoesNotExistError:
-            pass
+        if index is not None:
+            index.discard(object_name)
@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Local cache of the images exchanged with cloud storage, by MD5.
+
+Entries are hard links to the images, so images already on this
+computer are linked to their destination instead of being downloaded
+again. An entry which is the last link to its image, once the image has
+been deleted or replaced, is removed when the cache is opened.
+"""
+
+import logging
+import os
+import shutil
+
+from .base_cloud_ctrl import md5_file
+
+log = logging.getLogger(__name__)
+
+
+class ImageCache(object):
+
+    """
+    :param directory: directory of the cache entries, on the same file system as the images
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.purge()
+
+    def purge(self):
+        """
+        Remove the entries of the images which are not used anymore.
+        """
+
+        try:
+            names = os.listdir(self.directory)
+        except OSError:
+            return
+        for name in names:
+            cached = os.path.join(self.directory, name)
+            try:
+                if os.stat(cached).st_nlink <= 1:
+                    log.info("Removing unused image {} from the cache".format(name))
+                    os.remove(cached)
+            except OSError as e:
+                log.debug("Could not purge {} from the image cache: {}".format(name, e))
+
+    def path(self, file_hash):
+        return os.path.join(self.directory, file_hash)
+
+    def get(self, file_hash, destination):
+        """
+        Put the image with this MD5 at destination if it is in the cache.
+
+        :return: True if destination has the image, False if it must be downloaded
+        """
+
+        cached = self.path(file_hash)
+        if not os.path.isfile(cached):
+            return False
+        # the image may have been modified in place since it was cached
+        if md5_file(cached) != file_hash:
+            log.info("Removing modified image {} from the cache".format(file_hash))
+            os.remove(cached)
+            return False
+
+        if os.path.isfile(destination) and (os.path.samefile(cached, destination) or md5_file(destination) == file_hash):
+            return True
+
+        temp_path = destination + '.cache'
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        try:
+            os.link(cached, temp_path)
+        except OSError:
+            shutil.copyfile(cached, temp_path)
+        os.replace(temp_path, destination)
+        log.info("{} taken from the image cache".format(destination))
+        return True
+
+    def add(self, file_path, file_hash):
+        """
+        Add an image to the cache, nothing is done if it cannot be hard linked.
+        """
+
+        cached = self.path(file_hash)
+        if os.path.isfile(cached):
+            return
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            os.link(file_path, cached + '.tmp')
+            os.replace(cached + '.tmp', cached)
+        except OSError as e:
+            log.debug("Could not add {} to the image cache: {}".format(file_path, e))
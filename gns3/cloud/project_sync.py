@@ -0,0 +1,348 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Incremental synchronization of projects with cloud storage.
+
+The files of a project are split in fixed-size blocks, stored once by
+MD5 as files/<block md5>. The path, size, modification time, MD5 and
+blocks of every file are listed in a sync manifest,
+projects/<project>.sync.json, written once all the blocks are stored:
+an export only uploads the blocks which are not stored yet.
+
+The manifest of the last export is also kept locally, the files which
+have the same size and modification time are not hashed again. An
+import rebuilds the files from the manifest, the blocks found in the
+local copy of a file are not downloaded again.
+"""
+
+import functools
+import hashlib
+import io
+import json
+import logging
+import os
+import threading
+from io import StringIO
+
+from .transfer_scheduler import ProgressFile, TransferCancelled
+
+log = logging.getLogger(__name__)
+
+BLOCK_SIZE = 4 * 1024 * 1024
+SYNC_MANIFEST_SUFFIX = '.sync.json'
+
+
+def block_name(block_hash):
+    return 'files/' + block_hash
+
+
+def sync_manifest_name(project_path):
+    """
+    Return the name of the sync manifest of a project.
+
+    :param project_path: path of the .gns3 file of the project
+    """
+
+    return 'projects/' + os.path.basename(project_path) + SYNC_MANIFEST_SUFFIX
+
+
+def hash_blocks(file_path, block_size=BLOCK_SIZE):
+    """
+    Return the MD5 of a file and the list of the MD5 of its blocks.
+    """
+
+    md5 = hashlib.md5()
+    blocks = []
+    with open(file_path, 'rb') as f:
+        for block in iter(lambda: f.read(block_size), b''):
+            md5.update(block)
+            blocks.append(hashlib.md5(block).hexdigest())
+    return md5.hexdigest(), blocks
+
+
+def scan_project(project_dir, previous=None, exclude=None, block_size=BLOCK_SIZE):
+    """
+    Build the sync manifest of a project.
+
+    :param project_dir: directory of the project
+    :param previous: manifest of the last scan, its entries are reused for the files
+    whose size and modification time have not changed
+    :param exclude: callable returning True for the files to leave out
+    :param block_size: size of the blocks
+    :return: manifest dictionary, paths are relative to the parent of project_dir
+    """
+
+    project_dir = os.path.abspath(project_dir)
+    root = os.path.dirname(project_dir)
+    previous_files = {}
+    if previous is not None and previous.get("block_size") == block_size:
+        previous_files = previous["files"]
+
+    directories = []
+    files = {}
+    for dirpath, dirnames, filenames in os.walk(project_dir):
+        dirnames.sort()
+        directories.append(os.path.relpath(dirpath, root).replace(os.sep, '/'))
+        for filename in sorted(filenames):
+            path = os.path.join(dirpath, filename)
+            if not os.path.isfile(path) or (exclude is not None and exclude(path)):
+                continue
+            relpath = os.path.relpath(path, root).replace(os.sep, '/')
+            stat = os.stat(path)
+            entry = previous_files.get(relpath)
+            if entry is None or entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns:
+                file_hash, blocks = hash_blocks(path, block_size)
+                entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "md5": file_hash, "blocks": blocks}
+            files[relpath] = entry
+
+    return {"project": os.path.basename(project_dir),
+            "block_size": block_size,
+            "directories": directories,
+            "files": files}
+
+
+class ProjectUpload(object):
+
+    """
+    Upload of the blocks of a project which are not stored yet, then of its sync manifest.
+
+    :param provider: cloud provider
+    :param project_path: path of the .gns3 file of the project
+    :param state_dir: directory of the local manifests
+    :param exclude: callable returning True for the files to leave out
+    :param block_size: size of the blocks
+    """
+
+    def __init__(self, provider, project_path, state_dir, exclude=None, block_size=BLOCK_SIZE):
+        self.provider = provider
+        self.project_dir = os.path.dirname(os.path.abspath(project_path))
+        self.object_name = sync_manifest_name(project_path)
+        key = hashlib.md5(os.path.abspath(project_path).encode('utf-8')).hexdigest()
+        self.state_path = os.path.join(state_dir, 'sync-{}.json'.format(key))
+        self.block_size = block_size
+        self.manifest = scan_project(self.project_dir, self._load_state(), exclude, block_size)
+
+    def _load_state(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def _save_state(self):
+        os.makedirs(os.path.dirname(self.state_path), exist_ok=True)
+        with open(self.state_path + '.tmp', 'w') as f:
+            json.dump(self.manifest, f)
+        os.replace(self.state_path + '.tmp', self.state_path)
+
+    def add_to(self, scheduler):
+        """
+        Queue the uploads to a TransferScheduler.
+
+        :return: Transfer instance of the manifest upload
+        """
+
+        index = self.provider.container_index(create=True)
+        root = os.path.dirname(self.project_dir)
+        queued = set()
+        parts = []
+        for relpath, entry in sorted(self.manifest["files"].items()):
+            path = os.path.join(root, *relpath.split('/'))
+            for number, block_hash in enumerate(entry["blocks"]):
+                # blocks shared by several files, or stored by a previous export, are uploaded once
+                if block_hash in queued or block_name(block_hash) in index:
+                    continue
+                queued.add(block_hash)
+                offset = number * self.block_size
+                length = min(self.block_size, entry["size"] - offset)
+                parts.append(scheduler.add(block_name(block_hash), length,
+                                           functools.partial(self.upload_block, path, offset, length, block_hash)))
+
+        log.info("{} blocks of {} to upload".format(len(parts), self.manifest["project"]))
+        return scheduler.add(self.object_name, 0, self.finish, after=parts)
+
+    def upload_block(self, path, offset, length, block_hash, storage_driver, progress, cancelled):
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            block = f.read(length)
+        # a block is stored under its MD5, it must not be stored if the file has changed since the scan
+        if hashlib.md5(block).hexdigest() != block_hash:
+            raise OSError("{} has been modified during the export".format(path))
+
+        index = self.provider.container_index(create=True)
+        storage_driver.upload_object_via_stream(ProgressFile(io.BytesIO(block), progress, cancelled),
+                                                index.container,
+                                                block_name(block_hash))
+        index.add(block_name(block_hash))
+
+    def finish(self, storage_driver, progress, cancelled):
+        if cancelled.is_set():
+            raise TransferCancelled()
+        index = self.provider.container_index(create=True)
+        storage_driver.upload_object_via_stream(StringIO(json.dumps(self.manifest)), index.container,
+                                                self.object_name)
+        index.add(self.object_name)
+        self._save_state()
+        return True
+
+
+class FileDownload(object):
+
+    """
+    Download of a file of a project, scheduled like a segmented transfer: the
+    blocks are written to <destination>.part, created by the first block,
+    which is renamed once complete.
+
+    :param local_blocks: dictionary of the MD5 of the blocks of the local copy of the file to their offset
+    """
+
+    def __init__(self, provider, relpath, destination, entry, block_size, local_blocks):
+        self.provider = provider
+        self.relpath = relpath
+        self.destination = destination
+        self.entry = entry
+        self.block_size = block_size
+        self.local_blocks = local_blocks
+        self.part_path = destination + '.part'
+        self._part_lock = threading.Lock()
+        self._part_created = False
+
+    def _create_part(self):
+        with self._part_lock:
+            if not self._part_created:
+                with open(self.part_path, 'wb') as f:
+                    f.truncate(self.entry["size"])
+                self._part_created = True
+
+    def remove_part(self):
+        """
+        Removes the part file left by a failed or cancelled download.
+        """
+
+        with self._part_lock:
+            if self._part_created and os.path.exists(self.part_path):
+                os.remove(self.part_path)
+            self._part_created = False
+
+    def parts(self):
+        """
+        Return the (number, offset, length) of the parts.
+        """
+
+        return [(number, number * self.block_size, min(self.block_size, self.entry["size"] - number * self.block_size))
+                for number in range(len(self.entry["blocks"]))]
+
+    def transfer_part(self, number, offset, length, storage_driver, progress, cancelled):
+        block_hash = self.entry["blocks"][number]
+        self._create_part()
+        if block_hash in self.local_blocks:
+            with open(self.destination, 'rb') as f:
+                f.seek(self.local_blocks[block_hash])
+                block = f.read(length)
+            if hashlib.md5(block).hexdigest() == block_hash:
+                with open(self.part_path, 'r+b') as f:
+                    f.seek(offset)
+                    f.write(block)
+                progress(length)
+                return
+
+        index = self.provider.container_index()
+        storage_object = storage_driver.get_object(index.container.name, block_name(block_hash))
+        md5 = hashlib.md5()
+        with open(self.part_path, 'r+b') as f:
+            f.seek(offset)
+            for chunk in storage_driver.download_object_as_stream(storage_object):
+                if cancelled.is_set():
+                    raise TransferCancelled()
+                f.write(chunk)
+                md5.update(chunk)
+                progress(len(chunk))
+        if md5.hexdigest() != block_hash:
+            raise OSError("MD5 mismatch for block {} of {}".format(number, self.relpath))
+
+    def finish(self, storage_driver, progress, cancelled):
+        self._create_part()
+        file_hash, _ = hash_blocks(self.part_path, self.block_size)
+        if file_hash != self.entry["md5"]:
+            raise OSError("MD5 mismatch for {}".format(self.relpath))
+        os.replace(self.part_path, self.destination)
+        with self._part_lock:
+            self._part_created = False
+        os.utime(self.destination, ns=(self.entry["mtime"], self.entry["mtime"]))
+
+
+class ProjectDownload(object):
+
+    """
+    Rebuilds a project from its sync manifest.
+
+    :param provider: cloud provider
+    :param manifest: sync manifest of the project
+    :param destination: directory the project directory is created in
+    """
+
+    def __init__(self, provider, manifest, destination):
+        self.provider = provider
+        self.manifest = manifest
+        self.destination = os.path.abspath(destination)
+        self._downloads = []
+
+    def _local_path(self, relpath):
+        """
+        Return the local path of a manifest path, which must be in the destination.
+        """
+
+        path = os.path.abspath(os.path.join(self.destination, *relpath.split('/')))
+        if not path.startswith(os.path.join(self.destination, '')):
+            raise OSError("{} is outside of the project directory".format(relpath))
+        return path
+
+    def add_to(self, scheduler):
+        """
+        Queue the downloads to a TransferScheduler, the files which are
+        identical to the stored ones are left as they are.
+        """
+
+        block_size = self.manifest["block_size"]
+        # all the paths are checked before anything is written
+        directories = [self._local_path(directory) for directory in self.manifest["directories"]]
+        files = [(relpath, self._local_path(relpath), entry)
+                 for relpath, entry in sorted(self.manifest["files"].items())]
+
+        for directory in directories:
+            os.makedirs(directory, exist_ok=True)
+
+        for relpath, path, entry in files:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            local_blocks = {}
+            if os.path.isfile(path):
+                file_hash, blocks = hash_blocks(path, block_size)
+                if file_hash == entry["md5"]:
+                    continue
+                local_blocks = {block_hash: number * block_size for number, block_hash in enumerate(blocks)}
+            download = FileDownload(self.provider, relpath, path, entry, block_size, local_blocks)
+            self._downloads.append(download)
+            scheduler.add_segmented(relpath, download)
+
+    def remove_parts(self):
+        """
+        Removes the part files left once the transfers have failed or been cancelled.
+        """
+
+        for download in self._downloads:
+            download.remove_part()
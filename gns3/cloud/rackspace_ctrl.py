@@ -20,6 +20,7 @@
 from .base_cloud_ctrl import BaseCloudCtrl
 import json
 import requests
+from urllib.parse import quote
 from libcloud.compute.drivers.rackspace import ENDPOINT_ARGS_MAP
 from libcloud.compute.providers import get_driver
 from libcloud.compute.types import Provider
@@ -42,6 +43,8 @@ class RackspaceCtrl(BaseCloudCtrl):
 
     """ Controller class for interacting with Rackspace API. """
 
+    SEGMENTED_TRANSFERS = True
+
     def __init__(self, username, api_key, gns3_ias_url):
         super(RackspaceCtrl, self).__init__(username, api_key)
 
@@ -223,8 +226,23 @@ class RackspaceCtrl(BaseCloudCtrl):
             return False
 
         self.region = region
+        self._container_index = None
         return True
 
+    def new_storage_driver(self):
+        """ Return a new Cloud Files driver session for a transfer thread. """
+
+        return self.storage_driver_cls(self.username, self.api_key, region=self.region)
+
+    def put_manifest(self, storage_driver, container, object_name, segments_prefix):
+        """ Create a Cloud Files dynamic large object manifest. """
+
+        request_path = '/{}/{}'.format(quote(container.name), quote(object_name))
+        headers = {'X-Object-Manifest': '{}/{}'.format(quote(container.name), quote(segments_prefix))}
+        response = storage_driver.connection.request(request_path, method='PUT', data='', headers=headers)
+        if response.status not in (200, 201):
+            raise ApiError("Could not create the manifest of {}: {}".format(object_name, response.status))
+
     def _get_shared_images(self, username, region, gns3_version):
         """
         Given a GNS3 version, ask gns3-ias to share compatible images
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Segmented, content-addressed transfers of images to and from cloud storage.
+
+The content of an image is stored once, as fixed-size segment objects
+under blobs/<file md5>/, whatever the number of names it is stored
+under. The segments and their MD5 are listed in a blobs/<file md5>.segments
+JSON object, which is only written once all of them have been uploaded and
+is used to download them in parallel. Each name is a manifest object,
+which the storage service serves as the concatenation of the segments.
+
+The parts done are saved in a journal, so an interrupted transfer
+only transfers the missing parts the next time.
+"""
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from io import StringIO
+
+from .transfer_scheduler import ProgressFile, TransferCancelled
+
+log = logging.getLogger(__name__)
+
+SEGMENT_SIZE = 64 * 1024 * 1024
+
+
+def blob_prefix(file_hash):
+    return 'blobs/{}/'.format(file_hash)
+
+
+def blob_segments_name(file_hash):
+    return 'blobs/{}.segments'.format(file_hash)
+
+
+class TransferJournal(object):
+
+    """
+    Parts of a transfer already done, saved after each part.
+
+    :param path: path of the journal file
+    :param key: identifies the transfer, a journal for another key is discarded
+    """
+
+    def __init__(self, path, key):
+        self.path = path
+        self.key = key
+        self._lock = threading.Lock()
+        self._parts = {}
+        try:
+            with open(path) as f:
+                data = json.load(f)
+            if data.get("key") == key:
+                self._parts = data.get("parts", {})
+        except (OSError, ValueError):
+            pass
+
+    def part(self, number):
+        """ Return the MD5 of a part already done, None otherwise. """
+
+        with self._lock:
+            return self._parts.get(str(number))
+
+    def is_empty(self):
+        with self._lock:
+            return not self._parts
+
+    def add(self, number, md5):
+        with self._lock:
+            self._parts[str(number)] = md5
+            data = json.dumps({"key": self.key, "parts": self._parts})
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            with open(self.path + '.tmp', 'w') as f:
+                f.write(data)
+            os.replace(self.path + '.tmp', self.path)
+
+    def remove(self):
+        with self._lock:
+            self._parts = {}
+            try:
+                os.remove(self.path)
+            except OSError:
+                pass
+
+
+class SegmentReader(object):
+
+    """
+    Reads a part of a file, and computes its MD5.
+    """
+
+    def __init__(self, file, length):
+        self._file = file
+        self._remaining = length
+        self.md5 = hashlib.md5()
+
+    def read(self, size=-1):
+        if size < 0 or size > self._remaining:
+            size = self._remaining
+        data = self._file.read(size)
+        self._remaining -= len(data)
+        self.md5.update(data)
+        return data
+
+    def __iter__(self):
+        return iter(lambda: self.read(64 * 1024), b'')
+
+
+class SegmentedUpload(object):
+
+    """
+    Upload of a file as segments, transfer_part() is called for every part
+    (in any order, from any thread) then finish() once they are all uploaded.
+    When the content is already stored (complete is True) there are no parts
+    and finish() only adds the name.
+    """
+
+    def __init__(self, provider, file_path, object_name, file_hash, journal_dir, segment_size=SEGMENT_SIZE,
+                 complete=False):
+        self.provider = provider
+        self.file_path = file_path
+        self.object_name = object_name
+        self.file_hash = file_hash
+        self.segment_size = segment_size
+        self.complete = complete
+        self.size = os.path.getsize(file_path)
+        self.prefix = blob_prefix(file_hash)
+        self.journal = TransferJournal(os.path.join(journal_dir, file_hash + '.json'), [file_hash, segment_size])
+
+    def parts(self):
+        """
+        Return the (number, offset, length) of the parts.
+        """
+
+        if self.complete:
+            return []
+        return [(number, offset, min(self.segment_size, self.size - offset))
+                for number, offset in enumerate(range(0, self.size, self.segment_size), start=1)]
+
+    def segment_name(self, number):
+        return self.prefix + '%08d' % number
+
+    def transfer_part(self, number, offset, length, storage_driver, progress, cancelled):
+        index = self.provider.container_index(create=True)
+        name = self.segment_name(number)
+        if self.journal.part(number) is not None and name in index:
+            progress(length)
+            return
+
+        with open(self.file_path, 'rb') as f:
+            f.seek(offset)
+            reader = SegmentReader(f, length)
+            storage_driver.upload_object_via_stream(ProgressFile(reader, progress, cancelled), index.container, name)
+        # the driver has checked the MD5 of the segment against the one computed by the server
+        index.add(name)
+        self.journal.add(number, reader.md5.hexdigest())
+
+    def finish(self, storage_driver, progress, cancelled):
+        if cancelled.is_set():
+            raise TransferCancelled()
+        index = self.provider.container_index(create=True)
+        if not self.complete:
+            segments = [{"name": self.segment_name(number), "size": length, "md5": self.journal.part(number)}
+                        for number, _, length in self.parts()]
+            storage_driver.upload_object_via_stream(StringIO(json.dumps({"hash": self.file_hash,
+                                                                         "size": self.size,
+                                                                         "segment_size": self.segment_size,
+                                                                         "segments": segments})),
+                                                    index.container,
+                                                    blob_segments_name(self.file_hash))
+            index.add(blob_segments_name(self.file_hash))
+            self.journal.remove()
+            log.info("{} uploaded in {} segments".format(self.object_name, len(segments)))
+        else:
+            log.info("{} already stored as {}".format(self.object_name, self.prefix))
+
+        self.provider.put_manifest(storage_driver, index.container, self.object_name, self.prefix)
+        storage_driver.upload_object_via_stream(StringIO(self.file_hash), index.container, self.object_name + '.md5')
+        index.add(self.object_name, self.file_hash)
+        index.add(self.object_name + '.md5')
+        return True
+
+
+class SegmentedDownload(object):
+
+    """
+    Download of a segmented file, the parts are written in <destination>.part
+    which is renamed once all of them have been downloaded and checked.
+    """
+
+    def __init__(self, provider, object_name, destination, segments):
+        self.provider = provider
+        self.object_name = object_name
+        self.destination = destination
+        self.file_hash = segments["hash"]
+        self.size = segments["size"]
+        self.segments = segments["segments"]
+        self.part_path = destination + '.part'
+        self.journal = TransferJournal(destination + '.journal', [object_name, self.file_hash])
+
+        # a part file without journal cannot be trusted
+        if self.journal.is_empty() or not os.path.isfile(self.part_path) or os.path.getsize(self.part_path) != self.size:
+            self.journal.remove()
+            with open(self.part_path, 'wb') as f:
+                f.truncate(self.size)
+
+    def parts(self):
+        """
+        Return the (number, offset, length) of the parts.
+        """
+
+        parts = []
+        offset = 0
+        for number, segment in enumerate(self.segments, start=1):
+            parts.append((number, offset, segment["size"]))
+            offset += segment["size"]
+        return parts
+
+    def transfer_part(self, number, offset, length, storage_driver, progress, cancelled):
+        segment = self.segments[number - 1]
+        if self.journal.part(number) == segment["md5"]:
+            progress(length)
+            return
+
+        index = self.provider.container_index()
+        storage_object = storage_driver.get_object(index.container.name, segment["name"])
+        md5 = hashlib.md5()
+        with open(self.part_path, 'r+b') as f:
+            f.seek(offset)
+            for chunk in storage_driver.download_object_as_stream(storage_object):
+                if cancelled.is_set():
+                    raise TransferCancelled()
+                f.write(chunk)
+                md5.update(chunk)
+                progress(len(chunk))
+        if md5.hexdigest() != segment["md5"]:
+            raise OSError("MD5 mismatch for segment {} of {}".format(number, self.object_name))
+        self.journal.add(number, segment["md5"])
+
+    def finish(self, storage_driver, progress, cancelled):
+        md5 = hashlib.md5()
+        with open(self.part_path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                md5.update(chunk)
+        if md5.hexdigest() != self.file_hash:
+            self.journal.remove()
+            raise OSError("MD5 mismatch for {}".format(self.object_name))
+        os.replace(self.part_path, self.destination)
+        self.journal.remove()
+
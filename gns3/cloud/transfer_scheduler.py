@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Runs cloud storage transfers in parallel.
+
+Transfers share the provider of the scheduler (authenticated once), each
+worker thread has its own storage driver session. Progress is reported
+in bytes for all the transfers together, failed transfers are retried
+with an exponential backoff. Large files are transferred as segments,
+which are scheduled as separate transfers.
+"""
+
+from concurrent.futures import ThreadPoolExecutor, wait
+import functools
+import logging
+import os
+import tempfile
+import threading
+
+log = logging.getLogger(__name__)
+
+MAX_PARALLEL_TRANSFERS = 4
+
+
+class TransferCancelled(Exception):
+
+    """ Raised in the workers when the scheduler has been cancelled. """
+
+
+class ProgressFile(object):
+
+    """
+    File wrapper counting the bytes read from it, and aborting the
+    transfer reading it when the scheduler is cancelled.
+    """
+
+    def __init__(self, file, progress, cancelled):
+        self._file = file
+        self._progress = progress
+        self._cancelled = cancelled
+
+    def read(self, size=-1):
+        if self._cancelled.is_set():
+            raise TransferCancelled()
+        data = self._file.read(size)
+        if data:
+            self._progress(len(data))
+        return data
+
+    def __iter__(self):
+        return iter(lambda: self.read(64 * 1024), b'')
+
+    def __getattr__(self, name):
+        return getattr(self._file, name)
+
+
+class Transfer(object):
+
+    """
+    A file transfer, function(storage_driver, progress, cancelled) does
+    the transfer and calls progress(nbytes) as bytes are transferred.
+    """
+
+    def __init__(self, name, size, function):
+        self.name = name
+        self.size = size
+        self.function = function
+        # transfers to finish before this one can start
+        self.waiting = 0
+        self.then = None
+        self.transferred = 0
+        self.attempts = 0
+        self.result = None
+        self.error = None
+
+
+class TransferScheduler(object):
+
+    """
+    Runs transfers with a bounded pool of worker threads.
+
+    :param provider: authenticated cloud provider shared by the transfers
+    :param max_workers: number of transfers running at the same time
+    :param retries: number of times a failed transfer is retried
+    :param backoff: delay before the first retry (in seconds), doubled on each retry
+    :param progress_callback: called with (transferred bytes, total bytes) from the workers
+    :param journal_dir: directory of the journals of the segmented uploads
+    """
+
+    def __init__(self, provider, max_workers=MAX_PARALLEL_TRANSFERS, retries=3, backoff=1.0, progress_callback=None,
+                 journal_dir=None):
+        self.provider = provider
+        self.max_workers = max_workers
+        self.retries = retries
+        self.backoff = backoff
+        self.progress_callback = progress_callback
+        self.journal_dir = journal_dir or os.path.join(tempfile.gettempdir(), "GNS3", "transfers")
+        self._transfers = []
+        self._futures = []
+        self._executor = None
+        self._lock = threading.Lock()
+        self._cancelled = threading.Event()
+        self._sessions = threading.local()
+
+    def add(self, name, size, function, after=None):
+        """
+        Queue a transfer.
+
+        :param after: list of transfers to finish before starting this one
+        :return: Transfer instance
+        """
+
+        transfer = Transfer(name, size, function)
+        for previous in after or []:
+            previous.then = transfer
+            transfer.waiting += 1
+        self._transfers.append(transfer)
+        return transfer
+
+    def add_segmented(self, name, segmented):
+        """
+        Queue the parts of a segmented transfer, then its finish() step.
+        """
+
+        parts = [self.add("{} ({})".format(name, number), length,
+                          functools.partial(segmented.transfer_part, number, offset, length))
+                 for number, offset, length in segmented.parts()]
+        return self.add(name, 0, segmented.finish, after=parts)
+
+    def add_upload(self, file_path, cloud_object_name):
+        """
+        Queue the upload of a file with the upload_file() method of the provider,
+        or as segments for large files.
+        """
+
+        segmented = self.provider.segmented_upload(file_path, cloud_object_name, self.journal_dir)
+        if segmented is not None:
+            return self.add_segmented(cloud_object_name, segmented)
+
+        def upload(storage_driver, progress, cancelled):
+            return self.provider.upload_file(file_path, cloud_object_name,
+                                             storage_driver=storage_driver,
+                                             progress=progress,
+                                             cancelled=cancelled)
+
+        return self.add(cloud_object_name, os.path.getsize(file_path), upload)
+
+    def add_download(self, file_name, destination, file_hash=None):
+        """
+        Queue the download of a file with the download_file() method of the provider,
+        or as segments for files uploaded in segments.
+        """
+
+        segmented = self.provider.segmented_download(file_name, destination, file_hash)
+        if segmented is not None:
+            return self.add_segmented(file_name, segmented)
+
+        def download(storage_driver, progress, cancelled):
+            return self.provider.download_file(file_name, destination,
+                                               storage_driver=storage_driver,
+                                               progress=progress,
+                                               cancelled=cancelled)
+
+        size = self.provider.container_index().container.get_object(file_name).size
+        return self.add(file_name, size, download)
+
+    def total_size(self):
+        return sum(transfer.size for transfer in self._transfers)
+
+    def transferred(self):
+        with self._lock:
+            return sum(transfer.transferred for transfer in self._transfers)
+
+    def cancel(self):
+        """
+        Cancel the transfers, running ones are aborted on their next read.
+        """
+
+        self._cancelled.set()
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def run(self):
+        """
+        Run the queued transfers and wait for them to finish.
+
+        :return: list of Transfer instances
+        :raise: TransferCancelled if cancelled, or the error of the first failed transfer
+        """
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            self._executor = executor
+            for transfer in self._transfers:
+                if not transfer.waiting:
+                    self._submit(transfer)
+            while True:
+                with self._lock:
+                    pending = [future for future in self._futures if not future.done()]
+                if not pending:
+                    break
+                wait(pending)
+
+        if self._cancelled.is_set():
+            raise TransferCancelled()
+        for transfer in self._transfers:
+            if transfer.error is not None:
+                raise transfer.error
+        return self._transfers
+
+    def _submit(self, transfer):
+        with self._lock:
+            self._futures.append(self._executor.submit(self._execute, transfer))
+
+    def _storage_driver(self):
+        """
+        Return the storage driver session of the current worker thread.
+        """
+
+        if not hasattr(self._sessions, "storage_driver"):
+            self._sessions.storage_driver = self.provider.new_storage_driver()
+        return self._sessions.storage_driver
+
+    def _progress(self, transfer, nbytes):
+        with self._lock:
+            transfer.transferred += nbytes
+            transferred = sum(t.transferred for t in self._transfers)
+        if self.progress_callback is not None:
+            self.progress_callback(transferred, self.total_size())
+
+    def _done(self, transfer):
+        """
+        Starts the next transfer once all the transfers it waits for are done.
+        """
+
+        if transfer.then is None:
+            return
+        with self._lock:
+            transfer.then.waiting -= 1
+            ready = transfer.then.waiting == 0
+        if ready:
+            self._submit(transfer.then)
+
+    def _execute(self, transfer):
+        while not self._cancelled.is_set():
+            transfer.attempts += 1
+            try:
+                transfer.result = transfer.function(self._storage_driver(),
+                                                    lambda nbytes: self._progress(transfer, nbytes),
+                                                    self._cancelled)
+                self._done(transfer)
+                return
+            except TransferCancelled:
+                return
+            except Exception as e:
+                # the bytes of the failed attempt will be transferred again
+                self._progress(transfer, -transfer.transferred)
+                if transfer.attempts > self.retries:
+                    log.error("Transfer of {} failed: {}".format(transfer.name, e))
+                    transfer.error = e
+                    return
+                delay = self.backoff * 2 ** (transfer.attempts - 1)
+                log.warning("Transfer of {} failed ({}), retrying in {}s".format(transfer.name, e, delay))
+                self._cancelled.wait(delay)
@@ -1,4 +1,5 @@
 from contextlib import contextmanager
+import functools
 import io
 import json
 from socket import error as socket_error
@@ -10,16 +11,48 @@ import time
 import zipfile
 
 from PyQt4.QtCore import QThread
+from PyQt4.QtCore import QSettings
 from PyQt4.QtCore import pyqtSignal
 
 from .exceptions import KeyPairExists
 from .rackspace_ctrl import RackspaceCtrl, get_provider
+from .transfer_scheduler import TransferScheduler, TransferCancelled
+from .base_cloud_ctrl import load_hash_cache, md5_file
+from .image_cache import ImageCache
+from .project_sync import ProjectUpload, ProjectDownload, SYNC_MANIFEST_SUFFIX
 from ..topology import Topology
 from ..servers import Servers
 
 log = logging.getLogger(__name__)
 
 
+def transfer_journal_dir():
+    """
+    Directory of the journals used to resume interrupted segmented uploads,
+    next to the settings file so they survive a restart.
+    """
+
+    return os.path.join(os.path.dirname(QSettings().fileName()), "transfers")
+
+
+def load_file_hashes():
+    """
+    Loads the MD5 of the files hashed by the previous transfers, saved next
+    to the settings file so unchanged images are not hashed again after a restart.
+    """
+
+    load_hash_cache(os.path.join(os.path.dirname(QSettings().fileName()), "file_hashes.json"))
+
+
+def image_cache(images_path):
+    """
+    Cache of the images exchanged with cloud storage, in the images directory
+    so its entries can be hard links to the images.
+    """
+
+    return ImageCache(os.path.join(images_path, ".cache"))
+
+
 @contextmanager
 def ssh_client(host, key_string):
     """
@@ -280,7 +313,8 @@ class WSConnectThread(QThread):
 
 class UploadProjectThread(QThread):
     """
-    Zip and Upload project to the cloud
+    Upload project to the cloud, only the files changed since the last
+    export when projects are synchronized, zipped otherwise
     """
 
     # signals to update the progress dialog.
@@ -293,33 +327,64 @@ class UploadProjectThread(QThread):
         self.cloud_settings = cloud_settings
         self.project_path = project_path
         self.images_path = images_path
+        self._scheduler = None
+        self._stopped = False
+        self._progress = 0
 
     def run(self):
         try:
             log.info("Exporting project to cloud")
             self.update.emit(0)
 
-            zipped_project_file = self.zip_project_dir()
-
-            self.update.emit(10)  # update progress to 10%
-
+            load_file_hashes()
             provider = get_provider(self.cloud_settings)
-            provider.upload_file(zipped_project_file, 'projects/' + os.path.basename(zipped_project_file))
+            self._scheduler = TransferScheduler(provider,
+                                                progress_callback=self._transferProgress,
+                                                journal_dir=transfer_journal_dir())
+            if self.cloud_settings["sync_projects"]:
+                project_upload = ProjectUpload(provider, self.project_path, transfer_journal_dir(),
+                                               exclude=self._should_exclude)
+                project_object_name = project_upload.object_name
+                project_upload.add_to(self._scheduler)
+            else:
+                zipped_project_file = self.zip_project_dir()
+                project_object_name = 'projects/' + os.path.basename(zipped_project_file)
+                self._scheduler.add_upload(zipped_project_file, project_object_name)
 
-            self.update.emit(20)  # update progress to 20%
+            self.update.emit(10)  # update progress to 10%
+            if self._stopped:
+                return
 
             topology = Topology.instance()
             images = set([node.settings()["image"] for node in topology.nodes() if 'image' in node.settings()])
 
-            for i, image in enumerate(images):
-                provider.upload_file(image, 'images/' + os.path.relpath(image, self.images_path))
-                self.update.emit(20 + (float(i) / len(images) * 80))
+            manifest = {}
+            cache = image_cache(self.images_path)
+            for image in images:
+                cloud_image_name = 'images/' + os.path.relpath(image, self.images_path)
+                self._scheduler.add_upload(image, cloud_image_name)
+                manifest[cloud_image_name] = md5_file(image)
+                cache.add(image, manifest[cloud_image_name])
 
+            self._scheduler.run()
+            provider.upload_project_manifest(project_object_name, manifest)
             self.completed.emit()
+        except TransferCancelled:
+            log.info("Project export cancelled")
         except Exception as e:
             log.exception("Error exporting project to cloud")
             self.error.emit("Error exporting project: {}".format(str(e)), True)
 
+    def _transferProgress(self, transferred, total):
+        """
+        Updates the progress from 10% to 100% as bytes are uploaded.
+        """
+
+        progress = 10 + int(float(transferred) / max(total, 1) * 90)
+        if progress != self._progress:
+            self._progress = progress
+            self.update.emit(progress)
+
     def zip_project_dir(self):
         """
         Zips project files
@@ -350,6 +415,9 @@ class UploadProjectThread(QThread):
         return filename.endswith('.ghost')
 
     def stop(self):
+        self._stopped = True
+        if self._scheduler is not None:
+            self._scheduler.cancel()
         self.quit()
 
 
@@ -360,20 +428,41 @@ class UploadFilesThread(QThread):
     uploads - A list of 2-tuples of (local_src_path, remote_dst_path)
     """
 
+    error = pyqtSignal(str, bool)
     completed = pyqtSignal()
 
     def __init__(self, parent, cloud_settings, uploads):
         super(QThread, self).__init__(parent)
         self._cloud_settings = cloud_settings
         self._uploads = uploads
+        self._scheduler = None
+        self._stopped = False
 
     def run(self):
+        load_file_hashes()
+        # one provider for all the files, so the account is only authenticated once
+        provider = get_provider(self._cloud_settings)
+        self._scheduler = TransferScheduler(provider, journal_dir=transfer_journal_dir())
         for src, dst in self._uploads:
             log.debug('Upload from {} to {}'.format(src, dst))
-            provider = get_provider(self._cloud_settings)
-            provider.upload_file(src, dst)
+            self._scheduler.add_upload(src, dst)
+        if self._stopped:
+            log.info('Image upload cancelled')
+            return
+        try:
+            self._scheduler.run()
             log.debug('Upload image completed')
-        self.completed.emit()
+            self.completed.emit()
+        except TransferCancelled:
+            log.info('Image upload cancelled')
+        except Exception as e:
+            log.error('Image upload failed: {}'.format(e))
+            self.error.emit('Error uploading image: {}'.format(e), True)
+
+    def stop(self):
+        self._stopped = True
+        if self._scheduler is not None:
+            self._scheduler.cancel()
 
 
 class DownloadProjectThread(QThread):
@@ -392,16 +481,35 @@ class DownloadProjectThread(QThread):
         self.project_dest_path = project_dest_path
         self.images_dest_path = images_dest_path
         self.cloud_settings = cloud_settings
+        self._scheduler = None
+        self._stopped = False
+        self._progress = 0
 
     def run(self):
         try:
             self.update.emit(0)
+            load_file_hashes()
             provider = get_provider(self.cloud_settings)
-            zip_file = provider.download_file(self.project_name)
-            zip_file = zipfile.ZipFile(zip_file, mode='r')
-            zip_file.extractall(self.project_dest_path)
-            zip_file.close()
-            project_name = zip_file.namelist()[0].strip('/')
+            if self.project_name.endswith(SYNC_MANIFEST_SUFFIX):
+                # the project files are rebuilt from their blocks, files already there are kept
+                sync_manifest = provider.project_sync_manifest(self.project_name)
+                project_name = sync_manifest["project"]
+                self._scheduler = TransferScheduler(provider,
+                                                    progress_callback=functools.partial(self._transferProgress, 0, 20))
+                if self._stopped:
+                    return
+                project_download = ProjectDownload(provider, sync_manifest, self.project_dest_path)
+                project_download.add_to(self._scheduler)
+                try:
+                    self._scheduler.run()
+                finally:
+                    project_download.remove_parts()
+            else:
+                # the project is downloaded to a temporary file and extracted from it
+                with provider.download_file(self.project_name) as project_file:
+                    with zipfile.ZipFile(project_file, mode='r') as zip_file:
+                        zip_file.extractall(self.project_dest_path)
+                        project_name = zip_file.namelist()[0].strip('/')
 
             self.update.emit(20)
 
@@ -413,23 +521,55 @@ class DownloadProjectThread(QThread):
                     if "properties" in node and "image" in node["properties"]:
                         images.add(node["properties"]["image"])
 
-            image_names_in_cloud = provider.find_storage_image_names(images)
-
-            for i, image in enumerate(images):
-                dest_path = os.path.join(self.images_dest_path, *image_names_in_cloud[image].split('/')[1:])
+            # the project manifest gives the exact images of the project, older
+            # exports have none and the images are looked up by their name
+            manifest = provider.project_manifest(self.project_name) or {}
+            image_names_in_cloud = provider.find_storage_image_names(images, manifest)
+            cache = image_cache(self.images_dest_path)
+
+            self._scheduler = TransferScheduler(provider,
+                                                progress_callback=functools.partial(self._transferProgress, 20, 100))
+            if self._stopped:
+                return
+            downloads = []
+            for image in images:
+                cloud_image_name = image_names_in_cloud[image]
+                dest_path = os.path.join(self.images_dest_path, *cloud_image_name.split('/')[1:])
 
                 if not os.path.exists(os.path.dirname(dest_path)):
                     os.makedirs(os.path.dirname(dest_path))
 
-                provider.download_file(image_names_in_cloud[image], dest_path)
-                self.update.emit(20 + (float(i) / len(images) * 80))
+                # images already on this computer, for any project, are not downloaded again
+                file_hash = manifest.get(cloud_image_name) or provider.container_index().cloud_hash(cloud_image_name)
+                if file_hash is not None and cache.get(file_hash, dest_path):
+                    continue
+                self._scheduler.add_download(cloud_image_name, dest_path, file_hash)
+                downloads.append((dest_path, file_hash))
 
+            self._scheduler.run()
+            for dest_path, file_hash in downloads:
+                cache.add(dest_path, file_hash or md5_file(dest_path))
             self.completed.emit()
+        except TransferCancelled:
+            log.info("Project import cancelled")
         except Exception as e:
             log.exception("Error importing project from cloud")
             self.error.emit("Error importing project: {}".format(str(e)), True)
 
+    def _transferProgress(self, start, end, transferred, total):
+        """
+        Updates the progress from start to end (in %) as bytes are downloaded.
+        """
+
+        progress = start + int(float(transferred) / max(total, 1) * (end - start))
+        if progress != self._progress:
+            self._progress = progress
+            self.update.emit(progress)
+
     def stop(self):
+        self._stopped = True
+        if self._scheduler is not None:
+            self._scheduler.cancel()
         self.quit()
 
 
@@ -451,7 +591,7 @@ class DeleteProjectThread(QThread):
     def run(self):
         try:
             provider = get_provider(self.cloud_settings)
-            provider.delete_file(self.project_file_name)
+            provider.delete_project(self.project_file_name)
             self.completed.emit()
         except Exception as e:
             log.exception("Error deleting project")
@@ -0,0 +1,388 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Capture of the console sessions to disk.
+
+The output of each console session is written to a log file per node
+in the "consoles" directory of the project. Writes are queued by the
+GUI thread and done by a writer thread, log files are rotated when
+they reach a maximum size and an index of the captured logs is kept
+so they can be searched.
+"""
+
+import os
+import re
+import json
+import time
+import queue
+import threading
+
+from .utils.normalize_filename import normalize_filename
+
+import logging
+log = logging.getLogger(__name__)
+
+INDEX_FILENAME = "index.json"
+
+
+class CaptureFile(object):
+    """
+    Log file rotated when it reaches a maximum size,
+    only used by the writer thread.
+
+    :param path: path to the log file
+    :param max_bytes: size of the log file before it is rotated
+    :param backup_count: number of rotated log files to keep
+    """
+
+    def __init__(self, path, max_bytes, backup_count):
+
+        self._path = path
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._file = open(path, "ab")
+        self._size = self._file.tell()
+
+    def _rotate(self):
+        """
+        Renames node.log to node.log.1, node.log.1 to node.log.2 etc.
+        """
+
+        self._file.close()
+        for index in range(self._backup_count - 1, 0, -1):
+            source = "{}.{}".format(self._path, index)
+            if os.path.exists(source):
+                os.replace(source, "{}.{}".format(self._path, index + 1))
+        if self._backup_count > 0:
+            os.replace(self._path, self._path + ".1")
+        self._file = open(self._path, "wb")
+        self._size = 0
+
+    def write(self, data):
+        """
+        Writes data to the log file, the file is rotated
+        preferably after a complete line.
+
+        :param data: bytes
+        """
+
+        while self._size + len(data) > self._max_bytes:
+            room = self._max_bytes - self._size
+            cut = data.rfind(b"\n", 0, room) + 1
+            if not cut and not self._size:
+                # no line fits in an empty file
+                cut = room
+            self._file.write(data[:cut])
+            data = data[cut:]
+            self._rotate()
+        self._file.write(data)
+        self._size += len(data)
+
+    def flush(self):
+        """
+        Flushes the written data to disk.
+        """
+
+        self._file.flush()
+
+    def close(self):
+        """
+        Closes the log file.
+        """
+
+        self._file.close()
+
+
+class ConsoleCaptureSession(object):
+    """
+    Capture of one console session, writes never block.
+
+    :param capture: ConsoleCapture instance
+    :param path: path to the log file
+    """
+
+    def __init__(self, capture, path):
+
+        self._capture = capture
+        self._path = path
+
+    def path(self):
+        """
+        Returns the path to the log file.
+
+        :returns: path
+        """
+
+        return self._path
+
+    def write(self, data):
+        """
+        Queues data received from the console.
+
+        :param data: bytes
+        """
+
+        self._capture._queue.put(("data", self._path, data))
+
+    def close(self):
+        """
+        Ends the capture of this session.
+        """
+
+        self._capture._queue.put(("close", self._path, time.time()))
+
+
+class ConsoleCapture(object):
+    """
+    Writes the console sessions to log files using a writer thread.
+
+    :param max_bytes: size of a log file before it is rotated
+    :param backup_count: number of rotated log files to keep per node
+    :param flush_interval: maximum time data is kept in memory (in seconds)
+    """
+
+    def __init__(self, max_bytes=10 * 1024 * 1024, backup_count=3, flush_interval=0.5):
+
+        self._max_bytes = max_bytes
+        self._backup_count = backup_count
+        self._flush_interval = flush_interval
+        self._enabled = False
+        self._queue = queue.Queue()
+        self._thread = None
+
+    def setEnabled(self, enabled):
+        """
+        Enables or disables the capture of the new sessions.
+
+        :param enabled: boolean
+        """
+
+        self._enabled = enabled
+
+    def isEnabled(self):
+        """
+        Returns either the new sessions are captured.
+
+        :returns: boolean
+        """
+
+        return self._enabled
+
+    @staticmethod
+    def directory():
+        """
+        Returns the directory where the sessions of the current project are captured.
+
+        :returns: path or None if there is no project files directory
+        """
+
+        from .main_window import MainWindow
+        project_files_dir = MainWindow.instance().projectSettings()["project_files_dir"]
+        if not project_files_dir:
+            return None
+        return os.path.join(project_files_dir, "consoles")
+
+    def open(self, name, host, port):
+        """
+        Starts capturing a console session.
+
+        :param name: node name
+        :param host: console host
+        :param port: console port
+
+        :returns: ConsoleCaptureSession instance or None if the capture is disabled
+        """
+
+        if not self._enabled:
+            return None
+        directory = self.directory()
+        if directory is None:
+            return None
+
+        path = os.path.join(directory, "{}.log".format(normalize_filename(name) or "node"))
+        info = {"node": name,
+                "host": host,
+                "port": port,
+                "file": os.path.basename(path),
+                "start": time.time()}
+        if self._thread is None or not self._thread.is_alive():
+            self._thread = threading.Thread(target=self._run, name="ConsoleCapture")
+            self._thread.daemon = True
+            self._thread.start()
+        self._queue.put(("open", path, info))
+        return ConsoleCaptureSession(self, path)
+
+    def stop(self):
+        """
+        Writes the pending data and stops the writer thread.
+        """
+
+        if self._thread is not None and self._thread.is_alive():
+            self._queue.put(None)
+            self._thread.join()
+        self._thread = None
+
+    def _run(self):
+        """
+        Writer thread: data is accumulated per log file and written
+        at most every flush interval.
+        """
+
+        files = {}  # path -> CaptureFile
+        sessions = {}  # path -> number of open sessions sharing the file
+        buffers = {}  # path -> list of bytes
+        last_flush = time.time()
+        running = True
+        while running:
+            try:
+                message = self._queue.get(timeout=self._flush_interval)
+            except queue.Empty:
+                message = ()
+
+            if message is None:
+                running = False
+            elif message:
+                kind, path, value = message
+                if kind == "data":
+                    buffers.setdefault(path, []).append(value)
+                elif kind == "open":
+                    if path not in files:
+                        try:
+                            os.makedirs(os.path.dirname(path), exist_ok=True)
+                            files[path] = CaptureFile(path, self._max_bytes, self._backup_count)
+                        except OSError as e:
+                            log.warning("could not capture console to %s: %s", path, e)
+                            continue
+                    sessions[path] = sessions.get(path, 0) + 1
+                    self._updateIndex(path, value)
+                elif kind == "close":
+                    self._writeBuffer(files, buffers, path)
+                    if path in files:
+                        sessions[path] -= 1
+                        # the file is closed with the last session using it
+                        if not sessions[path]:
+                            del sessions[path]
+                            files.pop(path).close()
+                            self._updateIndex(path, {"end": value})
+
+            if not running or time.time() - last_flush >= self._flush_interval:
+                for path in list(buffers):
+                    self._writeBuffer(files, buffers, path)
+                for capture_file in files.values():
+                    capture_file.flush()
+                last_flush = time.time()
+
+        for capture_file in files.values():
+            capture_file.close()
+
+    def _writeBuffer(self, files, buffers, path):
+        """
+        Writes the data accumulated for a log file.
+
+        :param files: dictionary of CaptureFile instances
+        :param buffers: dictionary of pending data
+        :param path: path to the log file
+        """
+
+        data = buffers.pop(path, None)
+        if data and path in files:
+            try:
+                files[path].write(b"".join(data))
+            except OSError as e:
+                log.warning("could not write console capture %s: %s", path, e)
+
+    def _updateIndex(self, path, info):
+        """
+        Updates the entry of a log file in the index of its directory.
+
+        :param path: path to the log file
+        :param info: dictionary of values to update
+        """
+
+        index_path = os.path.join(os.path.dirname(path), INDEX_FILENAME)
+        index = self.loadIndex(os.path.dirname(path))
+        entry = index.setdefault(os.path.basename(path), {})
+        entry.update(info)
+        if "end" not in info:
+            entry.pop("end", None)
+        try:
+            with open(index_path + ".tmp", "w", encoding="utf-8") as f:
+                json.dump(index, f, indent=4, sort_keys=True)
+            os.replace(index_path + ".tmp", index_path)
+        except OSError as e:
+            log.warning("could not write console capture index %s: %s", index_path, e)
+
+    @staticmethod
+    def loadIndex(directory):
+        """
+        Loads the index of the captured logs.
+
+        :param directory: capture directory
+
+        :returns: dictionary of log file names and their information
+        """
+
+        try:
+            with open(os.path.join(directory, INDEX_FILENAME), encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def search(self, pattern, nodes=None, directory=None):
+        """
+        Searches the captured logs, the oldest lines first.
+
+        :param pattern: regular expression
+        :param nodes: only search the logs of these node names (optional)
+        :param directory: capture directory (default is the current project one)
+
+        :returns: iterator on (node name, file name, line number, line) tuples
+        """
+
+        if directory is None:
+            directory = self.directory()
+            if directory is None:
+                return
+        regex = re.compile(pattern.encode("utf-8"))
+        for filename, entry in sorted(self.loadIndex(directory).items()):
+            if nodes is not None and entry.get("node") not in nodes:
+                continue
+            path = os.path.join(directory, filename)
+            paths = ["{}.{}".format(path, index) for index in range(self._backup_count, 0, -1)] + [path]
+            for log_path in paths:
+                if not os.path.isfile(log_path):
+                    continue
+                with open(log_path, "rb") as f:
+                    for line_number, line in enumerate(f, start=1):
+                        if regex.search(line):
+                            yield (entry.get("node", filename),
+                                   os.path.basename(log_path),
+                                   line_number,
+                                   line.decode("utf-8", errors="replace").rstrip("\r\n"))
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of ConsoleCapture.
+
+        :returns: instance of ConsoleCapture
+        """
+
+        if not hasattr(ConsoleCapture, "_instance"):
+            ConsoleCapture._instance = ConsoleCapture()
+        return ConsoleCapture._instance
@@ -21,21 +21,41 @@ Handles commands typed in the GNS3 console.
 
 import sys
 import cmd
+import functools
 import logging
+import re
 import struct
 import sip
 import json
+import time
 from .qt import QtCore
 from .node import Node
+from .console_capture import ConsoleCapture
+from .utils.node_scheduler import NodeScheduler, select_nodes
 from .version import __version__
 
 
 class ConsoleCmd(cmd.Cmd):
 
+    # logging handler printing debug messages in the console
+    _debug_handler = None
+
+    # level of the root logger before debugging was activated
+    _debug_previous_level = None
+
+    # maximum number of devices started, stopped etc. at the same time
+    _max_concurrency = 10
+
     def __init__(self):
 
         cmd.Cmd.__init__(self)
 
+        # bulk operations in progress (NodeScheduler instances)
+        self._schedulers = []
+
+        # event loop of the wait command in progress, no command can be typed meanwhile
+        self._wait_loop = None
+
     def do_version(self, args):
         """
         Show the version of GNS3 and its dependencies.
@@ -55,105 +75,172 @@ class ConsoleCmd(cmd.Cmd):
         print("PyQt version is {}".format(QtCore.PYQT_VERSION_STR))
         print("SIP version is {}".format(sip.SIP_VERSION_STR))
 
+    def _select_nodes(self, args):
+        """
+        Returns the nodes matching the selectors typed by the user.
+
+        :param args: list of selectors
+
+        :returns: list of Node instances
+        """
+
+        try:
+            nodes, unmatched = select_nodes(self._topology.nodes(), args)
+        except re.error as e:
+            print("Invalid regular expression: {}".format(e))
+            return []
+        for pattern in unmatched:
+            print("{}: no such device".format(pattern))
+        return nodes
+
+    def _run_operation(self, operation, args):
+        """
+        Runs an operation on the selected nodes, a timing
+        summary is printed once all the nodes are done.
+
+        :param operation: operation name (start, stop, suspend or reload)
+        :param args: list of selectors
+        """
+
+        nodes = self._select_nodes(args)
+        if not nodes:
+            return
+
+        scheduler = NodeScheduler(operation, nodes, max_concurrency=self._max_concurrency)
+        scheduler.finished.connect(functools.partial(self._operationFinishedSlot, scheduler))
+        self._schedulers.append(scheduler)
+        scheduler.start()
+
+    def _operationFinishedSlot(self, scheduler, results):
+        """
+        Slot called when an operation has been run on all the nodes.
+
+        :param scheduler: NodeScheduler instance
+        :param results: list of (node name, result, duration)
+        """
+
+        if scheduler in self._schedulers:
+            self._schedulers.remove(scheduler)
+        failures = 0
+        for name, result, duration in sorted(results, key=lambda result: result[2]):
+            if result not in ("ok", "skipped"):
+                failures += 1
+            print("{:<20} {:>8.2f}s  {}".format(name, duration, result))
+        print("{} {} device(s) in {:.2f}s, {} failure(s)".format(scheduler.operation(),
+                                                                 len(results),
+                                                                 scheduler.elapsed(),
+                                                                 failures))
+
     def do_start(self, args):
         """
-        Start all or a specific device(s)
-        start {/all | device1 [device2] ...}
+        Start all or specific device(s)
+        start {/all | selector1 [selector2] ...}
+        selector: name glob (R*), /name regex/, type:glob or server:host:port glob
         """
 
         if '?' in args or args.strip() == "":
             print(self.do_start.__doc__)
             return
 
-        devices = args.split()
-        if '/all' in devices:
-            for node in self._topology.nodes():
-                if hasattr(node, "start") and node.initialized():
-                    node.start()
-        else:
-            for device in devices:
-                for node in self._topology.nodes():
-                    if node.name() == device:
-                        if hasattr(node, "start") and node.initialized():
-                            node.start()
-                        else:
-                            print("{} cannot be started".format(device))
-                        break
+        self._run_operation("start", args.split())
 
     def do_stop(self, args):
         """
-        Stop all or a specific device(s)
-        stop {/all | device1 [device2] ...}
+        Stop all or specific device(s)
+        stop {/all | selector1 [selector2] ...}
+        selector: name glob (R*), /name regex/, type:glob or server:host:port glob
         """
 
         if '?' in args or args.strip() == "":
             print(self.do_stop.__doc__)
             return
 
-        devices = args.split()
-        if '/all' in devices:
-            for node in self._topology.nodes():
-                if hasattr(node, "stop") and node.initialized():
-                    node.stop()
-        else:
-            for device in devices:
-                for node in self._topology.nodes():
-                    if node.name() == device:
-                        if hasattr(node, "stop") and node.initialized():
-                            node.stop()
-                        else:
-                            print("{} cannot be stopped".format(device))
-                        break
+        self._run_operation("stop", args.split())
 
     def do_suspend(self, args):
         """
-        Suspend all or a specific device(s)
-        suspend {/all | device1 [device2] ...}
+        Suspend all or specific device(s)
+        suspend {/all | selector1 [selector2] ...}
+        selector: name glob (R*), /name regex/, type:glob or server:host:port glob
         """
 
         if '?' in args or args.strip() == "":
             print(self.do_suspend.__doc__)
             return
 
-        devices = args.split()
-        if '/all' in devices:
-            for node in self._topology.nodes():
-                if hasattr(node, "suspend") and node.initialized():
-                    node.suspend()
-        else:
-            for device in devices:
-                for node in self._topology.nodes():
-                    if node.name() == device:
-                        if hasattr(node, "suspend") and node.initialized():
-                            node.suspend()
-                        else:
-                            print("{} cannot be suspended".format(device))
-                        break
+        self._run_operation("suspend", args.split())
 
     def do_reload(self, args):
         """
-        Reload all or a specific device(s)
-        reload {/all | device1 [device2] ...}
+        Reload all or specific device(s)
+        reload {/all | selector1 [selector2] ...}
+        selector: name glob (R*), /name regex/, type:glob or server:host:port glob
         """
 
         if '?' in args or args.strip() == "":
             print(self.do_reload.__doc__)
             return
 
-        devices = args.split()
-        if '/all' in devices:
-            for node in self._topology.nodes():
-                if hasattr(node, "reload") and node.initialized():
-                    node.reload()
+        self._run_operation("reload", args.split())
+
+    def do_wait(self, args):
+        """
+        Wait until all or specific device(s) are in a state
+        wait {started | stopped | suspended} {/all | selector1 [selector2] ...} [timeout]
+        """
+
+        states = {"started": Node.started, "stopped": Node.stopped, "suspended": Node.suspended}
+        params = args.split()
+        if '?' in args or len(params) < 2 or params[0] not in states:
+            print(self.do_wait.__doc__)
+            return
+
+        status = states[params[0]]
+        timeout = 120.0
+        if len(params) > 2:
+            try:
+                timeout = float(params[-1])
+                params = params[:-1]
+            except ValueError:
+                pass
+
+        nodes = [node for node in self._select_nodes(params[1:]) if node.initialized()]
+        if not nodes:
+            return
+
+        start_time = time.time()
+        if any(node.status() != status for node in nodes):
+            # the server answers are processed by a local event loop, left
+            # when a node status has changed to the expected one or on timeout
+            loop = QtCore.QEventLoop()
+            timer = QtCore.QTimer()
+            timer.setSingleShot(True)
+            timer.timeout.connect(loop.quit)
+
+            def statusChangedSlot():
+                if all(node.status() == status for node in nodes):
+                    loop.quit()
+
+            signals = []
+            for node in nodes:
+                signals.extend([node.started_signal, node.stopped_signal, node.suspended_signal])
+            for signal in signals:
+                signal.connect(statusChangedSlot)
+            self._wait_loop = loop
+            try:
+                timer.start(int(timeout * 1000))
+                loop.exec_()
+            finally:
+                self._wait_loop = None
+                timer.stop()
+                for signal in signals:
+                    signal.disconnect(statusChangedSlot)
+
+        waiting = [node for node in nodes if node.status() != status]
+        if waiting:
+            print("Timeout after {:.2f}s, not {}: {}".format(timeout, params[0], ", ".join(node.name() for node in waiting)))
         else:
-            for device in devices:
-                for node in self._topology.nodes():
-                    if node.name() == device:
-                        if hasattr(node, "reload") and node.initialized():
-                            node.reload()
-                        else:
-                            print("{} cannot be reloaded".format(device))
-                        break
+            print("{} device(s) {} after {:.2f}s".format(len(nodes), params[0], time.time() - start_time))
 
     def do_console(self, args):
         """
@@ -207,22 +294,64 @@ class ConsoleCmd(cmd.Cmd):
             return
 
         root = logging.getLogger()
-        ch = logging.StreamHandler(sys.stdout)
-
         if len(args) == 1:
             try:
                 level = int(args[0])
                 if level == 0:
                     print("Deactivating debugging")
-                    root.removeHandler(ch)
+                    if self._debug_handler:
+                        root.removeHandler(self._debug_handler)
+                        self._debug_handler = None
+                    if self._debug_previous_level is not None:
+                        root.setLevel(self._debug_previous_level)
+                        self._debug_previous_level = None
                 else:
                     print("Activating debugging")
-                    root.addHandler(ch)
-            except:
+                    if not self._debug_handler:
+                        # the console can only be written from the GUI thread,
+                        # this handler is not behind the logging queue
+                        self._debug_handler = logging.StreamHandler(sys.stdout)
+                        self._debug_handler.setLevel(logging.DEBUG)
+                        root.addHandler(self._debug_handler)
+                    if self._debug_previous_level is None:
+                        self._debug_previous_level = root.level
+                    root.setLevel(logging.DEBUG)
+            except ValueError:
                 print(self.do_debug.__doc__)
         else:
             print(self.do_debug.__doc__)
 
+    def do_profiler(self, args):
+        """
+        Show, hide, reset or export the paint profiler of the scene
+        profiler {on | off | reset | export <path.csv>}
+        """
+
+        if '?' in args or args.strip() == "":
+            print(self.do_profiler.__doc__)
+            return
+
+        from .main_window import MainWindow
+        from .paint_profiler import PaintProfiler
+        main_window = MainWindow.instance()
+        profiler = PaintProfiler.instance()
+
+        params = args.split()
+        if params[0] == "on":
+            main_window.uiShowPaintProfilerAction.setChecked(True)
+        elif params[0] == "off":
+            main_window.uiShowPaintProfilerAction.setChecked(False)
+        elif params[0] == "reset":
+            profiler.reset()
+        elif params[0] == "export" and len(params) == 2:
+            try:
+                profiler.exportCSV(params[1])
+                print("Paint profile exported to {}".format(params[1]))
+            except OSError as e:
+                print("Could not export the paint profile: {}".format(e))
+        else:
+            print(self.do_profiler.__doc__)
+
     def _show_device(self, params):
         """
         Handles the 'show device' command.
@@ -259,32 +388,22 @@ class ConsoleCmd(cmd.Cmd):
         :param params: list of parameters
         """
 
-        topology = self._topology.dump()
         if len(params) == 1:
-            # print out whole topology
-            print(json.dumps(topology, sort_keys=True, indent=4))
+            # print out whole topology, the configs are not saved on the servers
+            topology = self._topology.dump(save_configs=False)
+            for chunk in json.JSONEncoder(sort_keys=True, indent=4).iterencode(topology):
+                sys.stdout.write(chunk)
+            print()
         elif len(params) >= 2:
             # this is a 'show run <device_name>'
+            nodes = {node.name(): node for node in self._topology.nodes()}
             params.pop(0)
-            for param in params:
-                node_name = param
-                node_id = None
-
-                # get the node ID
-                for node in self._topology.nodes():
-                    if node.name() == node_name:
-                        node_id = node.id()
-                        break
-
-                if node_id is None:
+            for node_name in params:
+                node = nodes.get(node_name)
+                if node is None:
                     print("{}: no such device".format(node_name))
                     continue
-
-                if "nodes" in topology["topology"]:
-                    for node in topology["topology"]["nodes"]:
-                        if node["id"] == node_id:
-                            print(json.dumps(node, sort_keys=True, indent=4))
-                            break
+                print(json.dumps(self._topology.dumpNode(node), sort_keys=True, indent=4))
 
     def do_show(self, args):
         """
@@ -313,6 +432,46 @@ class ConsoleCmd(cmd.Cmd):
         else:
             print(self.do_show.__doc__)
 
+    def do_capture(self, args):
+        """
+        Enable or disable the capture of the built-in console sessions:
+        capture {on | off}
+
+        List the captured console logs:
+        capture list
+
+        Search the captured console logs:
+        capture search <regex> [/all | selector1 [selector2] ...]
+        """
+
+        params = args.split()
+        if '?' in args or not params:
+            print(self.do_capture.__doc__)
+            return
+
+        capture = ConsoleCapture.instance()
+        if params[0] == "on" or params[0] == "off":
+            capture.setEnabled(params[0] == "on")
+            print("Console capture is {}".format("enabled" if capture.isEnabled() else "disabled"))
+        elif params[0] == "list":
+            directory = capture.directory()
+            if directory is None:
+                print("No project files directory")
+                return
+            for filename, entry in sorted(capture.loadIndex(directory).items()):
+                print("{:<20} {:<30} {}:{}".format(entry.get("node", ""), filename, entry.get("host", ""), entry.get("port", "")))
+        elif params[0] == "search" and len(params) > 1:
+            nodes = None
+            if len(params) > 2:
+                nodes = set(node.name() for node in self._select_nodes(params[2:]))
+            try:
+                for name, filename, line_number, line in capture.search(params[1], nodes):
+                    print("{} ({}:{}): {}".format(name, filename, line_number, line))
+            except re.error as e:
+                print("Invalid regular expression: {}".format(e))
+        else:
+            print(self.do_capture.__doc__)
+
     def do_help(self, args):
         """
         Get help on commands
@@ -61,6 +61,7 @@ class ConsoleView(PyCutExt, ConsoleCmd):
             instance.notification_signal.connect(self.writeNotification)
 
         # required for Cmd module (do_help etc.)
+        ConsoleCmd.__init__(self)
         self.stdout = sys.stdout
         self._topology = Topology.instance()
 
@@ -72,6 +73,16 @@ class ConsoleView(PyCutExt, ConsoleCmd):
         
         return False
 
+    def keyPressEvent(self, event):
+        """
+        Ignores the keys typed while a command is waiting for devices.
+        """
+
+        if self._wait_loop is not None:
+            event.ignore()
+            return
+        PyCutExt.keyPressEvent(self, event)
+
     def onKeyPress_Tab(self):
         """
         Imitate cmd.Cmd.complete(self, text, state) function.
@@ -128,11 +139,9 @@ class ConsoleView(PyCutExt, ConsoleCmd):
         """
 
         text = "Server notification: {}".format(message)
-        self.write(text, error=True)
-        self.write("\n")
+        self.write(text + "\n", error=True)
         if details:
-            self.write(details)
-            self.write("\n")
+            self.write(details + "\n")
 
     def writeError(self, node_id, message):
         """
@@ -149,8 +158,7 @@ class ConsoleView(PyCutExt, ConsoleCmd):
 
         text = "Error:{name} {message}".format(name=name,
                                                message=message)
-        self.write(text, error=True)
-        self.write("\n")
+        self.write(text + "\n", error=True)
 
     def writeWarning(self, node_id, message):
         """
@@ -167,8 +175,7 @@ class ConsoleView(PyCutExt, ConsoleCmd):
 
         text = "Warning:{name} {message}".format(name=name,
                                                  message=message)
-        self.write(text, warning=True)
-        self.write("\n")
+        self.write(text + "\n", warning=True)
 
     def writeServerError(self, node_id, code, message):
         """
@@ -190,8 +197,7 @@ class ConsoleView(PyCutExt, ConsoleCmd):
                                                                         server=server,
                                                                         name=name,
                                                                         message=message)
-        self.write(text, error=True)
-        self.write("\n")
+        self.write(text + "\n", error=True)
 
     def _run(self):
         """
@@ -0,0 +1,517 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Built-in tabbed Telnet console.
+
+All the sessions are handled by the Qt event loop of the GUI thread
+(one QTcpSocket per session), there is no thread or external process
+per device. A session only connects when its tab is shown for the
+first time, so consoling to all the devices is cheap.
+"""
+
+import codecs
+import re
+
+from .qt import QtCore, QtGui, QtNetwork
+from .console_capture import ConsoleCapture
+
+import logging
+log = logging.getLogger(__name__)
+
+# Telnet commands and options (RFC 854, 857 and 858)
+IAC = 255
+DONT = 254
+DO = 253
+WONT = 252
+WILL = 251
+SB = 250
+SE = 240
+ECHO = 1
+SGA = 3
+
+
+class TelnetSession(QtCore.QObject):
+    """
+    Telnet client session over a non-blocking socket.
+
+    :param host: host or IP address
+    :param port: port number
+    :param parent: parent QObject
+    """
+
+    # emitted with the text received from the device
+    dataReceived = QtCore.Signal(str)
+    # emitted with the same data before it is decoded
+    bytesReceived = QtCore.Signal(bytes)
+    # emitted when the connection is closed or could not be established
+    disconnected = QtCore.Signal(str)
+
+    _STATE_DATA, _STATE_IAC, _STATE_OPTION, _STATE_SB, _STATE_SB_IAC = range(5)
+
+    def __init__(self, host, port, parent=None):
+
+        QtCore.QObject.__init__(self, parent)
+        self._host = host
+        self._port = port
+        self._state = self._STATE_DATA
+        self._command = None
+        self._decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+
+        self._socket = QtNetwork.QTcpSocket(self)
+        self._socket.readyRead.connect(self._readyReadSlot)
+        self._socket.disconnected.connect(self._disconnectedSlot)
+        self._socket.error.connect(self._errorSlot)
+
+    def open(self):
+        """
+        Connects to the device.
+        """
+
+        log.info("connecting console to %s:%s", self._host, self._port)
+        self._socket.connectToHost(self._host, self._port)
+
+    def close(self):
+        """
+        Closes the connection.
+        """
+
+        self._socket.disconnected.disconnect(self._disconnectedSlot)
+        self._socket.error.disconnect(self._errorSlot)
+        self._socket.abort()
+
+    def isOpen(self):
+        """
+        Returns either the session is connecting or connected.
+
+        :returns: boolean
+        """
+
+        return self._socket.state() != QtNetwork.QAbstractSocket.UnconnectedState
+
+    def send(self, text):
+        """
+        Sends text to the device.
+
+        :param text: text to send
+        """
+
+        if self._socket.state() != QtNetwork.QAbstractSocket.ConnectedState:
+            return
+        data = text.encode("utf-8").replace(bytes([IAC]), bytes([IAC, IAC]))
+        self._socket.write(data)
+
+    def _negotiate(self, command, option):
+        """
+        Answers an option negotiation: only the server echo and
+        suppress go ahead options are accepted.
+
+        :param command: DO, DONT, WILL or WONT
+        :param option: option code
+        """
+
+        if command == WILL:
+            answer = DO if option in (ECHO, SGA) else DONT
+        elif command == DO:
+            answer = WILL if option == SGA else WONT
+        else:
+            # nothing to answer to DONT and WONT
+            return
+        self._socket.write(bytes([IAC, answer, option]))
+
+    def _readyReadSlot(self):
+        """
+        Slot called when data has been received, the Telnet
+        commands are handled and the text is emitted.
+        """
+
+        data = bytes(self._socket.readAll())
+        text = bytearray()
+        for byte in data:
+            if self._state == self._STATE_DATA:
+                if byte == IAC:
+                    self._state = self._STATE_IAC
+                else:
+                    text.append(byte)
+            elif self._state == self._STATE_IAC:
+                if byte == IAC:
+                    text.append(byte)
+                    self._state = self._STATE_DATA
+                elif byte in (DO, DONT, WILL, WONT):
+                    self._command = byte
+                    self._state = self._STATE_OPTION
+                elif byte == SB:
+                    self._state = self._STATE_SB
+                else:
+                    self._state = self._STATE_DATA
+            elif self._state == self._STATE_OPTION:
+                self._negotiate(self._command, byte)
+                self._state = self._STATE_DATA
+            elif self._state == self._STATE_SB:
+                if byte == IAC:
+                    self._state = self._STATE_SB_IAC
+            elif self._state == self._STATE_SB_IAC:
+                self._state = self._STATE_DATA if byte == SE else self._STATE_SB
+
+        if text:
+            self.bytesReceived.emit(bytes(text))
+            self.dataReceived.emit(self._decoder.decode(bytes(text)))
+
+    def _disconnectedSlot(self):
+        """
+        Slot called when the device has closed the connection.
+        """
+
+        self.disconnected.emit("Connection closed by foreign host")
+
+    def _errorSlot(self, error):
+        """
+        Slot called when a socket error occurs.
+
+        :param error: QAbstractSocket.SocketError
+        """
+
+        if error != QtNetwork.QAbstractSocket.RemoteHostClosedError:
+            self.disconnected.emit(self._socket.errorString())
+
+
+class TelnetConsoleWidget(QtGui.QPlainTextEdit):
+    """
+    Terminal displaying a Telnet session, the keys
+    typed in the widget are sent to the device.
+
+    :param name: device name
+    :param host: host or IP address
+    :param port: port number
+    :param scrollback: maximum number of lines kept in the widget
+    :param parent: parent widget
+    """
+
+    # emitted when the session is closed (name, host, port)
+    closed = QtCore.Signal(str, str, int)
+
+    # escape sequences (colors, cursor moves...) are not interpreted
+    _escape_sequence = re.compile(r"\x1b(\[[0-9;?]*[ -/]*[@-~]|[()][0-9A-Za-z]|[=>78DEHMc])")
+
+    _keys = {QtCore.Qt.Key_Return: "\r",
+             QtCore.Qt.Key_Enter: "\r",
+             QtCore.Qt.Key_Backspace: "\x08",
+             QtCore.Qt.Key_Delete: "\x7f",
+             QtCore.Qt.Key_Tab: "\t",
+             QtCore.Qt.Key_Escape: "\x1b",
+             QtCore.Qt.Key_Up: "\x1b[A",
+             QtCore.Qt.Key_Down: "\x1b[B",
+             QtCore.Qt.Key_Right: "\x1b[C",
+             QtCore.Qt.Key_Left: "\x1b[D",
+             QtCore.Qt.Key_Home: "\x1b[H",
+             QtCore.Qt.Key_End: "\x1b[F"}
+
+    def __init__(self, name, host, port, scrollback=5000, parent=None):
+
+        QtGui.QPlainTextEdit.__init__(self, parent)
+        self._name = name
+        self._host = host
+        self._port = port
+        self._pending = []
+        self._session = None
+        self._capture = None
+
+        self.setUndoRedoEnabled(False)
+        self.setLineWrapMode(QtGui.QPlainTextEdit.WidgetWidth)
+        self.setMaximumBlockCount(scrollback)
+        self.setTabChangesFocus(False)
+        font = QtGui.QFont("Courier New", 10)
+        font.setStyleHint(QtGui.QFont.TypeWriter)
+        self.setFont(font)
+
+        self._write_timer = QtCore.QTimer(self)
+        self._write_timer.setSingleShot(True)
+        self._write_timer.setInterval(0)
+        self._write_timer.timeout.connect(self._flushSlot)
+
+    def name(self):
+        """
+        Returns the device name.
+
+        :returns: name
+        """
+
+        return self._name
+
+    def address(self):
+        """
+        Returns the address of the device console.
+
+        :returns: (host, port) tuple
+        """
+
+        return self._host, self._port
+
+    def isOpen(self):
+        """
+        Returns either the session has been opened.
+
+        :returns: boolean
+        """
+
+        return self._session is not None
+
+    def open(self):
+        """
+        Opens the Telnet session, does nothing if it is already opened.
+        """
+
+        if self._session is not None:
+            return
+        self._session = TelnetSession(self._host, self._port, self)
+        self._session.dataReceived.connect(self._dataReceivedSlot)
+        self._session.disconnected.connect(self._disconnectedSlot)
+        self._capture = ConsoleCapture.instance().open(self._name, self._host, self._port)
+        if self._capture is not None:
+            self._session.bytesReceived.connect(self._capture.write)
+        self._session.open()
+
+    def close(self):
+        """
+        Closes the Telnet session.
+        """
+
+        if self._session is not None:
+            self._session.close()
+            self._session.deleteLater()
+            self._session = None
+            if self._capture is not None:
+                self._capture.close()
+                self._capture = None
+            self.closed.emit(self._name, self._host, self._port)
+
+    def setScrollback(self, lines):
+        """
+        Sets the maximum number of lines kept in the widget.
+
+        :param lines: number of lines
+        """
+
+        self.setMaximumBlockCount(lines)
+
+    def _dataReceivedSlot(self, text):
+        """
+        Slot called when text has been received, consecutive
+        receptions are displayed at once.
+
+        :param text: received text
+        """
+
+        self._pending.append(text)
+        if not self._write_timer.isActive():
+            self._write_timer.start()
+
+    def _disconnectedSlot(self, reason):
+        """
+        Slot called when the session has been closed.
+
+        :param reason: reason of the disconnection
+        """
+
+        self._dataReceivedSlot("\n*** {} ***\n".format(reason))
+        self.close()
+
+    def _flushSlot(self):
+        """
+        Displays the pending text.
+        """
+
+        text = self._escape_sequence.sub("", "".join(self._pending))
+        self._pending = []
+        text = re.sub(r"\r+\n", "\n", text).replace("\x00", "").replace("\x07", "")
+
+        cursor = self.textCursor()
+        cursor.movePosition(QtGui.QTextCursor.End)
+        cursor.beginEditBlock()
+        # only carriage returns and backspaces need to be interpreted
+        for chunk in re.split(r"([\r\x08])", text):
+            if chunk == "\r":
+                cursor.movePosition(QtGui.QTextCursor.StartOfBlock, QtGui.QTextCursor.KeepAnchor)
+                cursor.removeSelectedText()
+            elif chunk == "\x08":
+                if not cursor.atBlockStart():
+                    cursor.deletePreviousChar()
+            elif chunk:
+                cursor.insertText(chunk)
+        cursor.endEditBlock()
+        self.setTextCursor(cursor)
+        self.ensureCursorVisible()
+
+    def keyPressEvent(self, event):
+        """
+        Sends the typed keys to the device.
+
+        :param event: QKeyEvent instance
+        """
+
+        if event.matches(QtGui.QKeySequence.Copy) and self.textCursor().hasSelection():
+            self.copy()
+        elif event.matches(QtGui.QKeySequence.Paste):
+            if self._session is not None:
+                self._session.send(QtGui.QApplication.clipboard().text())
+        elif event.key() in self._keys:
+            if self._session is not None:
+                self._session.send(self._keys[event.key()])
+        elif event.text():
+            if self._session is not None:
+                self._session.send(event.text())
+        else:
+            QtGui.QPlainTextEdit.keyPressEvent(self, event)
+
+    def insertFromMimeData(self, source):
+        """
+        Pasted or dropped text is sent to the device instead of being inserted.
+
+        :param source: QMimeData instance
+        """
+
+        if self._session is not None and source.hasText():
+            self._session.send(source.text())
+
+
+class TelnetConsoleDockWidget(QtGui.QDockWidget):
+    """
+    Dock widget with one console tab per device.
+
+    :param parent: parent widget
+    :param scrollback: maximum number of lines kept in each console
+    """
+
+    def __init__(self, parent, scrollback=5000):
+
+        QtGui.QDockWidget.__init__(self, "Consoles", parent)
+        self.setObjectName("uiTelnetConsoleDockWidget")
+        self._scrollback = scrollback
+        self._callbacks = {}  # console widget -> callback
+
+        self.uiTabWidget = QtGui.QTabWidget(self)
+        self.uiTabWidget.setTabsClosable(True)
+        self.uiTabWidget.setMovable(True)
+        self.uiTabWidget.setDocumentMode(True)
+        self.uiTabWidget.tabCloseRequested.connect(self._tabCloseRequestedSlot)
+        self.uiTabWidget.currentChanged.connect(self._currentChangedSlot)
+        self.setWidget(self.uiTabWidget)
+        self.visibilityChanged.connect(self._visibilityChangedSlot)
+
+    def setScrollback(self, lines):
+        """
+        Sets the maximum number of lines kept in each console.
+
+        :param lines: number of lines
+        """
+
+        self._scrollback = lines
+        for index in range(self.uiTabWidget.count()):
+            self.uiTabWidget.widget(index).setScrollback(lines)
+
+    def _findConsole(self, host, port):
+        """
+        Returns the console tab connected to an address.
+
+        :param host: host or IP address
+        :param port: port number
+
+        :returns: tab index or -1 if not found
+        """
+
+        for index in range(self.uiTabWidget.count()):
+            if self.uiTabWidget.widget(index).address() == (host, port):
+                return index
+        return -1
+
+    def openConsole(self, name, host, port, callback=None, lazy=False):
+        """
+        Opens a console tab for a device, an existing tab
+        for the same address is brought to front instead.
+
+        :param name: device name
+        :param host: host or IP address
+        :param port: port number
+        :param callback: function called with (name, host, port) when the tab is closed,
+        the session can be opened again until then
+        :param lazy: only connect when the tab is shown for the first time
+        """
+
+        index = self._findConsole(host, port)
+        if index == -1:
+            console = TelnetConsoleWidget(name, host, port, self._scrollback)
+            if callback is not None:
+                self._callbacks[console] = callback
+            index = self.uiTabWidget.addTab(console, name)
+        elif callback is not None:
+            # the address is already used by a tab
+            callback(name, host, port)
+
+        self.setVisible(True)
+        if not lazy:
+            self.raise_()
+            self.uiTabWidget.setCurrentIndex(index)
+            self.uiTabWidget.widget(index).setFocus()
+        self.uiTabWidget.currentWidget().open()
+
+    def closeConsole(self, name):
+        """
+        Closes the console tabs of a device.
+
+        :param name: device name
+        """
+
+        for index in reversed(range(self.uiTabWidget.count())):
+            if self.uiTabWidget.widget(index).name() == name:
+                self._tabCloseRequestedSlot(index)
+
+    def _currentChangedSlot(self, index):
+        """
+        Slot called when another tab is shown, its session is opened.
+
+        :param index: tab index
+        """
+
+        if index != -1 and self.isVisible():
+            self.uiTabWidget.widget(index).open()
+
+    def _visibilityChangedSlot(self, visible):
+        """
+        Slot called when the dock is shown or hidden,
+        the session of the current tab is opened.
+
+        :param visible: boolean
+        """
+
+        if visible and self.uiTabWidget.count():
+            self.uiTabWidget.currentWidget().open()
+
+    def _tabCloseRequestedSlot(self, index):
+        """
+        Slot called when a tab is closed.
+
+        :param index: tab index
+        """
+
+        console = self.uiTabWidget.widget(index)
+        self.uiTabWidget.removeTab(index)
+        console.close()
+        callback = self._callbacks.pop(console, None)
+        if callback is not None:
+            host, port = console.address()
+            callback(console.name(), host, port)
+        console.deleteLater()
@@ -22,6 +22,7 @@ Graphical view on the scene where items are drawn.
 import logging
 import os
 import pickle
+import time
 
 from .qt import QtCore, QtGui, QtNetwork
 from .servers import Servers
@@ -40,6 +41,8 @@ from .dialogs.text_editor_dialog import TextEditorDialog
 from .dialogs.symbol_selection_dialog import SymbolSelectionDialog
 from .dialogs.idlepc_dialog import IdlePCDialog
 from .utils.connect_to_server import ConnectToServer
+from .paint_profiler import PaintProfiler
+from .utils.image_cache import ImageCache
 
 # link items
 from .items.link_item import LinkItem
@@ -82,12 +85,34 @@ class GraphicsView(QtGui.QGraphicsView):
         self._last_mouse_position = None
         self._topology = Topology.instance()
 
+        # mouse move events are coalesced and processed
+        # at most once per display refresh (~60 Hz)
+        self._pending_mouse_position = None
+        self._mouse_move_timer = QtCore.QTimer(self)
+        self._mouse_move_timer.setSingleShot(True)
+        self._mouse_move_timer.setInterval(16)
+        self._mouse_move_timer.timeout.connect(self._processMouseMoveSlot)
+        self._hovered_item = None
+        self._hovered_item_coords = None
+        self._scene_changed = False
+
+        # paint profiler overlay, refreshed every second
+        self._paint_profiler = PaintProfiler.instance()
+        self._paint_profiler_rect = QtCore.QRect()
+        self._paint_profiler_timer = QtCore.QTimer(self)
+        self._paint_profiler_timer.setInterval(1000)
+        self._paint_profiler_timer.timeout.connect(self._refreshPaintProfilerSlot)
+
         # set the scene
         scene = QtGui.QGraphicsScene(parent=self)
         width = self._settings["scene_width"]
         height = self._settings["scene_height"]
         scene.setSceneRect(-(width / 2), -(height / 2), width, height)
         self.setScene(scene)
+        scene.changed.connect(self._sceneChangedSlot)
+
+        # repaint the image items when their images have been decoded
+        ImageCache.instance().updated.connect(self._imageUpdatedSlot)
 
         # set the custom flags for this view
         self.setDragMode(QtGui.QGraphicsView.RubberBandDrag)
@@ -122,6 +147,8 @@ class GraphicsView(QtGui.QGraphicsView):
         self._main_window.uiTopologySummaryTreeWidget.clear()
 
         # clear all objects on the scene
+        self._hovered_item = None
+        self._hovered_item_coords = None
         self.scene().clear()
 
     def updateProjectFilesDir(self, path):
@@ -188,6 +215,83 @@ class GraphicsView(QtGui.QGraphicsView):
             settings.setValue(name, value)
         settings.endGroup()
 
+    def _imageUpdatedSlot(self, key):
+        """
+        Slot called when a new resolution of an image is available.
+
+        :param key: image content key
+        """
+
+        for image_item in self._topology.images():
+            if image_item.image().key() == key:
+                image_item.update()
+
+    def setPaintProfiling(self, enabled):
+        """
+        Enables or disables the paint profiler and its overlay.
+
+        :param enabled: boolean
+        """
+
+        if enabled:
+            self._paint_profiler.reset()
+            self._paint_profiler.enable()
+            self._paint_profiler_timer.start()
+        else:
+            self._paint_profiler.disable()
+            self._paint_profiler_timer.stop()
+        self.viewport().update()
+
+    def _refreshPaintProfilerSlot(self):
+        """
+        Slot called by a timer to repaint the paint profiler overlay.
+        """
+
+        self.viewport().update(self._paint_profiler_rect)
+
+    def paintEvent(self, event):
+        """
+        Handles all paint events, measures the frame time
+        when the paint profiler is enabled.
+
+        :param event: QPaintEvent instance
+        """
+
+        if not self._paint_profiler.isEnabled():
+            QtGui.QGraphicsView.paintEvent(self, event)
+            return
+
+        start = time.perf_counter()
+        QtGui.QGraphicsView.paintEvent(self, event)
+        self._paint_profiler.recordFrame(time.perf_counter() - start)
+
+    def drawForeground(self, painter, rect):
+        """
+        Draws the paint profiler overlay on top of the scene.
+
+        :param painter: QPainter instance
+        :param rect: exposed QRectF in scene coordinates
+        """
+
+        QtGui.QGraphicsView.drawForeground(self, painter, rect)
+        if not self._paint_profiler.isEnabled():
+            return
+
+        lines = self._paint_profiler.summary()
+        painter.save()
+        painter.resetTransform()
+        metrics = painter.fontMetrics()
+        width = max(metrics.width(line) for line in lines) + 10
+        height = metrics.height() * len(lines) + 10
+        self._paint_profiler_rect = QtCore.QRect(5, 5, width, height)
+        painter.fillRect(self._paint_profiler_rect, QtGui.QColor(0, 0, 0, 180))
+        painter.setPen(QtCore.Qt.green)
+        y = 10 + metrics.ascent()
+        for line in lines:
+            painter.drawText(10, y, line)
+            y += metrics.height()
+        painter.restore()
+
     def addingLinkSlot(self, enabled):
         """
         Slot to receive events from MainWindow
@@ -247,15 +351,15 @@ class GraphicsView(QtGui.QGraphicsView):
             self._adding_ellipse = False
             self.setCursor(QtCore.Qt.ArrowCursor)
 
-    def addImage(self, pixmap, image_path):
+    def addImage(self, image, image_path):
         """
         Adds an image.
 
-        :param pixmap: QPixmap instance
+        :param image: CachedImage instance
         :param image_path: path to the image
         """
 
-        image_item = ImageItem(pixmap, image_path)
+        image_item = ImageItem(image, image_path)
         # center the image on the scene
         x = image_item.pos().x() - (image_item.boundingRect().width() / 2)
         y = image_item.pos().y() - (image_item.boundingRect().height() / 2)
@@ -290,20 +394,12 @@ class GraphicsView(QtGui.QGraphicsView):
         """
 
         link = self._topology.getLink(link_id)
-        source_item = None
-        destination_item = None
         source_port = link.sourcePort()
         destination_port = link.destinationPort()
 
         # find the correct source and destination node items
-        for item in self.scene().items():
-            if isinstance(item, NodeItem):
-                if item.node().id() == link.sourceNode().id():
-                    source_item = item
-                if item.node().id() == link.destinationNode().id():
-                    destination_item = item
-            if source_item and destination_item:
-                break
+        source_item = self._topology.getNodeItem(link.sourceNode().id())
+        destination_item = self._topology.getNodeItem(link.destinationNode().id())
 
         if not source_item or not destination_item:
             print("Could not find a source or destination item for the link!")
@@ -346,6 +442,7 @@ class GraphicsView(QtGui.QGraphicsView):
         else:
             link_item = EthernetLinkItem(source_item, source_port, destination_item, destination_port, link, multilink=multi)
         self.scene().addItem(link_item)
+        self._topology.addLinkItem(link_item)
 
     def deleteLinkSlot(self, link_id):
         """
@@ -442,9 +539,8 @@ class GraphicsView(QtGui.QGraphicsView):
         if item and isinstance(item, LinkItem):
             is_not_link = False
         else:
-            for it in self.scene().items():
-                if isinstance(it, LinkItem):
-                    it.setHovered(False)
+            for link_item in self._topology.linkItems():
+                link_item.setHovered(False)
 
         if (event.buttons() == QtCore.Qt.LeftButton and event.modifiers() == QtCore.Qt.ShiftModifier) or event.buttons() == QtCore.Qt.MidButton:
             # checks to see if either the middle mouse is pressed
@@ -586,18 +682,62 @@ class GraphicsView(QtGui.QGraphicsView):
             hBar.setValue(hBar.value() + (delta.x() if QtGui.QApplication.isRightToLeft() else -delta.x()))
             vBar.setValue(vBar.value() - delta.y())
             self._last_mouse_position = mapped_global_pos
+        # the link preview and the status bar are updated later
+        # by _processMouseMoveSlot(), once per display refresh.
+        self._pending_mouse_position = event.pos()
+        if not self._mouse_move_timer.isActive():
+            self._mouse_move_timer.start()
         if self._adding_link and self._newlink:
-            # update the mouse position when the user is adding a link.
-            self._newlink.setMousePoint(self.mapToScene(event.pos()))
             event.ignore()
         else:
-            item = self.itemAt(event.pos())
-            if item:
-                # show item coords in the status bar
-                coords = "X: {} Y: {} Z: {}".format(item.x(), item.y(), item.zValue())
-                self._main_window.uiStatusBar.showMessage(coords, 2000)
             QtGui.QGraphicsView.mouseMoveEvent(self, event)
 
+    def _processMouseMoveSlot(self):
+        """
+        Slot called by the mouse move timer to handle the
+        last known mouse position.
+        """
+
+        pos = self._pending_mouse_position
+        if pos is None:
+            return
+        self._pending_mouse_position = None
+
+        if self._adding_link and self._newlink:
+            # update the mouse position when the user is adding a link.
+            self._newlink.setMousePoint(self.mapToScene(pos))
+            return
+
+        # the item under the mouse is only looked for again when
+        # the mouse leaves it or when the scene has changed
+        item = self._hovered_item
+        if (item is None or self._scene_changed or item.scene() is not self.scene() or
+                not item.sceneBoundingRect().contains(self.mapToScene(pos))):
+            self._scene_changed = False
+            item = self.itemAt(pos)
+        if item is None:
+            self._hovered_item = None
+            self._hovered_item_coords = None
+            return
+
+        # show item coords in the status bar, only if they have changed
+        # or if the previous message has timed out.
+        coords = (item.x(), item.y(), item.zValue())
+        status_bar = self._main_window.uiStatusBar
+        if item is not self._hovered_item or coords != self._hovered_item_coords or not status_bar.currentMessage():
+            self._hovered_item = item
+            self._hovered_item_coords = coords
+            status_bar.showMessage("X: {} Y: {} Z: {}".format(*coords), 2000)
+
+    def _sceneChangedSlot(self, region):
+        """
+        Slot called when the content of the scene has changed.
+
+        :param region: list of changed QRectF instances
+        """
+
+        self._scene_changed = True
+
     def mouseDoubleClickEvent(self, event):
         """
         Handles all mouse double click events.
@@ -866,11 +1006,12 @@ class GraphicsView(QtGui.QGraphicsView):
             dialog.show()
             dialog.exec_()
 
-    def consoleToNode(self, node):
+    def consoleToNode(self, node, lazy=False):
         """
         Start a console application to connect to a node.
 
         :param node: Node instance
+        :param lazy: only connect a built-in console when its tab is shown
 
         :returns: False if the console application could not be started
         """
@@ -912,7 +1053,7 @@ class GraphicsView(QtGui.QGraphicsView):
                 except AttributeError:
                     pass
 
-                telnetConsole(name, console_host, console_port, telnet_callback)
+                telnetConsole(name, console_host, console_port, telnet_callback, lazy)
             except (OSError, ValueError) as e:
                 QtGui.QMessageBox.critical(self, "Console", "Cannot start console application: {}".format(e))
                 return False
@@ -1170,5 +1311,6 @@ class GraphicsView(QtGui.QGraphicsView):
         y = node_item.pos().y() - (node_item.boundingRect().height() / 2)
         node_item.setPos(x, y)
         self._topology.addNode(node)
+        self._topology.addNodeItem(node_item)
         self._main_window.uiTopologySummaryTreeWidget.addNode(node)
         return node_item
@@ -67,6 +67,19 @@ class EthernetLinkItem(LinkItem):
         else:
             self.edge_offset = QtCore.QPointF((self.dx * 40) / self.length, (self.dy * 40) / self.length)
 
+    def setMousePoint(self, scene_point):
+        """
+        Sets new mouse point coordinates.
+        Only the line is redrawn while the link is being added.
+
+        :param scene_point: event position
+        """
+
+        self.destination = scene_point
+        path = QtGui.QPainterPath(self.source)
+        path.lineTo(self.destination)
+        self.setPath(path)
+
     def shape(self):
         """
         Returns the shape of the item to the scene renderer.
@@ -20,20 +20,28 @@ Graphical representation of an image on the QGraphicsScene.
 """
 
 from ..qt import QtCore, QtGui
+from ..utils.image_cache import ImageCache
 
 
-class ImageItem(QtGui.QGraphicsPixmapItem):
+class ImageItem(QtGui.QGraphicsItem):
     """
     Class to insert an image on the scene.
+
+    The image is shared with the other items displaying the same file
+    and is painted using the resolution the most appropriate to the zoom.
+
+    :param image: CachedImage instance
+    :param image_path: path to the image
+    :param pos: optional position
     """
 
     show_layer = False
 
-    def __init__(self, pixmap, image_path, pos=None):
+    def __init__(self, image, image_path, pos=None):
 
-        QtGui.QGraphicsPixmapItem.__init__(self, pixmap)
+        QtGui.QGraphicsItem.__init__(self)
         self.setFlags(self.ItemIsMovable | self.ItemIsSelectable)
-        self.setTransformationMode(QtCore.Qt.SmoothTransformation)
+        self._image = image
         self._image_path = image_path
         if pos:
             self.setPos(pos)
@@ -54,7 +62,7 @@ class ImageItem(QtGui.QGraphicsPixmapItem):
         :return: ImageItem instance
         """
 
-        image_item = ImageItem(self.pixmap(), self._image_path, QtCore.QPointF(self.x() + 20, self.y() + 20))
+        image_item = ImageItem(self._image, self._image_path, QtCore.QPointF(self.x() + 20, self.y() + 20))
         image_item.setZValue(self.zValue())
         return image_item
 
@@ -67,12 +75,27 @@ class ImageItem(QtGui.QGraphicsPixmapItem):
         :param widget: QWidget instance
         """
 
-        QtGui.QGraphicsPixmapItem.paint(self, painter, option, widget)
+        brect = self.boundingRect()
+        scale = option.levelOfDetailFromTransform(painter.worldTransform())
+        # exports cannot wait for the images to be decoded
+        pixmap = self._image.pixmap(scale, block=ImageCache.instance().isExporting())
+        if pixmap is None:
+            # the image is not decoded yet
+            painter.setPen(QtGui.QPen(QtCore.Qt.gray, 0, QtCore.Qt.DashLine))
+            painter.setBrush(QtGui.QColor(240, 240, 240))
+            painter.drawRect(brect)
+        else:
+            painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, True)
+            painter.drawPixmap(brect, pixmap, QtCore.QRectF(pixmap.rect()))
+
+        if option.state & QtGui.QStyle.State_Selected:
+            painter.setPen(QtGui.QPen(QtCore.Qt.black, 0, QtCore.Qt.DashLine))
+            painter.setBrush(QtCore.Qt.NoBrush)
+            painter.drawRect(brect)
 
         if self.show_layer is False:
             return
 
-        brect = self.boundingRect()
         # don't draw anything if the object is too small
         if brect.width() < 20 or brect.height() < 20:
             return
@@ -85,6 +108,25 @@ class ImageItem(QtGui.QGraphicsPixmapItem):
         zval = str(int(self.zValue()))
         painter.drawText(QtCore.QPointF(center.x() - 4, center.y() + 4), zval)
 
+    def image(self):
+        """
+        Returns the shared image displayed by this item.
+
+        :returns: CachedImage instance
+        """
+
+        return self._image
+
+    def boundingRect(self):
+        """
+        Returns the bounding rectangle of this image item.
+
+        :returns: QRectF instance
+        """
+
+        size = self._image.size()
+        return QtCore.QRectF(0, 0, size.width(), size.height())
+
     def setZValue(self, value):
         """
         Sets a new Z value.
@@ -92,7 +134,7 @@ class ImageItem(QtGui.QGraphicsPixmapItem):
         :param value: Z value
         """
 
-        QtGui.QGraphicsPixmapItem.setZValue(self, value)
+        QtGui.QGraphicsItem.setZValue(self, value)
         if self.zValue() < 0:
             self.setFlag(self.ItemIsSelectable, False)
             self.setFlag(self.ItemIsMovable, False)
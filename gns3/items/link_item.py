@@ -415,4 +415,3 @@ class LinkItem(QtGui.QGraphicsPathItem):
 
         self.destination = scene_point
         self.adjust()
-        self.update()
@@ -139,6 +139,17 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
         main_window = MainWindow.instance()
         main_window.setUnsavedState()
 
+    def _closeConsole(self):
+        """
+        Closes the built-in console tabs of the node,
+        if enabled in the general preferences.
+        """
+
+        from ..main_window import MainWindow
+        main_window = MainWindow.instance()
+        if main_window.settings()["auto_close_console"]:
+            main_window.uiTelnetConsoleDockWidget.closeConsole(self._node.name())
+
     def node(self):
         """
         Returns the node attached to this node item.
@@ -208,6 +219,7 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
 
         for link in self._links:
             link.update()
+        self._closeConsole()
 
     def suspendedSlot(self):
         """
@@ -251,6 +263,7 @@ class NodeItem(QtSvg.QGraphicsSvgItem):
         self._node.removeAllocatedName()
         if self in self.scene().items():
             self.scene().removeItem(self)
+        self._closeConsole()
         self.setUnsavedState()
 
     def serverErrorSlot(self, node_id, code, message):
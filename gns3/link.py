@@ -43,16 +43,19 @@ class Link(QtCore.QObject):
     add_link_signal = QtCore.Signal(int)
     delete_link_signal = QtCore.Signal(int)
 
+    # emitted by the tunnel relay thread when a UDP flow to a cloud server is opened
+    udp_flow_opened_signal = QtCore.Signal(object)
+
     _instance_count = 1
 
     def __init__(self, source_node, source_port, destination_node, destination_port):
 
         super(Link, self).__init__()
 
-        log.info("adding link from {} {} to {} {}".format(source_node.name(),
-                                                          source_port.name(),
-                                                          destination_node.name(),
-                                                          destination_port.name()))
+        log.info("adding link from %s %s to %s %s", source_node.name(),
+                 source_port.name(),
+                 destination_node.name(),
+                 destination_port.name())
 
         # create an unique ID
         self._id = Link._instance_count
@@ -66,6 +69,10 @@ class Link(QtCore.QObject):
         self._destination_nio = None
         self._source_nio_active = False
         self._destination_nio_active = False
+        self._udp_flow = None
+        # NIOs used if the UDP tunnel to a cloud server cannot be opened
+        self._direct_udp_nios = None
+        self.udp_flow_opened_signal.connect(self._UDPFlowOpenedSlot)
 
         if source_port.isStub() or destination_port.isStub():
             self._stub = True
@@ -130,10 +137,14 @@ class Link(QtCore.QObject):
         Deletes this link.
         """
 
-        log.info("deleting link from {} {} to {} {}".format(self._source_node.name(),
-                                                            self._source_port.name(),
-                                                            self._destination_node.name(),
-                                                            self._destination_port.name()))
+        log.info("deleting link from %s %s to %s %s", self._source_node.name(),
+                 self._source_port.name(),
+                 self._destination_node.name(),
+                 self._destination_port.name())
+
+        if self._udp_flow is not None:
+            self._udp_flow.tunnel.close_flow(self._udp_flow)
+            self._udp_flow = None
 
         # delete the NIOs on both source and destination nodes
         self._source_node.deleteNIO(self._source_port)
@@ -208,9 +219,9 @@ class Link(QtCore.QObject):
             # disconnect the signal has we don't expect new source UDP info for this link.
             self._source_node.allocate_udp_nio_signal.disconnect(self.UDPPortAllocatedSlot)
 
-            log.debug("{} has allocated UDP port {} for host {}".format(self._source_node.name(),
-                                                                        lport,
-                                                                        laddr))
+            log.debug("%s has allocated UDP port %s for host %s", self._source_node.name(),
+                      lport,
+                      laddr)
 
         # check that the node is connected to this link as a destination
         elif node_id == self._destination_node.id() and port_id == self._destination_port.id():
@@ -219,9 +230,9 @@ class Link(QtCore.QObject):
             # disconnect the signal has we don't expect new source UDP info for this link.
             self._destination_node.allocate_udp_nio_signal.disconnect(self.UDPPortAllocatedSlot)
 
-            log.debug("{} has allocated UDP port {} for host {}".format(self._destination_node.name(),
-                                                                        lport,
-                                                                        laddr))
+            log.debug("%s has allocated UDP port %s for host %s", self._destination_node.name(),
+                      lport,
+                      laddr)
 
         if self._source_udp and self._destination_udp:
 
@@ -230,19 +241,101 @@ class Link(QtCore.QObject):
             lport, laddr = self._source_udp
             rport, raddr = self._destination_udp
 
-            self._source_nio = NIOUDP(lport, raddr, rport)
-            self._destination_nio = NIOUDP(rport, laddr, lport)
-
             self._source_udp = None
             self._destination_udp = None
 
-            log.debug("creating UDP tunnel from {}:{} to {}:{} ".format(laddr, lport, raddr, rport))
+            udp_tunnel = self._cloudUDPTunnel()
+            if udp_tunnel is not None:
+                # the datagrams to the cloud server are sent over SSH
+                if self._source_node.server().isCloud():
+                    local_port, local_host, cloud_port = rport, raddr, lport
+                else:
+                    local_port, local_host, cloud_port = lport, laddr, rport
+                log.debug("creating UDP tunnel over SSH from %s:%s to cloud port %s", local_host, local_port, cloud_port)
+                self._direct_udp_nios = (NIOUDP(lport, raddr, rport), NIOUDP(rport, laddr, lport))
+                try:
+                    self._udp_flow = udp_tunnel.open_flow(local_host,
+                                                          (local_host, local_port),
+                                                          cloud_port,
+                                                          self.udp_flow_opened_signal.emit)
+                    return
+                except OSError as e:
+                    log.error("could not open a UDP tunnel over SSH, connecting directly: %s", e)
+
+            log.debug("creating UDP tunnel from %s:%s to %s:%s ", laddr, lport, raddr, rport)
+            self._addUDPNIOs(NIOUDP(lport, raddr, rport), NIOUDP(rport, laddr, lport))
+
+    def _cloudUDPTunnel(self):
+        """
+        Returns the SSH tunnel to use for the datagrams of this link,
+        when one node is on the local server and the other on a cloud server.
+
+        :returns: UDPTunnel instance or None
+        """
+
+        source_server = self._source_node.server()
+        destination_server = self._destination_node.server()
+        if source_server.isCloud() == destination_server.isCloud():
+            return None
+        if source_server.isCloud():
+            cloud_server, local_server = source_server, destination_server
+        else:
+            cloud_server, local_server = destination_server, source_server
+        if not local_server.isLocal() or getattr(cloud_server, "tunnel", None) is None:
+            return None
+        return cloud_server.tunnel.udp_tunnel()
+
+    def _UDPFlowOpenedSlot(self, flow):
+        """
+        Slot called when the UDP flow to a cloud server has been opened,
+        the NIOs can be created, or when it has been closed by the tunnel.
+
+        :param flow: UDPFlow instance
+        """
 
-            # add the UDP NIOs to the nodes
-            self._source_node.nio_cancel_signal.connect(self.cancelNIOSlot)
-            self._source_node.addNIO(self._source_port, self._source_nio)
-            self._destination_node.nio_cancel_signal.connect(self.cancelNIOSlot)
-            self._destination_node.addNIO(self._destination_port, self._destination_nio)
+        if flow is not self._udp_flow:
+            return
+        if flow.closed:
+            self._udp_flow = None
+            if flow.remote_port is not None:
+                # the tunnel helper has exited, the NIOs use the ports of the flow
+                log.warning("the UDP tunnel over SSH for %s has been closed, opening it again", self)
+                try:
+                    self._udp_flow = flow.tunnel.reopen_flow(flow, self.udp_flow_opened_signal.emit)
+                except OSError as e:
+                    log.error("could not open the UDP tunnel over SSH for %s again: %s", self, e)
+            elif flow.remote_bind_port:
+                log.error("could not open the UDP tunnel over SSH for %s again, the link is down", self)
+            else:
+                log.error("could not open the UDP tunnel over SSH for %s, connecting directly", self)
+                self._addUDPNIOs(*self._direct_udp_nios)
+            return
+        if flow.remote_bind_port:
+            log.info("the UDP tunnel over SSH for %s has been opened again", self)
+            return
+
+        local_host, local_port = flow.target
+        local_nio = NIOUDP(local_port, local_host, flow.local_port)
+        cloud_nio = NIOUDP(flow.remote_target_port, "127.0.0.1", flow.remote_port)
+        if self._source_node.server().isCloud():
+            self._addUDPNIOs(cloud_nio, local_nio)
+        else:
+            self._addUDPNIOs(local_nio, cloud_nio)
+
+    def _addUDPNIOs(self, source_nio, destination_nio):
+        """
+        Adds the UDP NIOs to the nodes.
+
+        :param source_nio: NIOUDP instance for the source node
+        :param destination_nio: NIOUDP instance for the destination node
+        """
+
+        self._source_nio = source_nio
+        self._destination_nio = destination_nio
+        self._source_node.nio_cancel_signal.connect(self.cancelNIOSlot)
+        self._source_node.addNIO(self._source_port, self._source_nio)
+        self._destination_node.nio_cancel_signal.connect(self.cancelNIOSlot)
+        self._destination_node.addNIO(self._destination_port, self._destination_nio)
 
     def newNIOSlot(self, node_id, port_id):
         """
@@ -305,9 +398,9 @@ class Link(QtCore.QObject):
         self._source_port.setDestinationNode(self._destination_node)
         self._source_port.setDestinationPort(self._destination_port)
 
-        log.debug("{} attached to {} on port {}".format(nio,
-                                                        self._source_node.name(),
-                                                        self._source_port.name()))
+        log.debug("%s attached to %s on port %s", nio,
+                  self._source_node.name(),
+                  self._source_port.name())
 
     def _addToDestinationPort(self, nio):
         """
@@ -321,9 +414,9 @@ class Link(QtCore.QObject):
         self._destination_port.setDestinationNode(self._source_node)
         self._destination_port.setDestinationPort(self._source_port)
 
-        log.debug("{} attached to {} on port {}".format(nio,
-                                                        self._destination_node.name(),
-                                                        self._destination_port.name()))
+        log.debug("%s attached to %s on port %s", nio,
+                  self._destination_node.name(),
+                  self._destination_port.name())
 
     def cancelNIOSlot(self, node_id):
         """
@@ -361,6 +454,10 @@ class Link(QtCore.QObject):
 
             self._source_node.nio_cancel_signal.disconnect(self.cancelNIOSlot)
             self._destination_node.nio_cancel_signal.disconnect(self.cancelNIOSlot)
+
+            if self._udp_flow is not None:
+                self._udp_flow.tunnel.close_flow(self._udp_flow)
+                self._udp_flow = None
         else:
             if self._source_node.id() == node_id:
                 self._source_node.nio_signal.disconnect(self.newNIOSlot)
@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Asynchronous logging: records are put in a queue by the logging calls,
+with their message merged with its arguments, and formatted and written
+to rotated log files by a listener thread.
+
+Hot paths should use lazy formatting so that records filtered out by
+the logger levels cost almost nothing, e.g. log.debug("%s started", name)
+instead of log.debug("{} started".format(name)).
+"""
+
+import os
+import copy
+import queue
+import logging
+import logging.handlers
+
+LOG_FORMAT = "[%(levelname)1.1s %(asctime)s %(module)s:%(lineno)d] %(message)s"
+LOG_DATE_FORMAT = "%y%m%d %H:%M:%S"
+
+_queue_handler = None
+_listener = None
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """
+    Queue handler which leaves the log format of the records
+    to the listener thread.
+    """
+
+    def prepare(self, record):
+        """
+        Returns a copy of the record with the arguments and the exception
+        merged into the message, as they may have changed by the time
+        the listener thread writes it.
+
+        :param record: LogRecord instance
+
+        :returns: LogRecord instance
+        """
+
+        message = self.format(record)
+        record = copy.copy(record)
+        record.message = message
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        record.exc_text = None
+        record.stack_info = None
+        return record
+
+
+class QueueListener(logging.handlers.QueueListener):
+    """
+    Queue listener which respects the level of its handlers.
+    """
+
+    def handle(self, record):
+        """
+        Passes a record to the handlers accepting its level.
+
+        :param record: LogRecord instance
+        """
+
+        for handler in self.handlers:
+            if record.levelno >= handler.level:
+                handler.handle(record)
+
+
+def parse_log_levels(specs):
+    """
+    Parses per logger levels, e.g. "gns3.modules.dynamips=debug".
+
+    :param specs: list of "logger=level" strings
+
+    :returns: dictionary of logger names and levels
+    """
+
+    levels = {}
+    for spec in specs:
+        name, sep, level = spec.partition("=")
+        level = logging.getLevelName(level.strip().upper())
+        if not sep or not name.strip() or not isinstance(level, int):
+            raise ValueError("invalid log level '{}', expected logger=level".format(spec))
+        levels[name.strip()] = level
+    return levels
+
+
+def init_logger(logfile, debug=False, levels=None, max_bytes=10 * 1024 * 1024, backup_count=5):
+    """
+    Sets up the logging: the root logger only queues the records
+    and a listener thread writes them.
+
+    :param logfile: path to the log file, the previous files are rotated
+    :param debug: log debug messages and print them on stderr
+    :param levels: dictionary of logger names and levels (optional)
+    :param max_bytes: size of a log file before it is rotated
+    :param backup_count: number of rotated log files to keep
+
+    :returns: True if the log file could be opened
+    """
+
+    global _queue_handler, _listener
+
+    stop_logger()
+
+    root_logger = logging.getLogger()
+    root_logger.setLevel(logging.DEBUG if debug else logging.INFO)
+    for name, level in (levels or {}).items():
+        logging.getLogger(name).setLevel(level)
+
+    # the existing handlers (e.g. stderr) are moved to the listener thread
+    handlers = list(root_logger.handlers)
+    for handler in handlers:
+        root_logger.removeHandler(handler)
+    if debug and not handlers:
+        handlers.append(logging.StreamHandler())
+
+    formatter = logging.Formatter(LOG_FORMAT, datefmt=LOG_DATE_FORMAT)
+    success = True
+    try:
+        file_handler = logging.handlers.RotatingFileHandler(logfile, maxBytes=max_bytes, backupCount=backup_count, delay=True)
+        if os.path.isfile(logfile) and os.path.getsize(logfile):
+            # one log file per session
+            file_handler.doRollover()
+        file_handler.setFormatter(formatter)
+        handlers.append(file_handler)
+    except OSError as e:
+        success = False
+        error = e
+
+    for handler in handlers:
+        if debug:
+            handler.setLevel(logging.DEBUG)
+
+    log_queue = queue.Queue()
+    _queue_handler = QueueHandler(log_queue)
+    root_logger.addHandler(_queue_handler)
+    _listener = QueueListener(log_queue, *handlers)
+    _listener.start()
+
+    if not success:
+        logging.getLogger(__name__).warning("could not log to %s: %s", logfile, error)
+    return success
+
+
+def stop_logger():
+    """
+    Writes the queued records and stops the listener thread.
+    """
+
+    global _queue_handler, _listener
+
+    if _listener is None:
+        return
+
+    logging.getLogger().removeHandler(_queue_handler)
+    _listener.stop()
+    for handler in _listener.handlers:
+        if isinstance(handler, logging.FileHandler):
+            handler.close()
+        else:
+            # give back the other handlers to the root logger
+            logging.getLogger().addHandler(handler)
+    _queue_handler = None
+    _listener = None
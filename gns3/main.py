@@ -35,6 +35,8 @@ except ImportError:
 
 from gns3.main_window import MainWindow
 from gns3.version import __version__
+from gns3.logger import init_logger, stop_logger, parse_log_levels
+from gns3.console_capture import ConsoleCapture
 
 
 def locale_check():
@@ -84,7 +86,12 @@ def main():
     parser = argparse.ArgumentParser()
     parser.add_argument('--version', help="show the version", action='version', version=__version__)
     parser.add_argument('--debug', help="print out debug messages", action='store_true', default=False)
+    parser.add_argument('--log-level', help="set the level of a logger, e.g. gns3.modules.dynamips=debug", action='append', default=[])
     options = parser.parse_args()
+    try:
+        log_levels = parse_log_levels(options.log_level)
+    except ValueError as e:
+        parser.error(str(e))
     exception_file_path = "exception.log"
 
     def exceptionHook(exception, value, tb):
@@ -183,33 +190,16 @@ def main():
         app.setApplicationName("GNS3")
         app.setApplicationVersion(__version__)
 
-        # save client logging info to a file
+        # save client logging info to rotated files, written by a separate thread
         logfile = os.path.join(os.path.dirname(QtCore.QSettings().fileName()), "GNS3_client.log")
         try:
-            try:
-                os.makedirs(os.path.dirname(QtCore.QSettings().fileName()))
-            except FileExistsError:
-                pass
-            handler = logging.FileHandler(logfile, "w")
-            if options.debug:
-                root_logger = logging.getLogger()
-                root_logger.setLevel(logging.DEBUG)
-                if len(root_logger.handlers) > 0:
-                    root_handler = root_logger.handlers[0]
-                else:
-                    root_handler = logging.StreamHandler()
-                    root_logger.addHandler(root_handler)
-                root_handler.setLevel(logging.DEBUG)
-            else:
-                handler.setLevel(logging.INFO)
-            log.info('Log level: {}'.format(logging.getLevelName(log.getEffectiveLevel())))
-
-            formatter = logging.Formatter("[%(levelname)1.1s %(asctime)s %(module)s:%(lineno)d] %(message)s",
-                                          datefmt="%y%m%d %H:%M:%S")
-            handler.setFormatter(formatter)
-            log.addHandler(handler)
+            os.makedirs(os.path.dirname(QtCore.QSettings().fileName()))
+        except FileExistsError:
+            pass
         except OSError as e:
-            log.warn("could not log to {}: {}".format(logfile, e))
+            log.warn("could not create the settings directory: {}".format(e))
+        init_logger(logfile, debug=options.debug, levels=log_levels)
+        log.info('Log level: {}'.format(logging.getLevelName(log.getEffectiveLevel())))
 
         # update the exception file path to have it in the same directory as the settings file.
         exception_file_path = os.path.join(os.path.dirname(QtCore.QSettings().fileName()), exception_file_path)
@@ -220,6 +210,8 @@ def main():
         delattr(MainWindow, "_instance")
         app.deleteLater()
 
+    ConsoleCapture.instance().stop()
+    stop_logger()
     sys.exit(exit_code)
 
 if __name__ == '__main__':
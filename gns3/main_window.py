@@ -36,7 +36,7 @@ from pkg_resources import parse_version
 
 from .modules import MODULES
 from .version import __version__
-from .qt import QtGui, QtCore, QtNetwork
+from .qt import QtGui, QtCore, QtNetwork, QtSvg
 from .servers import Servers
 from .node import Node
 from .ui.main_window_ui import Ui_MainWindow
@@ -48,6 +48,8 @@ from .dialogs.import_cloud_project_dialog import ImportCloudProjectDialog
 from .settings import GENERAL_SETTINGS, GENERAL_SETTING_TYPES, CLOUD_SETTINGS, CLOUD_SETTINGS_TYPES, ENABLE_CLOUD
 from .utils.progress_dialog import ProgressDialog
 from .utils.process_files_thread import ProcessFilesThread
+from .utils.screenshot_thread import ScreenshotThread
+from .utils.image_cache import ImageCache
 from .utils.wait_for_connection_thread import WaitForConnectionThread
 from .utils.message_box import MessageBox
 from .utils.analytics import AnalyticsClient
@@ -62,6 +64,10 @@ from .cloud.utils import UploadProjectThread
 from .cloud.rackspace_ctrl import get_provider
 from .cloud.exceptions import KeyPairExists
 from .cloud_instances import CloudInstances
+from .overview_dock_widget import OverviewDockWidget
+from .embedded_console import TelnetConsoleDockWidget
+from .console_capture import ConsoleCapture
+from .paint_profiler import PaintProfiler
 
 log = logging.getLogger(__name__)
 
@@ -95,6 +101,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         self._settings = {}
         self._cloud_settings = {}
         self._loadSettings()
+        self.uiConsoleTextEdit.setMaximumBlockCount(self._settings["console_max_lines"])
+        ConsoleCapture.instance().setEnabled(self._settings["capture_console_sessions"])
         self._connections()
         self._ignore_unsaved_state = False
         self._temporary_project = True
@@ -118,6 +126,12 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         # do not show the nodes dock widget my default
         self.uiNodesDockWidget.setVisible(False)
 
+        # type-ahead search in the nodes dock widget
+        self.uiNodesFilterLineEdit = QtGui.QLineEdit(self.uiNodesDockWidgetContents)
+        self.uiNodesFilterLineEdit.setPlaceholderText("Search")
+        self.vboxlayout.insertWidget(0, self.uiNodesFilterLineEdit)
+        self.uiNodesFilterLineEdit.textChanged.connect(self.uiNodesView.setFilter)
+
         # populate the view -> docks menu
         self.uiDocksMenu.addAction(self.uiTopologySummaryDockWidget.toggleViewAction())
         self.uiDocksMenu.addAction(self.uiConsoleDockWidget.toggleViewAction())
@@ -125,6 +139,28 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         if ENABLE_CLOUD:
             self.uiDocksMenu.addAction(self.uiCloudInspectorDockWidget.toggleViewAction())
 
+        # paint profiler actions
+        self.uiShowPaintProfilerAction = QtGui.QAction("Show paint profiler", self)
+        self.uiShowPaintProfilerAction.setCheckable(True)
+        self.uiExportPaintProfileAction = QtGui.QAction("Export paint profile...", self)
+        self.uiViewMenu.addSeparator()
+        self.uiViewMenu.addAction(self.uiShowPaintProfilerAction)
+        self.uiViewMenu.addAction(self.uiExportPaintProfileAction)
+        self.uiShowPaintProfilerAction.toggled.connect(self.uiGraphicsView.setPaintProfiling)
+        self.uiExportPaintProfileAction.triggered.connect(self._exportPaintProfileActionSlot)
+
+        # overview (minimap) of the scene, hidden by default
+        self.uiOverviewDockWidget = OverviewDockWidget(self, self.uiGraphicsView)
+        self.addDockWidget(QtCore.Qt.RightDockWidgetArea, self.uiOverviewDockWidget)
+        self.uiOverviewDockWidget.setVisible(False)
+        self.uiDocksMenu.addAction(self.uiOverviewDockWidget.toggleViewAction())
+
+        # built-in Telnet consoles, shown when a console is opened
+        self.uiTelnetConsoleDockWidget = TelnetConsoleDockWidget(self, self._settings["embedded_console_scrollback"])
+        self.addDockWidget(QtCore.Qt.BottomDockWidgetArea, self.uiTelnetConsoleDockWidget)
+        self.uiTelnetConsoleDockWidget.setVisible(False)
+        self.uiDocksMenu.addAction(self.uiTelnetConsoleDockWidget.toggleViewAction())
+
         # set the images directory
         self.uiGraphicsView.updateImageFilesDir(self.imagesDirPath())
 
@@ -221,6 +257,13 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         if new_settings.get("images_path", '') != self.imagesDirPath():
             self.uiGraphicsView.updateImageFilesDir(self.imagesDirPath())
 
+        if "console_max_lines" in new_settings:
+            self.uiConsoleTextEdit.setMaximumBlockCount(new_settings["console_max_lines"])
+        if "embedded_console_scrollback" in new_settings:
+            self.uiTelnetConsoleDockWidget.setScrollback(new_settings["embedded_console_scrollback"])
+        if "capture_console_sessions" in new_settings:
+            ConsoleCapture.instance().setEnabled(new_settings["capture_console_sessions"])
+
         # save the settings
         self._settings.update(new_settings)
         settings = QtCore.QSettings()
@@ -498,23 +541,79 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                 if hasattr(instance, "importConfigs"):
                     instance.importConfigs(path)
 
+    def _renderScene(self, scene, painter, target, source_rect):
+        """
+        Renders the scene for an export, the images are decoded
+        at the resolution of the export if needed.
+
+        :param scene: QGraphicsScene instance
+        :param painter: QPainter instance
+        :param target: QRectF, area of the painter device to render to
+        :param source_rect: QRectF, area of the scene to render
+        """
+
+        ImageCache.instance().setExporting(True)
+        try:
+            scene.render(painter, target, source_rect)
+        finally:
+            ImageCache.instance().setExporting(False)
+
     def _createScreenshot(self, path):
         """
         Create a screenshot of the scene.
 
-        :returns: True if the image was successfully saved; otherwise returns False
+        PNG files are rendered and written strip by strip in a thread,
+        SVG and PDF files are vector exports.
+
+        :returns: True if the image was successfully saved, None if the export has
+        been cancelled or its error already reported; otherwise returns False
         """
 
         scene = self.uiGraphicsView.scene()
         scene.clearSelection()
-        scene.setSceneRect(scene.itemsBoundingRect().adjusted(-20.0, -20.0, 20.0, 20.0))
-        image = QtGui.QImage(scene.sceneRect().size().toSize(), QtGui.QImage.Format_RGB32)
+        source_rect = scene.itemsBoundingRect().adjusted(-20.0, -20.0, 20.0, 20.0)
+        extension = os.path.splitext(path)[1].lower()
+
+        if extension == ".png":
+            thread = ScreenshotThread(scene, path, source_rect)
+            progress_dialog = ProgressDialog(thread, "Screenshot", "Exporting the scene...", "Cancel", parent=self)
+            progress_dialog.show()
+            if progress_dialog.exec_() == QtGui.QDialog.Accepted:
+                return True
+            # the progress dialog has shown the error, if any
+            return None
+
+        if extension == ".svg":
+            generator = QtSvg.QSvgGenerator()
+            generator.setFileName(path)
+            generator.setSize(source_rect.size().toSize())
+            generator.setViewBox(QtCore.QRectF(0, 0, source_rect.width(), source_rect.height()))
+            generator.setTitle(self._project_settings["project_name"])
+            painter = QtGui.QPainter()
+            if not painter.begin(generator):
+                return False
+            self._renderScene(scene, painter, QtCore.QRectF(0, 0, source_rect.width(), source_rect.height()), source_rect)
+            return painter.end()
+
+        if extension == ".pdf":
+            printer = QtGui.QPrinter()
+            printer.setOutputFormat(QtGui.QPrinter.PdfFormat)
+            printer.setOutputFileName(path)
+            printer.setPaperSize(source_rect.size(), QtGui.QPrinter.Point)
+            printer.setPageMargins(0, 0, 0, 0, QtGui.QPrinter.Point)
+            painter = QtGui.QPainter()
+            if not painter.begin(printer):
+                return False
+            self._renderScene(scene, painter, QtCore.QRectF(), source_rect)
+            return painter.end()
+
+        image = QtGui.QImage(source_rect.size().toSize(), QtGui.QImage.Format_RGB32)
         image.fill(QtCore.Qt.white)
         painter = QtGui.QPainter(image)
         painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
         painter.setRenderHint(QtGui.QPainter.TextAntialiasing, True)
         painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, True)
-        scene.render(painter)
+        self._renderScene(scene, painter, QtCore.QRectF(), source_rect)
         painter.end()
         #TODO: quality option
         return image.save(path)
@@ -525,7 +624,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         """
 
         # supported image file formats
-        file_formats = "PNG File (*.png);;JPG File (*.jpeg *.jpg);;BMP File (*.bmp);;XPM File (*.xpm *.xbm);;PPM File (*.ppm);;TIFF File (*.tiff)"
+        file_formats = "PNG File (*.png);;JPG File (*.jpeg *.jpg);;BMP File (*.bmp);;XPM File (*.xpm *.xbm);;PPM File (*.ppm);;TIFF File (*.tiff);;SVG File (*.svg);;PDF File (*.pdf)"
 
         path, selected_filter = QtGui.QFileDialog.getSaveFileNameAndFilter(self, "Screenshot", self.projectsDirPath(), file_formats)
         if not path:
@@ -536,7 +635,7 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         if not path.endswith(file_format):
             path += file_format
 
-        if not self._createScreenshot(path):
+        if self._createScreenshot(path) is False:
             QtGui.QMessageBox.critical(self, "Screenshot", "Could not create screenshot file {}".format(path))
 
     def _snapshotActionSlot(self):
@@ -620,6 +719,21 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         for item in self.uiGraphicsView.items():
             item.update()
 
+    def _exportPaintProfileActionSlot(self):
+        """
+        Slot called to export the paint profiler statistics to a CSV file.
+        """
+
+        path = QtGui.QFileDialog.getSaveFileName(self, "Export paint profile", self.projectsDirPath(), "CSV File (*.csv)")
+        if not path:
+            return
+        if not path.endswith(".csv"):
+            path += ".csv"
+        try:
+            PaintProfiler.instance().exportCSV(path)
+        except OSError as e:
+            QtGui.QMessageBox.critical(self, "Paint profiler", "Could not export the paint profile to {}: {}".format(path, e))
+
     def _resetPortLabelsActionSlot(self):
         """
         Slot called to reset the port labels on the scene.
@@ -642,17 +756,16 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         """
 
         LinkItem.showPortLabels(self.uiShowPortNamesAction.isChecked())
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, LinkItem):
-                item.adjust()
+        for item in Topology.instance().linkItems():
+            item.adjust()
 
     def _startAllActionSlot(self):
         """
         Slot called when starting all the nodes.
         """
 
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem) and hasattr(item.node(), "start") and item.node().initialized():
+        for item in Topology.instance().nodeItems():
+            if hasattr(item.node(), "start") and item.node().initialized():
                 item.node().start()
 
     def _suspendAllActionSlot(self):
@@ -660,8 +773,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Slot called when suspending all the nodes.
         """
 
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem) and hasattr(item.node(), "suspend") and item.node().initialized():
+        for item in Topology.instance().nodeItems():
+            if hasattr(item.node(), "suspend") and item.node().initialized():
                 item.node().suspend()
 
     def _stopAllActionSlot(self):
@@ -669,8 +782,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Slot called when stopping all the nodes.
         """
 
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem) and hasattr(item.node(), "stop") and item.node().initialized():
+        for item in Topology.instance().nodeItems():
+            if hasattr(item.node(), "stop") and item.node().initialized():
                 item.node().stop()
 
     def _reloadAllActionSlot(self):
@@ -678,8 +791,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Slot called when reloading all the nodes.
         """
 
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem) and hasattr(item.node(), "reload") and item.node().initialized():
+        for item in Topology.instance().nodeItems():
+            if hasattr(item.node(), "reload") and item.node().initialized():
                 item.node().reload()
 
     def _deviceMenuActionSlot(self):
@@ -703,13 +816,23 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         Slot called when connecting to all the nodes using the console.
         """
 
+        nodes = []
+        for item in Topology.instance().nodeItems():
+            if hasattr(item.node(), "console") and item.node().initialized() and item.node().status() == Node.started:
+                nodes.append(item.node())
+
+        if self._settings["embedded_console"]:
+            # tabs are only connected when they are shown, no need to wait between them
+            for node in nodes:
+                self.uiGraphicsView.consoleToNode(node, lazy=True)
+            return
+
         delay = self._settings["delay_console_all"]
         counter = 0
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem) and hasattr(item.node(), "console") and item.node().initialized() and item.node().status() == Node.started:
-                callback = functools.partial(self.uiGraphicsView.consoleToNode, item.node())
-                QtCore.QTimer.singleShot(counter, callback)
-                counter += delay
+        for node in nodes:
+            callback = functools.partial(self.uiGraphicsView.consoleToNode, node)
+            QtCore.QTimer.singleShot(counter, callback)
+            counter += delay
 
     def _addNoteActionSlot(self):
         """
@@ -730,8 +853,8 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         if not path:
             return
 
-        pixmap = QtGui.QPixmap(path)
-        if pixmap.isNull():
+        image_reader = QtGui.QImageReader(path)
+        if not image_reader.canRead() or not image_reader.size().isValid():
             QtGui.QMessageBox.critical(self, "Image", "Image file format not supported")
             return
 
@@ -753,7 +876,11 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
                 QtGui.QMessageBox.critical(self, "Image", "Could not copy the image to the project image directory: {}".format(e))
                 return
 
-        self.uiGraphicsView.addImage(pixmap, destination_image_path)
+        image = ImageCache.instance().image(destination_image_path)
+        if image is None:
+            QtGui.QMessageBox.critical(self, "Image", "Could not read image {}".format(destination_image_path))
+            return
+        self.uiGraphicsView.addImage(image, destination_image_path)
 
     def _drawRectangleActionSlot(self):
         """
@@ -882,7 +1009,6 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         else:
             self.uiNodesDockWidget.setWindowTitle(title)
             self.uiNodesDockWidget.setVisible(True)
-            self.uiNodesView.clear()
             self.uiNodesView.populateNodesView(category)
 
     def _browseRoutersActionSlot(self):
@@ -1649,10 +1775,9 @@ class MainWindow(QtGui.QMainWindow, Ui_MainWindow):
         running on the instance_id instance
         """
         self.uiGraphicsView.scene().clearSelection()
-        for item in self.uiGraphicsView.scene().items():
-            if isinstance(item, NodeItem):
-                if item.node()._server.instance_id == instance_id:
-                    item.setSelected(True)
+        for item in Topology.instance().nodeItems():
+            if item.node()._server.instance_id == instance_id:
+                item.setSelected(True)
 
     def _getStyleIcon(self, normal_file, active_file):
 
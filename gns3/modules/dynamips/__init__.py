@@ -306,6 +306,7 @@ class Dynamips(Module):
 
         self._ios_routers = new_ios_routers.copy()
         self._saveIOSRouters()
+        self.nodes_changed_signal.emit()
 
     def settings(self):
         """
@@ -343,6 +344,7 @@ class Dynamips(Module):
 
         self._settings.update(settings)
         self._saveSettings()
+        self.nodes_changed_signal.emit()
 
     def _sendSettings(self, server):
         """
@@ -46,7 +46,7 @@ class Router(Node):
     def __init__(self, module, server, platform="c7200"):
         Node.__init__(self, server)
 
-        log.info("router {} is being created".format(platform))
+        log.info("router %s is being created", platform)
 
         self._defaults = {}
         self._ports = []
@@ -110,7 +110,7 @@ class Router(Node):
             new_port.setSlotNumber(slot_number)
             new_port.setPacketCaptureSupported(True)
             self._ports.append(new_port)
-            log.debug("port {} has been added".format(port_name))
+            log.debug("port %s has been added", port_name)
 
     def _removeAdapterPorts(self, slot_number):
         """
@@ -122,7 +122,7 @@ class Router(Node):
         for port in self._ports.copy():
             if port.slotNumber() == slot_number:
                 self._ports.remove(port)
-                log.debug("port {} has been removed".format(port.name()))
+                log.debug("port %s has been removed", port.name())
 
     def _addWICPorts(self, wic, wic_slot_number):
         """
@@ -144,7 +144,7 @@ class Router(Node):
             new_port.setSlotNumber(0)
             new_port.setPacketCaptureSupported(True)
             self._ports.append(new_port)
-            log.debug("port {} has been added".format(port_name))
+            log.debug("port %s has been added", port_name)
 
     def _removeWICPorts(self, wic, wic_slot_number):
         """
@@ -161,7 +161,7 @@ class Router(Node):
         for port in self._ports.copy():
             if port.slotNumber() == 0 and port.portNumber() in wic_ports_to_delete:
                 self._ports.remove(port)
-                log.debug("port {} has been removed".format(port.name()))
+                log.debug("port %s has been removed", port.name())
 
     def _updateWICNumbering(self):
         """
@@ -192,14 +192,14 @@ class Router(Node):
                                 port.setName(port.longNameType() + str(wic_port_number))
                             else:
                                 port.setName(port.longNameType() + "0/" + str(wic_port_number))
-                            log.debug("port {} renamed to {}".format(old_name, port.name()))
+                            log.debug("port %s renamed to %s", old_name, port.name())
 
     def delete(self):
         """
         Deletes this router.
         """
 
-        log.debug("router {} is being deleted".format(self.name()))
+        log.debug("router %s is being deleted", self.name())
         # first delete all the links attached to this node
         self.delete_links_signal.emit()
         if self._router_id and self._server.connected():
@@ -219,7 +219,7 @@ class Router(Node):
         if error:
             log.error("error while deleting {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
-        log.info("router {} has been deleted".format(self.name()))
+        log.info("router %s has been deleted", self.name())
         self.deleted_signal.emit()
         self._module.removeNode(self)
 
@@ -309,7 +309,7 @@ class Router(Node):
             self.updated_signal.emit()
         else:
             self.setInitialized(True)
-            log.debug("router {} has been created".format(self.name()))
+            log.debug("router %s has been created", self.name())
             self.created_signal.emit(self.id())
             self._module.addNode(self)
 
@@ -324,7 +324,7 @@ class Router(Node):
 
         try:
             with open(config_path, "r", errors="replace") as f:
-                log.info("opening configuration file: {}".format(config_path))
+                log.info("opening configuration file: %s", config_path)
                 config = f.read()
                 config = "!\n" + config.replace('\r', "")
                 encoded = "".join(base64.encodestring(config.encode("utf-8")).decode("utf-8").split())
@@ -359,7 +359,7 @@ class Router(Node):
         and not self.server().isLocal() and os.path.isfile(new_settings["private_config"]):
             params["private_config_base64"] = self._base64Config(new_settings["private_config"])
 
-        log.debug("{} is updating settings: {}".format(self.name(), params))
+        log.debug("%s is updating settings: %s", self.name(), params)
         self._server.send_message("dynamips.vm.update", params, self._updateCallback)
 
     def _updateCallback(self, result, error=False):
@@ -408,12 +408,12 @@ class Router(Node):
 
         if self._inital_settings and not self._loading:
             self.setInitialized(True)
-            log.info("router {} has been created".format(self.name()))
+            log.info("router %s has been created", self.name())
             self.created_signal.emit(self.id())
             self._module.addNode(self)
             self._inital_settings = None
         elif updated or self._loading:
-            log.info("router {} has been updated".format(self.name()))
+            log.info("router %s has been updated", self.name())
             self.updated_signal.emit()
 
     def start(self):
@@ -422,10 +422,10 @@ class Router(Node):
         """
 
         if self.status() == Node.started:
-            log.debug("{} is already running".format(self.name()))
+            log.debug("%s is already running", self.name())
             return
 
-        log.debug("{} is starting".format(self.name()))
+        log.debug("%s is starting", self.name())
         self._server.send_message("dynamips.vm.start", {"id": self._router_id}, self._startCallback)
 
     def _startCallback(self, result, error=False):
@@ -440,7 +440,7 @@ class Router(Node):
             log.error("error while starting {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
         else:
-            log.info("{} has started".format(self.name()))
+            log.info("%s has started", self.name())
             self.setStatus(Node.started)
             for port in self._ports:
                 # set ports as started
@@ -453,10 +453,10 @@ class Router(Node):
         """
 
         if self.status() == Node.stopped:
-            log.debug("{} is already stopped".format(self.name()))
+            log.debug("%s is already stopped", self.name())
             return
 
-        log.debug("{} is stopping".format(self.name()))
+        log.debug("%s is stopping", self.name())
         self._server.send_message("dynamips.vm.stop", {"id": self._router_id}, self._stopCallback)
 
     def _stopCallback(self, result, error=False):
@@ -471,7 +471,7 @@ class Router(Node):
             log.error("error while stopping {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
         else:
-            log.info("{} has stopped".format(self.name()))
+            log.info("%s has stopped", self.name())
             self.setStatus(Node.stopped)
             for port in self._ports:
                 # set ports as stopped
@@ -484,10 +484,10 @@ class Router(Node):
         """
 
         if self.status() == Node.suspended:
-            log.debug("{} is already suspended".format(self.name()))
+            log.debug("%s is already suspended", self.name())
             return
 
-        log.debug("{} is being suspended".format(self.name()))
+        log.debug("%s is being suspended", self.name())
         self._server.send_message("dynamips.vm.suspend", {"id": self._router_id}, self._suspendCallback)
 
     def _suspendCallback(self, result, error=False):
@@ -502,7 +502,7 @@ class Router(Node):
             log.error("error while suspending {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
         else:
-            log.info("{} has suspended".format(self.name()))
+            log.info("%s has suspended", self.name())
             self.setStatus(Node.suspended)
             for port in self._ports:
                 # set ports as suspended
@@ -514,7 +514,7 @@ class Router(Node):
         Reloads this router.
         """
 
-        log.debug("{} is being reloaded".format(self.name()))
+        log.debug("%s is being reloaded", self.name())
         self._server.send_message("dynamips.vm.reload", {"id": self._router_id}, self._reloadCallback)
 
     def _reloadCallback(self, result, error=False):
@@ -529,7 +529,8 @@ class Router(Node):
             log.error("error while reloading {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
         else:
-            log.info("{} has reloaded".format(self.name()))
+            log.info("%s has reloaded", self.name())
+            self.reloaded_signal.emit()
 
     def startPacketCapture(self, port, capture_file_name, data_link_type):
         """
@@ -547,7 +548,7 @@ class Router(Node):
                   "capture_file_name": capture_file_name,
                   "data_link_type": data_link_type}
 
-        log.debug("{} is starting a packet capture on {}: {}".format(self.name(), port.name(), params))
+        log.debug("%s is starting a packet capture on %s: %s", self.name(), port.name(), params)
         self._server.send_message("dynamips.vm.start_capture", params, self._startPacketCaptureCallback)
 
     def _startPacketCaptureCallback(self, result, error=False):
@@ -564,7 +565,7 @@ class Router(Node):
         else:
             for port in self._ports:
                 if port.id() == result["port_id"]:
-                    log.info("{} has successfully started capturing packets on {}".format(self.name(), port.name()))
+                    log.info("%s has successfully started capturing packets on %s", self.name(), port.name())
                     try:
                         port.startPacketCapture(result["capture_file_path"])
                     except OSError as e:
@@ -584,7 +585,7 @@ class Router(Node):
                   "slot": port.slotNumber(),
                   "port": port.portNumber()}
 
-        log.debug("{} is stopping a packet capture on {}: {}".format(self.name(), port.name(), params))
+        log.debug("%s is stopping a packet capture on %s: %s", self.name(), port.name(), params)
         self._server.send_message("dynamips.vm.stop_capture", params, self._stopPacketCaptureCallback)
 
     def _stopPacketCaptureCallback(self, result, error=False):
@@ -601,7 +602,7 @@ class Router(Node):
         else:
             for port in self._ports:
                 if port.id() == result["port_id"]:
-                    log.info("{} has successfully stopped capturing packets on {}".format(self.name(), port.name()))
+                    log.info("%s has successfully stopped capturing packets on %s", self.name(), port.name())
                     port.stopPacketCapture()
                     self.updated_signal.emit()
                     break
@@ -611,7 +612,7 @@ class Router(Node):
         Get Idle-PC proposals
         """
 
-        log.debug("{} is requesting Idle-PC proposals".format(self.name()))
+        log.debug("%s is requesting Idle-PC proposals", self.name())
         self._server.send_message("dynamips.vm.idlepcs", {"id": self._router_id}, self._computeIdlepcsCallback)
 
     def _computeIdlepcsCallback(self, result, error=False):
@@ -626,7 +627,7 @@ class Router(Node):
             log.error("error while computing Idle-PC proposals {}: {}".format(self.name(), result["message"]))
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
         else:
-            log.info("{} has received Idle-PC proposals".format(self.name()))
+            log.info("%s has received Idle-PC proposals", self.name())
             self._idlepcs = result["idlepcs"]
             self.idlepc_signal.emit()
 
@@ -637,7 +638,7 @@ class Router(Node):
         :param callback: Callback for the response
         """
 
-        log.debug("{} is starting an auto Idle-PC lookup".format(self.name()))
+        log.debug("%s is starting an auto Idle-PC lookup", self.name())
         self._server.send_message("dynamips.vm.auto_idlepc", {"id": self._router_id}, callback)
 
     def idlepcs(self):
@@ -667,7 +668,7 @@ class Router(Node):
 
         params = {"id": self._router_id,
                   "idlepc": idlepc}
-        log.debug("{} is updating settings: {}".format(self.name(), params))
+        log.debug("%s is updating settings: %s", self.name(), params)
         self._server.send_message("dynamips.vm.update", params, self._updateCallback)
         self._module.updateImageIdlepc(self._settings["image"], idlepc)
 
@@ -678,7 +679,7 @@ class Router(Node):
         :param port_id: port identifier
         """
 
-        log.debug("{} is requesting an UDP port allocation".format(self.name()))
+        log.debug("%s is requesting an UDP port allocation", self.name())
         self._server.send_message("dynamips.vm.allocate_udp_port", {"id": self._router_id, "port_id": port_id}, self._allocateUDPPortCallback)
 
     def _allocateUDPPortCallback(self, result, error=False):
@@ -695,7 +696,7 @@ class Router(Node):
         else:
             port_id = result["port_id"]
             lport = result["lport"]
-            log.debug("{} has allocated UDP port {}".format(self.name(), lport))
+            log.debug("%s has allocated UDP port %s", self.name(), lport)
             self.allocate_udp_nio_signal.emit(self.id(), port_id, lport)
 
     def addNIO(self, port, nio):
@@ -712,7 +713,7 @@ class Router(Node):
                   "port_id": port.id()}
 
         params["nio"] = self.getNIOInfo(nio)
-        log.debug("{} is adding an {}: {}".format(self.name(), nio, params))
+        log.debug("%s is adding an %s: %s", self.name(), nio, params)
         self._server.send_message("dynamips.vm.add_nio", params, self._addNIOCallback)
 
     def _addNIOCallback(self, result, error=False):
@@ -728,7 +729,7 @@ class Router(Node):
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
             self.nio_cancel_signal.emit(self.id())
         else:
-            log.debug("{} has added a new NIO: {}".format(self.name(), result))
+            log.debug("%s has added a new NIO: %s", self.name(), result)
             self.nio_signal.emit(self.id(), result["port_id"])
 
     def deleteNIO(self, port):
@@ -742,7 +743,7 @@ class Router(Node):
                   "slot": port.slotNumber(),
                   "port": port.portNumber()}
 
-        log.debug("{} is deleting an NIO: {}".format(self.name(), params))
+        log.debug("%s is deleting an NIO: %s", self.name(), params)
         if self._server.connected():
             self._server.send_message("dynamips.vm.delete_nio", params, self._deleteNIOCallback)
 
@@ -759,15 +760,15 @@ class Router(Node):
             self.server_error_signal.emit(self.id(), result["code"], result["message"])
             return
 
-        log.debug("{} has deleted a NIO: {}".format(self.name(), result))
+        log.debug("%s has deleted a NIO: %s", self.name(), result)
 
-    def _saveConfig(self):
+    def saveConfig(self):
         """
         Tells the server to save the router configurations (startup-config and private-config).
         """
 
         params = {"id": self._router_id}
-        log.debug("{} is saving his configuration: {}".format(self.name(), params))
+        log.debug("%s is saving his configuration: %s", self.name(), params)
         self._server.send_notification("dynamips.vm.save_config", params)
 
     def _slot_info(self):
@@ -911,10 +912,6 @@ class Router(Node):
         :returns: representation of the node (dictionary)
         """
 
-        # tell the server to save the startup-config and
-        # private-config
-        self._saveConfig()
-
         router = {"id": self.id(),
                   "router_id": self._router_id,
                   "type": self.__class__.__name__,
@@ -975,7 +972,7 @@ class Router(Node):
         self.updated_signal.connect(self._updatePortSettings)
         # block the created signal, it will be triggered when loading is completely done
         self._loading = True
-        log.info("router {} is loading".format(name))
+        log.info("router %s is loading", name)
         self.setName(name)
         self.setup(image, ram, name, router_id, settings)
 
@@ -996,7 +993,7 @@ class Router(Node):
 
         # now we can set the node has initialized and trigger the signal
         self.setInitialized(True)
-        log.info("router {} has been loaded".format(self.name()))
+        log.info("router %s has been loaded", self.name())
         self.created_signal.emit(self.id())
         self._module.addNode(self)
         self._inital_settings = None
@@ -1030,7 +1027,7 @@ class Router(Node):
                 config = base64.decodebytes(result["startup_config_base64"].encode("utf-8"))
                 try:
                     with open(config_path, "wb") as f:
-                        log.info("saving {} startup-config to {}".format(self.name(), config_path))
+                        log.info("saving %s startup-config to %s", self.name(), config_path)
                         f.write(config)
                 except OSError as e:
                     self.error_signal.emit(self.id(), "could not export startup-config to {}: {}".format(config_path, e))
@@ -1040,7 +1037,7 @@ class Router(Node):
                 config = base64.decodebytes(result["private_config_base64"].encode("utf-8"))
                 try:
                     with open(config_path, "wb") as f:
-                        log.info("saving {} private-config to {}".format(self.name(), config_path))
+                        log.info("saving %s private-config to %s", self.name(), config_path)
                         f.write(config)
                 except OSError as e:
                     self.error_signal.emit(self.id(), "could not export private-config to {}: {}".format(config_path, e))
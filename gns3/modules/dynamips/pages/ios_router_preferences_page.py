@@ -133,6 +133,8 @@ class IOSRouterPreferencesPage(QtGui.QWidget, Ui_IOSRouterPreferencesPageWidget)
                     dst = 'images/IOS/{}'.format(self._ios_routers[key]['image'])
                     upload_thread = UploadFilesThread(self, MainWindow.instance().cloudSettings(), [(src, dst)])
                     upload_thread.completed.connect(self._imageUploadComplete)
+                    upload_thread.error.connect(self._imageUploadError)
+                    self._upload_image_progress_dialog.canceled.connect(upload_thread.stop)
                     upload_thread.start()
                 except Exception as e:
                     self._upload_image_progress_dialog.reject()
@@ -168,6 +170,12 @@ class IOSRouterPreferencesPage(QtGui.QWidget, Ui_IOSRouterPreferencesPageWidget)
             return
         self._upload_image_progress_dialog.accept()
 
+    def _imageUploadError(self, message, stop):
+        if self._upload_image_progress_dialog.wasCanceled():
+            return
+        self._upload_image_progress_dialog.reject()
+        QtGui.QMessageBox.critical(self, "IOS image upload", message)
+
     def _iosRouterEditSlot(self):
         """
         Edits an IOS router.
@@ -225,6 +225,7 @@ class IOU(Module):
 
         self._iou_devices = new_iou_devices.copy()
         self._saveIOUDevices()
+        self.nodes_changed_signal.emit()
 
     def settings(self):
         """
@@ -285,6 +286,7 @@ class IOU(Module):
 
         self._settings.update(settings)
         self._saveSettings()
+        self.nodes_changed_signal.emit()
 
     def _sendSettings(self, server):
         """
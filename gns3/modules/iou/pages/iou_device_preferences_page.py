@@ -115,6 +115,8 @@ class IOUDevicePreferencesPage(QtGui.QWidget, Ui_IOUDevicePreferencesPageWidget)
                     dst = 'images/IOU/{}'.format(self._iou_devices[key]['image'])
                     upload_thread = UploadFilesThread(self, MainWindow.instance().cloudSettings(), [(src, dst)])
                     upload_thread.completed.connect(self._imageUploadComplete)
+                    upload_thread.error.connect(self._imageUploadError)
+                    self._upload_image_progress_dialog.canceled.connect(upload_thread.stop)
                     upload_thread.start()
                 except Exception as e:
                     self._upload_image_progress_dialog.reject()
@@ -126,6 +128,12 @@ class IOUDevicePreferencesPage(QtGui.QWidget, Ui_IOUDevicePreferencesPageWidget)
             return
         self._upload_image_progress_dialog.accept()
 
+    def _imageUploadError(self, message, stop):
+        if self._upload_image_progress_dialog.wasCanceled():
+            return
+        self._upload_image_progress_dialog.reject()
+        QtGui.QMessageBox.critical(self, "IOU image upload", message)
+
     def _iouDeviceEditSlot(self):
         """
         Edits an IOU device.
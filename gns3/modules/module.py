@@ -32,6 +32,9 @@ class Module(QtCore.QObject):
 
     notification_signal = QtCore.Signal(str, str)
 
+    # emitted when the nodes returned by nodes() may have changed
+    nodes_changed_signal = QtCore.Signal()
+
     def __init__(self):
 
         super(Module, self).__init__()
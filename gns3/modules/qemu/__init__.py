@@ -140,6 +140,7 @@ class Qemu(Module):
 
         self._qemu_vms = new_qemu_vms.copy()
         self._saveQemuVMs()
+        self.nodes_changed_signal.emit()
 
     def setProjectFilesDir(self, path):
         """
@@ -249,6 +250,7 @@ class Qemu(Module):
 
         self._settings.update(settings)
         self._saveSettings()
+        self.nodes_changed_signal.emit()
 
     def _sendSettings(self, server):
         """
@@ -161,6 +161,12 @@ class QemuVMPreferencesPage(QtGui.QWidget, Ui_QemuVMPreferencesPageWidget):
             return
         self._upload_image_progress_dialog.accept()
 
+    def _imageUploadError(self, message, stop):
+        if self._upload_image_progress_dialog.wasCanceled():
+            return
+        self._upload_image_progress_dialog.reject()
+        QtGui.QMessageBox.critical(self, "Qemu image upload", message)
+
     def _uploadImages(self, qemu_vm):
         """
         Upload hard drive images to Cloud Files.
@@ -189,6 +195,8 @@ class QemuVMPreferencesPage(QtGui.QWidget, Ui_QemuVMPreferencesPageWidget):
 
             upload_thread = UploadFilesThread(self, MainWindow.instance().cloudSettings(), uploads)
             upload_thread.completed.connect(self._imageUploadComplete)
+            upload_thread.error.connect(self._imageUploadError)
+            self._upload_image_progress_dialog.canceled.connect(upload_thread.stop)
             upload_thread.start()
         except Exception as e:
             self._upload_image_progress_dialog.reject()
@@ -139,6 +139,7 @@ class VirtualBox(Module):
 
         self._virtualbox_vms = new_virtualbox_vms.copy()
         self._saveVirtualBoxVMs()
+        self.nodes_changed_signal.emit()
 
     def setProjectFilesDir(self, path):
         """
@@ -250,6 +251,7 @@ class VirtualBox(Module):
 
         self._settings.update(settings)
         self._saveSettings()
+        self.nodes_changed_signal.emit()
 
     def _sendSettings(self, server):
         """
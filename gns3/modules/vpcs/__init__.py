@@ -181,6 +181,7 @@ class VPCS(Module):
 
         self._settings.update(settings)
         self._saveSettings()
+        self.nodes_changed_signal.emit()
 
     def _sendSettings(self, server):
         """
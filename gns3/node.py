@@ -37,6 +37,7 @@ class Node(QtCore.QObject):
     started_signal = QtCore.Signal()
     stopped_signal = QtCore.Signal()
     suspended_signal = QtCore.Signal()
+    reloaded_signal = QtCore.Signal()
     updated_signal = QtCore.Signal()
     deleted_signal = QtCore.Signal()
     delete_links_signal = QtCore.Signal()
@@ -220,6 +221,14 @@ class Node(QtCore.QObject):
 
         raise NotImplementedError()
 
+    def saveConfig(self):
+        """
+        Tells the server to save the node configuration before
+        the topology is saved. Does nothing by default.
+        """
+
+        pass
+
     def load(self, node_info):
         """
         Loads a node representation
@@ -279,11 +288,11 @@ class Node(QtCore.QObject):
             nio_info["rhost"] = nio.rhost()
             nio_info["rport"] = nio.rport()
 
-            log.debug("creating {} for {} with lport={}, rhost={}, rport={}".format(nio,
-                                                                                    self.name(),
-                                                                                    nio.lport(),
-                                                                                    nio.rhost(),
-                                                                                    nio.rport()))
+            log.debug("creating %s for %s with lport=%s, rhost=%s, rport=%s", nio,
+                      self.name(),
+                      nio.lport(),
+                      nio.rhost(),
+                      nio.rport())
             return nio_info
 
         elif nio_type == "nio_generic_ethernet":
@@ -291,9 +300,9 @@ class Node(QtCore.QObject):
             nio_info["type"] = nio_type
             nio_info["ethernet_device"] = nio.ethernetDevice()
 
-            log.debug("creating {} for {} with Ethernet device {}".format(nio,
-                                                                          self.name(),
-                                                                          nio.ethernetDevice()))
+            log.debug("creating %s for %s with Ethernet device %s", nio,
+                      self.name(),
+                      nio.ethernetDevice())
             return nio_info
 
         elif nio_type == "nio_linux_ethernet":
@@ -301,9 +310,9 @@ class Node(QtCore.QObject):
             nio_info["type"] = nio_type
             nio_info["ethernet_device"] = nio.ethernetDevice()
 
-            log.debug("creating {} for {} with Ethernet device {}".format(nio,
-                                                                          self.name(),
-                                                                          nio.ethernetDevice()))
+            log.debug("creating %s for %s with Ethernet device %s", nio,
+                      self.name(),
+                      nio.ethernetDevice())
             return nio_info
 
         elif nio_type == "nio_tap":
@@ -311,9 +320,9 @@ class Node(QtCore.QObject):
             nio_info["type"] = nio_type
             nio_info["tap_device"] = nio.tapDevice()
 
-            log.debug("creating {} for {} with TAP device {}".format(nio,
-                                                                     self.name(),
-                                                                     nio.tapDevice()))
+            log.debug("creating %s for %s with TAP device %s", nio,
+                      self.name(),
+                      nio.tapDevice())
             return nio_info
 
         elif nio_type == "nio_unix":
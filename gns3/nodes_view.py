@@ -19,18 +19,104 @@
 Nodes view that list all the available nodes to be dragged and dropped on the QGraphics scene.
 """
 
+import bisect
 import pickle
+import re
 from .qt import QtCore, QtGui
 from .modules import MODULES
 
 
+class NodesCatalogue(object):
+    """
+    Catalogue of the nodes provided by the modules with a prefix
+    index to search them by name.
+
+    :param nodes: list of (module index, node data) tuples
+    """
+
+    def __init__(self, nodes):
+
+        self._nodes = nodes
+        self._categories = {}  # category -> set of node positions
+        self._index = []  # sorted list of (word, node position)
+
+        for position, (_, node) in enumerate(nodes):
+            for category in node["categories"]:
+                self._categories.setdefault(category, set()).add(position)
+            name = node["name"].lower()
+            words = set(word for word in re.split(r"[^0-9a-z]+", name) if word)
+            words.add(name)
+            for word in words:
+                self._index.append((word, position))
+        self._index.sort()
+
+    def __len__(self):
+
+        return len(self._nodes)
+
+    def node(self, position):
+        """
+        Returns a node.
+
+        :param position: node position in the catalogue
+
+        :returns: (module index, node data) tuple
+        """
+
+        return self._nodes[position]
+
+    def category(self, category):
+        """
+        Returns the nodes of a category.
+
+        :param category: category (None = all nodes)
+
+        :returns: set of node positions
+        """
+
+        if category is None:
+            return set(range(len(self._nodes)))
+        return self._categories.get(category, set())
+
+    def search(self, prefix, candidates=None):
+        """
+        Returns the nodes having a word of their name starting with a prefix.
+
+        :param prefix: prefix to search (case insensitive)
+        :param candidates: only search in these node positions (optional)
+
+        :returns: set of node positions
+        """
+
+        prefix = prefix.lower().strip()
+        if not prefix:
+            return set(range(len(self._nodes))) if candidates is None else set(candidates)
+
+        found = set()
+        start = bisect.bisect_left(self._index, (prefix, -1))
+        for word, position in self._index[start:]:
+            if not word.startswith(prefix):
+                break
+            found.add(position)
+        if candidates is not None:
+            found &= candidates
+        return found
+
+
 class NodesView(QtGui.QTreeWidget):
     """
     Nodes view to list the nodes.
 
+    All the nodes are loaded once in the view and only shown or hidden
+    when browsing categories or filtering, the nodes are loaded again
+    only when the settings of a module have changed.
+
     :param parent: parent widget
     """
 
+    # rasterized icons shared by all the views (symbol path -> QIcon)
+    _icons = {}
+
     def __init__(self, parent=None):
 
         QtGui.QTreeWidget.__init__(self, parent)
@@ -38,6 +124,80 @@ class NodesView(QtGui.QTreeWidget):
         # enables the possibility to drag items.
         self.setDragEnabled(True)
 
+        self._catalogue = None
+        self._items = []
+        self._category = None
+        self._filter = ""
+        self._filtered = set()
+        self._visible = set()
+
+        for module in MODULES:
+            module.instance().nodes_changed_signal.connect(self.invalidate)
+
+    def invalidate(self):
+        """
+        Marks the nodes as outdated, they will be loaded
+        again the next time the view is populated.
+        """
+
+        self._catalogue = None
+        if self.isVisible():
+            self.populateNodesView(self._category)
+
+    def _symbolIcon(self, symbol):
+        """
+        Returns an icon rasterized once for a symbol.
+
+        :param symbol: symbol path
+
+        :returns: QIcon instance
+        """
+
+        if symbol not in self._icons:
+            pixmap = QtGui.QIcon(symbol).pixmap(self.iconSize())
+            self._icons[symbol] = QtGui.QIcon(pixmap)
+        return self._icons[symbol]
+
+    def _loadCatalogue(self):
+        """
+        Loads the nodes of all the modules in the view.
+        """
+
+        nodes = []
+        for module_index, module in enumerate(MODULES):
+            for node in module.instance().nodes():
+                nodes.append((module_index, node))
+        self._catalogue = NodesCatalogue(nodes)
+
+        self.clear()
+        self._items = []
+        self.setSortingEnabled(False)
+        for position in range(len(self._catalogue)):
+            _, node = self._catalogue.node(position)
+            item = QtGui.QTreeWidgetItem(self)
+            item.setIcon(0, self._symbolIcon(node["default_symbol"]))
+            item.setText(0, node["name"])
+            item.setData(0, QtCore.Qt.UserRole, position)
+            item.setHidden(True)
+            self._items.append(item)
+        self.sortByColumn(0, QtCore.Qt.AscendingOrder)
+
+        self._filtered = self._catalogue.search(self._filter)
+        self._visible = set()
+
+    def _updateVisibleItems(self, visible):
+        """
+        Shows and hides only the items whose visibility has changed.
+
+        :param visible: set of node positions to show
+        """
+
+        for position in self._visible - visible:
+            self._items[position].setHidden(True)
+        for position in visible - self._visible:
+            self._items[position].setHidden(False)
+        self._visible = visible
+
     def populateNodesView(self, category):
         """
         Populates the nodes view with the device list of the specified
@@ -46,16 +206,43 @@ class NodesView(QtGui.QTreeWidget):
         :param category: category of device to list
         """
 
-        for module in MODULES:
-            for node in module.instance().nodes():
-                if category is not None and category not in node["categories"]:
-                    continue
-                item = QtGui.QTreeWidgetItem(self)
-                item.setIcon(0, QtGui.QIcon(node["default_symbol"]))
-                item.setText(0, node["name"])
-                item.setData(0, QtCore.Qt.UserRole, node)
+        if self._catalogue is None:
+            self._loadCatalogue()
+        self._category = category
+        self._updateVisibleItems(self._catalogue.category(category) & self._filtered)
 
-        self.sortByColumn(0, QtCore.Qt.AscendingOrder)
+    def setFilter(self, text):
+        """
+        Shows only the nodes with a word of their name starting with text.
+
+        :param text: filter text
+        """
+
+        text = text.lower().strip()
+        if self._catalogue is not None:
+            if self._filter and text.startswith(self._filter):
+                # the filter is more restrictive, only search in the current results
+                self._filtered = self._catalogue.search(text, self._filtered)
+            else:
+                self._filtered = self._catalogue.search(text)
+            self._updateVisibleItems(self._catalogue.category(self._category) & self._filtered)
+        self._filter = text
+
+    def _nodeData(self, position):
+        """
+        Returns up to date node data for a node, the module
+        is asked again so it can choose a server for it.
+
+        :param position: node position in the catalogue
+
+        :returns: node data (dictionary)
+        """
+
+        module_index, node = self._catalogue.node(position)
+        for module_node in MODULES[module_index].instance().nodes():
+            if module_node["class"] == node["class"] and module_node["name"] == node["name"]:
+                return module_node
+        return node
 
     def mouseMoveEvent(self, event):
         """
@@ -73,7 +260,7 @@ class NodesView(QtGui.QTreeWidget):
         icon = item.icon(0)
 
         # retrieve the node class from the item data
-        node = item.data(0, QtCore.Qt.UserRole)
+        node = self._nodeData(item.data(0, QtCore.Qt.UserRole))
         mimedata = QtCore.QMimeData()
 
         # pickle the node class, set the Mime type and data
@@ -0,0 +1,294 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Dock widget showing an overview (minimap) of the scene.
+The scene is rendered once in a low resolution pixmap which is
+then refreshed only where the scene has changed.
+"""
+
+from .qt import QtCore, QtGui
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class OverviewView(QtGui.QWidget):
+    """
+    Minimap of the scene displayed by a graphics view.
+
+    :param view: GraphicsView instance
+    :param parent: parent widget
+    """
+
+    # above this number of changed regions, the whole pixmap is rendered again
+    MAX_DIRTY_REGIONS = 50
+
+    # delay before rendering the changed regions (in milliseconds)
+    REFRESH_DELAY = 200
+
+    def __init__(self, view, parent=None):
+
+        QtGui.QWidget.__init__(self, parent)
+        self.setMinimumSize(100, 75)
+        self.setCursor(QtCore.Qt.OpenHandCursor)
+
+        self._view = view
+        self._scene = view.scene()
+        self._pixmap = None
+        self._dirty_regions = []
+        self._full_refresh = True
+
+        self._refresh_timer = QtCore.QTimer(self)
+        self._refresh_timer.setSingleShot(True)
+        self._refresh_timer.setInterval(self.REFRESH_DELAY)
+        self._refresh_timer.timeout.connect(self._refreshSlot)
+
+        self._scene.changed.connect(self._sceneChangedSlot)
+        self._scene.sceneRectChanged.connect(self._sceneRectChangedSlot)
+
+        # the viewport rectangle must follow the main view
+        for scroll_bar in (view.horizontalScrollBar(), view.verticalScrollBar()):
+            scroll_bar.valueChanged.connect(self.update)
+            scroll_bar.rangeChanged.connect(self.update)
+
+    def _sourceRect(self):
+        """
+        Returns the scene area represented by the minimap.
+
+        :returns: QRectF instance
+        """
+
+        return self._scene.sceneRect()
+
+    def _targetRect(self):
+        """
+        Returns the area of this widget where the scene is drawn,
+        keeping the aspect ratio of the scene.
+
+        :returns: QRectF instance
+        """
+
+        source = self._sourceRect()
+        if source.isEmpty():
+            return QtCore.QRectF()
+        scale = min(self.width() / source.width(), self.height() / source.height())
+        width = source.width() * scale
+        height = source.height() * scale
+        return QtCore.QRectF((self.width() - width) / 2.0, (self.height() - height) / 2.0, width, height)
+
+    def _sceneToWidget(self, rect):
+        """
+        Maps a scene rectangle to this widget coordinates.
+
+        :param rect: QRectF instance in scene coordinates
+
+        :returns: QRectF instance
+        """
+
+        source = self._sourceRect()
+        target = self._targetRect()
+        if source.isEmpty():
+            return QtCore.QRectF()
+        scale = target.width() / source.width()
+        return QtCore.QRectF(target.x() + (rect.x() - source.x()) * scale,
+                             target.y() + (rect.y() - source.y()) * scale,
+                             rect.width() * scale,
+                             rect.height() * scale)
+
+    def _widgetToScene(self, pos):
+        """
+        Maps a point of this widget to scene coordinates.
+
+        :param pos: QPoint or QPointF instance
+
+        :returns: QPointF instance
+        """
+
+        source = self._sourceRect()
+        target = self._targetRect()
+        if target.isEmpty():
+            return source.center()
+        scale = source.width() / target.width()
+        return QtCore.QPointF(source.x() + (pos.x() - target.x()) * scale,
+                              source.y() + (pos.y() - target.y()) * scale)
+
+    def _sceneChangedSlot(self, regions):
+        """
+        Slot called when the scene has changed.
+
+        :param regions: list of changed QRectF (scene coordinates)
+        """
+
+        if self._full_refresh:
+            pass
+        elif len(self._dirty_regions) + len(regions) > self.MAX_DIRTY_REGIONS:
+            self._full_refresh = True
+            self._dirty_regions = []
+        else:
+            self._dirty_regions.extend(regions)
+        self._scheduleRefresh()
+
+    def _sceneRectChangedSlot(self, rect):
+        """
+        Slot called when the scene rectangle has changed.
+
+        :param rect: new scene QRectF
+        """
+
+        self._full_refresh = True
+        self._dirty_regions = []
+        self._scheduleRefresh()
+
+    def _scheduleRefresh(self):
+        """
+        Schedules a refresh of the cached pixmap if the minimap is visible.
+        """
+
+        if self.isVisible() and not self._refresh_timer.isActive():
+            self._refresh_timer.start()
+
+    def _refreshSlot(self):
+        """
+        Renders the changed parts of the scene into the cached pixmap.
+        """
+
+        if not self.isVisible():
+            return
+
+        size = self.size()
+        if self._pixmap is None or self._pixmap.size() != size:
+            self._pixmap = QtGui.QPixmap(size)
+            self._full_refresh = True
+
+        target = self._targetRect()
+        painter = QtGui.QPainter(self._pixmap)
+        if self._full_refresh:
+            painter.fillRect(self._pixmap.rect(), self.palette().color(QtGui.QPalette.Window))
+            painter.fillRect(target, QtCore.Qt.white)
+            self._scene.render(painter, target, self._sourceRect())
+        else:
+            source = self._sourceRect()
+            painter.setClipRect(target)
+            for region in self._dirty_regions:
+                region = region.intersected(source)
+                if region.isEmpty():
+                    continue
+                # align the region on whole pixels to avoid rendering artifacts
+                region_target = QtCore.QRectF(self._sceneToWidget(region).toAlignedRect())
+                region = QtCore.QRectF(self._widgetToScene(region_target.topLeft()),
+                                       self._widgetToScene(region_target.bottomRight()))
+                painter.fillRect(region_target, QtCore.Qt.white)
+                self._scene.render(painter, region_target, region)
+        painter.end()
+
+        self._full_refresh = False
+        self._dirty_regions = []
+        self.update()
+
+    def paintEvent(self, event):
+        """
+        Draws the cached pixmap and the rectangle of the main view.
+
+        :param event: QPaintEvent instance
+        """
+
+        painter = QtGui.QPainter(self)
+        if self._pixmap is not None:
+            painter.drawPixmap(0, 0, self._pixmap)
+
+        visible_rect = self._view.mapToScene(self._view.viewport().rect()).boundingRect()
+        painter.setPen(QtGui.QPen(QtCore.Qt.red, 1))
+        painter.setBrush(QtGui.QColor(255, 0, 0, 30))
+        painter.drawRect(self._sceneToWidget(visible_rect))
+        painter.end()
+
+    def resizeEvent(self, event):
+        """
+        Renders the whole scene again when this widget is resized.
+
+        :param event: QResizeEvent instance
+        """
+
+        self._full_refresh = True
+        self._scheduleRefresh()
+        QtGui.QWidget.resizeEvent(self, event)
+
+    def showEvent(self, event):
+        """
+        Refreshes the cached pixmap when the minimap is shown,
+        changes are not rendered while it is hidden.
+
+        :param event: QShowEvent instance
+        """
+
+        self._full_refresh = True
+        self._dirty_regions = []
+        self._refresh_timer.start(0)
+        QtGui.QWidget.showEvent(self, event)
+
+    def mousePressEvent(self, event):
+        """
+        Centers the main view where the user has clicked.
+
+        :param event: QMouseEvent instance
+        """
+
+        if event.button() == QtCore.Qt.LeftButton:
+            self.setCursor(QtCore.Qt.ClosedHandCursor)
+            self._view.centerOn(self._widgetToScene(event.pos()))
+        else:
+            QtGui.QWidget.mousePressEvent(self, event)
+
+    def mouseMoveEvent(self, event):
+        """
+        Moves the main view while the user is dragging on the minimap.
+
+        :param event: QMouseEvent instance
+        """
+
+        if event.buttons() & QtCore.Qt.LeftButton:
+            self._view.centerOn(self._widgetToScene(event.pos()))
+        else:
+            QtGui.QWidget.mouseMoveEvent(self, event)
+
+    def mouseReleaseEvent(self, event):
+        """
+        Handles all mouse release events.
+
+        :param event: QMouseEvent instance
+        """
+
+        self.setCursor(QtCore.Qt.OpenHandCursor)
+        QtGui.QWidget.mouseReleaseEvent(self, event)
+
+
+class OverviewDockWidget(QtGui.QDockWidget):
+    """
+    Dock widget containing the scene overview.
+
+    :param parent: parent widget
+    :param view: GraphicsView instance
+    """
+
+    def __init__(self, parent, view):
+
+        QtGui.QDockWidget.__init__(self, "Overview", parent)
+        self.setObjectName("uiOverviewDockWidget")
+        self.setAllowedAreas(QtCore.Qt.LeftDockWidgetArea | QtCore.Qt.RightDockWidgetArea)
+        self.uiOverviewView = OverviewView(view, self)
+        self.setWidget(self.uiOverviewView)
@@ -147,6 +147,7 @@ class CloudPreferencesPage(QtGui.QWidget, Ui_CloudPreferencesPageWidget):
         self.uiNumOfInstancesSpinBox.setValue(self.settings['instances_per_project'])
         self.uiTermsCheckBox.setChecked(self.settings['accepted_terms'])
         self.uiTimeoutSpinBox.setValue(self.settings['instance_timeout'])
+        self.uiSyncProjectsCheckBox.setChecked(self.settings['sync_projects'])
         self.uiImageTemplateComboBox.setCurrentIndex(self._get_image_index(default_image))
 
         idx = self._get_flavor_index(default_flavor)
@@ -179,6 +180,7 @@ class CloudPreferencesPage(QtGui.QWidget, Ui_CloudPreferencesPageWidget):
                 self.settings['new_instance_flavor'] = self.flavor_index_id[self.uiNewInstanceFlavorComboBox.currentIndex()]
             self.settings['accepted_terms'] = self.uiTermsCheckBox.isChecked()
             self.settings['instance_timeout'] = self.uiTimeoutSpinBox.value()
+            self.settings['sync_projects'] = self.uiSyncProjectsCheckBox.isChecked()
             if self.uiImageTemplateComboBox.currentIndex() >= 0:
                 self.settings['default_image'] = \
                     self.image_index_id[self.uiImageTemplateComboBox.currentIndex()]
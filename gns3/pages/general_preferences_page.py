@@ -212,6 +212,10 @@ class GeneralPreferencesPage(QtGui.QWidget, Ui_GeneralPreferencesPageWidget):
         self.uiCloseConsoleWindowsOnDeleteCheckBox.setChecked(settings["auto_close_console"])
         self.uiBringConsoleWindowToFrontCheckBox.setChecked(settings["bring_console_to_front"])
         self.uiDelayConsoleAllSpinBox.setValue(settings["delay_console_all"])
+        self.uiEmbeddedConsoleCheckBox.setChecked(settings["embedded_console"])
+        self.uiEmbeddedConsoleScrollbackSpinBox.setValue(settings["embedded_console_scrollback"])
+        self.uiCaptureConsoleSessionsCheckBox.setChecked(settings["capture_console_sessions"])
+        self.uiConsoleMaxLinesSpinBox.setValue(settings["console_max_lines"])
 
     def _populateGraphicsViewSettingWidgets(self, settings):
         """
@@ -263,6 +267,10 @@ class GeneralPreferencesPage(QtGui.QWidget, Ui_GeneralPreferencesPageWidget):
         new_settings["auto_close_console"] = self.uiCloseConsoleWindowsOnDeleteCheckBox.isChecked()
         new_settings["bring_console_to_front"] = self.uiBringConsoleWindowToFrontCheckBox.isChecked()
         new_settings["delay_console_all"] = self.uiDelayConsoleAllSpinBox.value()
+        new_settings["embedded_console"] = self.uiEmbeddedConsoleCheckBox.isChecked()
+        new_settings["embedded_console_scrollback"] = self.uiEmbeddedConsoleScrollbackSpinBox.value()
+        new_settings["capture_console_sessions"] = self.uiCaptureConsoleSessionsCheckBox.isChecked()
+        new_settings["console_max_lines"] = self.uiConsoleMaxLinesSpinBox.value()
 
         from ..main_window import MainWindow
         MainWindow.instance().setSettings(new_settings)
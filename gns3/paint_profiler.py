@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Paint profiler for the graphics scene: measures the time spent
+painting frames and items (per item class).
+"""
+
+import collections
+import csv
+import functools
+import time
+
+from .items.node_item import NodeItem
+from .items.ethernet_link_item import EthernetLinkItem
+from .items.serial_link_item import SerialLinkItem
+from .items.note_item import NoteItem
+from .items.image_item import ImageItem
+from .items.rectangle_item import RectangleItem
+from .items.ellipse_item import EllipseItem
+
+import logging
+log = logging.getLogger(__name__)
+
+# item classes which paint() method is profiled
+PROFILED_ITEM_CLASSES = (NodeItem,
+                         EthernetLinkItem,
+                         SerialLinkItem,
+                         NoteItem,
+                         ImageItem,
+                         RectangleItem,
+                         EllipseItem)
+
+
+class PaintProfiler(object):
+    """
+    Paint profiler.
+    """
+
+    # number of frame durations kept to compute averages
+    max_frames = 1000
+
+    def __init__(self):
+
+        self._enabled = False
+        self._original_paint_methods = {}
+        self.reset()
+
+    def reset(self):
+        """
+        Resets the collected statistics.
+        """
+
+        # item class name -> [number of paint calls, total paint time]
+        self._item_stats = collections.OrderedDict((cls.__name__, [0, 0.0]) for cls in PROFILED_ITEM_CLASSES)
+        # (timestamp, duration) of the last frames
+        self._frames = collections.deque(maxlen=self.max_frames)
+        self._frame_count = 0
+        self._frame_total_time = 0.0
+
+    def isEnabled(self):
+        """
+        Returns either the profiler is enabled or not.
+
+        :returns: boolean
+        """
+
+        return self._enabled
+
+    def enable(self):
+        """
+        Starts profiling by wrapping the paint() method of the item classes.
+        """
+
+        if self._enabled:
+            return
+        for cls in PROFILED_ITEM_CLASSES:
+            paint = cls.__dict__["paint"]
+            self._original_paint_methods[cls] = paint
+            cls.paint = self._profiledPaint(cls.__name__, paint)
+        self._enabled = True
+        log.info("paint profiler enabled")
+
+    def disable(self):
+        """
+        Stops profiling and restores the original paint() methods.
+        """
+
+        if not self._enabled:
+            return
+        for cls, paint in self._original_paint_methods.items():
+            cls.paint = paint
+        self._original_paint_methods.clear()
+        self._enabled = False
+        log.info("paint profiler disabled")
+
+    def _profiledPaint(self, class_name, paint):
+        """
+        Wraps a paint() method to measure its execution time.
+
+        :param class_name: item class name
+        :param paint: paint method
+
+        :returns: wrapped paint method
+        """
+
+        profiler = self
+
+        @functools.wraps(paint)
+        def profiled_paint(item, painter, option, widget=None):
+            start = time.perf_counter()
+            try:
+                return paint(item, painter, option, widget)
+            finally:
+                item_stats = profiler._item_stats[class_name]
+                item_stats[0] += 1
+                item_stats[1] += time.perf_counter() - start
+        return profiled_paint
+
+    def recordFrame(self, duration):
+        """
+        Records the time spent to paint a frame.
+
+        :param duration: duration in seconds
+        """
+
+        self._frames.append((time.perf_counter(), duration))
+        self._frame_count += 1
+        self._frame_total_time += duration
+
+    def fps(self):
+        """
+        Returns the number of frames painted during the last second.
+
+        :returns: integer
+        """
+
+        now = time.perf_counter()
+        return len([timestamp for timestamp, _ in self._frames if now - timestamp <= 1.0])
+
+    def lastFrameTime(self):
+        """
+        Returns the time spent to paint the last frame.
+
+        :returns: duration in seconds
+        """
+
+        if not self._frames:
+            return 0.0
+        return self._frames[-1][1]
+
+    def averageFrameTime(self):
+        """
+        Returns the average time spent to paint a frame.
+
+        :returns: duration in seconds
+        """
+
+        if not self._frame_count:
+            return 0.0
+        return self._frame_total_time / self._frame_count
+
+    def itemStats(self):
+        """
+        Returns the paint statistics per item class.
+
+        :returns: list of (class name, number of paint calls, total time in seconds)
+        """
+
+        return [(name, calls, total) for name, (calls, total) in self._item_stats.items()]
+
+    def summary(self):
+        """
+        Returns a summary of the statistics, one line per entry.
+
+        :returns: list of strings
+        """
+
+        lines = ["FPS: {}".format(self.fps()),
+                 "Frame: {:.2f} ms (avg {:.2f} ms over {} frames)".format(self.lastFrameTime() * 1000,
+                                                                         self.averageFrameTime() * 1000,
+                                                                         self._frame_count)]
+        for name, calls, total in self.itemStats():
+            if calls:
+                lines.append("{}: {:.2f} ms in {} calls ({:.3f} ms/call)".format(name, total * 1000, calls, total * 1000 / calls))
+        return lines
+
+    def exportCSV(self, path):
+        """
+        Exports the statistics to a CSV file.
+
+        :param path: path to the CSV file
+        """
+
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(["name", "calls", "total_ms", "average_ms"])
+            writer.writerow(["frame", self._frame_count, self._frame_total_time * 1000, self.averageFrameTime() * 1000])
+            for name, calls, total in self.itemStats():
+                average = total * 1000 / calls if calls else 0.0
+                writer.writerow([name, calls, total * 1000, average])
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of PaintProfiler.
+
+        :returns: instance of PaintProfiler
+        """
+
+        if not hasattr(PaintProfiler, "_instance"):
+            PaintProfiler._instance = PaintProfiler()
+        return PaintProfiler._instance
@@ -21,6 +21,7 @@ It is inspired by PyCute : http://gerard.vermeulen.free.fr
 """
 
 import sys
+import threading
 from .qt import QtCore, QtGui
 #from code import InteractiveInterpreter as Interpreter
 
@@ -48,12 +49,40 @@ class PyCutExt(QtGui.QTextEdit):
     Creating, displaying and controlling PyQt widgets from the Python command
     line interpreter is very hard, if not, impossible.  PyCute solves this
     problem by interfacing the Python interpreter to a PyQt widget.
+
+    Written text is queued and inserted in batches when the event loop
+    runs again, the document keeps a maximum number of lines. Text written
+    by other threads is inserted by the GUI thread.
     """
 
+    # emitted by the other threads to have the queued text inserted
+    _flush_request_signal = QtCore.Signal()
+
+    # pending text is written immediately above this size (in characters)
+    max_pending_size = 256 * 1024
+
     def __init__(self, interpreter, message="", log="", parent=None):
 
         QtGui.QTextEdit.__init__(self, parent)
 
+        # queued writes: list of [text, format name], shared with the other threads
+        self._pending_writes = []
+        self._pending_size = 0
+        self._pending_lock = threading.Lock()
+        self._flush_requested = False
+        self._write_timer = QtCore.QTimer(self)
+        self._write_timer.setSingleShot(True)
+        self._write_timer.setInterval(0)
+        self._write_timer.timeout.connect(self.flushWrites)
+        self._flush_request_signal.connect(self._flushRequestSlot, QtCore.Qt.QueuedConnection)
+        self._char_formats = {}
+        for name, color in (("normal", QtGui.QColor(0, 0, 0)),  # black
+                            ("error", QtGui.QColor(255, 0, 0)),  # red
+                            ("warning", QtGui.QColor(255, 128, 0))):  # orange
+            char_format = QtGui.QTextCharFormat()
+            char_format.setForeground(QtGui.QBrush(color))
+            self._char_formats[name] = char_format
+
         self.interpreter = interpreter
         self.colorizer = SyntaxColor()
 
@@ -119,11 +148,23 @@ class PyCutExt(QtGui.QTextEdit):
         cursor.movePosition(operation, mode)
         self.setTextCursor(cursor)
 
+    def setMaximumBlockCount(self, count):
+        """
+        Sets the maximum number of lines kept in the console,
+        the oldest lines are removed first.
+
+        :param count: maximum number of lines (0 = unlimited)
+        """
+
+        self.flushWrites()
+        self.document().setMaximumBlockCount(count)
+
     def flush(self):
         """
         Simulate stdin, stdout, and stderr.
         """
-        pass
+
+        self.flushWrites()
 
     def isatty(self):
         """
@@ -136,6 +177,7 @@ class PyCutExt(QtGui.QTextEdit):
         Simulate stdin, stdout, and stderr.
         """
 
+        self.flushWrites()
         self.reading = 1
         self._clearLine()
         self.moveCursor(QtGui.QTextCursor.End)
@@ -149,30 +191,86 @@ class PyCutExt(QtGui.QTextEdit):
     def write(self, text, error=False, warning=False):
         """
         Simulates stdin, stdout, and stderr.
+        The text is queued and written by flushWrites().
         """
 
+        if error:
+            format_name = "error"
+        elif warning:
+            format_name = "warning"
+        else:
+            format_name = "normal"
+
+        with self._pending_lock:
+            if self._pending_writes and self._pending_writes[-1][1] == format_name:
+                self._pending_writes[-1][0] += text
+            else:
+                self._pending_writes.append([text, format_name])
+            self._pending_size += len(text)
+            pending_size = self._pending_size
+
+        if not self._inGUIThread():
+            self._requestFlush()
+        elif pending_size >= self.max_pending_size:
+            self.flushWrites()
+        elif not self._write_timer.isActive():
+            self._write_timer.start()
+
+    def _inGUIThread(self):
+        """
+        Returns either the caller runs in the thread of this widget.
+        """
+
+        return QtCore.QThread.currentThread() == self.thread()
+
+    def _requestFlush(self):
+        """
+        Asks the GUI thread to insert the queued text (called from the other threads).
+        """
+
+        with self._pending_lock:
+            if self._flush_requested:
+                return
+            self._flush_requested = True
+        self._flush_request_signal.emit()
+
+    def _flushRequestSlot(self):
+        """
+        Slot called in the GUI thread when another thread has queued text.
+        """
+
+        if not self._write_timer.isActive():
+            self._write_timer.start()
+
+    def flushWrites(self):
+        """
+        Inserts the queued text at the end of the console.
+        """
+
+        if not self._inGUIThread():
+            self._requestFlush()
+            return
+
+        self._write_timer.stop()
+        with self._pending_lock:
+            pending_writes = self._pending_writes
+            self._pending_writes = []
+            self._pending_size = 0
+            self._flush_requested = False
+        if not pending_writes:
+            return
+
         cursor = self.textCursor()
         cursor.movePosition(QtGui.QTextCursor.End)
-
-        pos1 = cursor.position()
-        cursor.insertText(text)
+        cursor.beginEditBlock()
+        for text, format_name in pending_writes:
+            cursor.insertText(text, self._char_formats[format_name])
+        cursor.endEditBlock()
 
         self.cursor_pos = cursor.position()
         self.setTextCursor(cursor)
         self.ensureCursorVisible()
 
-        # Set the format
-        cursor.setPosition(pos1, QtGui.QTextCursor.KeepAnchor)
-        char_format = cursor.charFormat()
-        if error:
-            color = QtGui.QColor(255, 0, 0)  # red
-        elif warning:
-            color = QtGui.QColor(255, 128, 0)  # orange
-        else:
-            color = QtGui.QColor(0, 0, 0)  # black
-        char_format.setForeground(QtGui.QBrush(color))
-        cursor.setCharFormat(char_format)
-
     def writelines(self, text):
         """
         Simulate stdin, stdout, and stderr.
@@ -220,6 +318,7 @@ class PyCutExt(QtGui.QTextEdit):
         self.line = self.line[:self.point] + text + self.line[self.point:]
         self.point += len(text)
 
+        self.flushWrites()
         cursor = self.textCursor()
         cursor.insertText(text)
         self.color_line()
@@ -232,6 +331,9 @@ class PyCutExt(QtGui.QTextEdit):
         text = e.text()
         key = e.key()
 
+        # the prompt must be written before handling the key
+        self.flushWrites()
+
         # Keep the cursor after the last prompt.
         self.moveCursor(QtGui.QTextCursor.End)
 
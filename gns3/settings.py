@@ -213,6 +213,10 @@ GENERAL_SETTINGS = {
     "bring_console_to_front": True,
     "delay_console_all": 500,
     "default_local_news": False,
+    "console_max_lines": 10000,
+    "embedded_console": False,
+    "embedded_console_scrollback": 5000,
+    "capture_console_sessions": False,
 }
 
 GENERAL_SETTING_TYPES = {
@@ -230,6 +234,10 @@ GENERAL_SETTING_TYPES = {
     "bring_console_to_front": bool,
     "delay_console_all": int,
     "default_local_news": bool,
+    "console_max_lines": int,
+    "embedded_console": bool,
+    "embedded_console_scrollback": int,
+    "capture_console_sessions": bool,
 }
 
 GRAPHICS_VIEW_SETTINGS = {
@@ -279,6 +287,9 @@ CLOUD_SETTINGS = {
     "instance_timeout": 30,
     "default_image": "",
     "gns3_ias_url": "http://ias.gns3.net:8888",
+    # export only the project files changed since the last export instead of a zip,
+    # projects exported this way cannot be imported by older versions
+    "sync_projects": False,
 }
 
 CLOUD_SETTINGS_TYPES = {
@@ -295,6 +306,7 @@ CLOUD_SETTINGS_TYPES = {
     "instance_timeout": int,
     "default_image": str,
     "gns3_ias_url": str,
+    "sync_projects": bool,
 }
 
 # TODO proof of concept, needs review
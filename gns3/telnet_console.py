@@ -60,15 +60,24 @@ class ConsoleThread(QThread):
             raise
 
 
-def telnetConsole(name, host, port, callback=None):
+def telnetConsole(name, host, port, callback=None, lazy=False):
     """
-    Start a Telnet console program.
+    Start a Telnet console program or open a built-in console tab.
 
+    :param name: device name
     :param host: host or IP address
     :param port: port number
+    :param callback: function called with (name, host, port) when the console is closed
+    :param lazy: only connect a built-in console when its tab is shown
     """
 
-    command = MainWindow.instance().telnetConsoleCommand()
+    main_window = MainWindow.instance()
+    if main_window.settings()["embedded_console"]:
+        log.info("opening built-in console to %s:%s", host, port)
+        main_window.uiTelnetConsoleDockWidget.openConsole(name, host, port, callback, lazy)
+        return
+
+    command = main_window.telnetConsoleCommand()
     if not command:
         return
 
@@ -78,7 +87,7 @@ def telnetConsole(name, host, port, callback=None):
     command = command.replace("%d", name)
     log.info('starting telnet console "{}"'.format(command))
 
-    console_thread = ConsoleThread(MainWindow.instance(), command, name, host, port)
+    console_thread = ConsoleThread(main_window, command, name, host, port)
     if callback is not None:
         console_thread.consoleDone.connect(callback)
 
@@ -22,13 +22,13 @@ Handles the saving and loading of a topology.
 
 import os
 
-from .qt import QtCore, QtGui, QtSvg
+from .qt import QtCore, QtSvg
 from .items.node_item import NodeItem
-from .items.link_item import LinkItem
 from .items.note_item import NoteItem
 from .items.rectangle_item import RectangleItem
 from .items.ellipse_item import EllipseItem
 from .items.image_item import ImageItem
+from .utils.image_cache import ImageCache
 from .servers import Servers
 from .modules import MODULES
 from .modules.module_error import ModuleError
@@ -87,6 +87,12 @@ class Topology(object):
         self._resources_type = "local"
         self._instances = []
 
+        # registry of the graphical items on the scene, maintained
+        # when items are added or removed to avoid scanning the scene.
+        self._node_items = {}
+        self._link_items = {}
+        self._node_link_items = {}
+
     def addNode(self, node):
         """
         Adds a new node to this topology.
@@ -106,6 +112,8 @@ class Topology(object):
 
         if node in self._nodes:
             self._nodes.remove(node)
+        self._node_items.pop(node.id(), None)
+        self._node_link_items.pop(node.id(), None)
 
     def getNode(self, node_id):
         """
@@ -138,6 +146,12 @@ class Topology(object):
 
         if link in self._links:
             self._links.remove(link)
+        link_item = self._link_items.pop(link.id(), None)
+        if link_item:
+            for node_item in (link_item.sourceItem(), link_item.destinationItem()):
+                link_items = self._node_link_items.get(node_item.node().id())
+                if link_items:
+                    link_items.discard(link_item)
 
     def getLink(self, link_id):
         """
@@ -151,6 +165,72 @@ class Topology(object):
                 return link
         return None
 
+    def addNodeItem(self, node_item):
+        """
+        Registers a node item that has been added to the scene.
+
+        :param node_item: NodeItem instance
+        """
+
+        node_id = node_item.node().id()
+        self._node_items[node_id] = node_item
+        self._node_link_items.setdefault(node_id, set())
+
+    def getNodeItem(self, node_id):
+        """
+        Lookups for a node item using its node identifier.
+
+        :param node_id: node identifier
+
+        :returns: NodeItem instance or None
+        """
+
+        return self._node_items.get(node_id)
+
+    def nodeItems(self):
+        """
+        Returns all the node items on the scene.
+
+        :returns: list of NodeItem instances
+        """
+
+        return list(self._node_items.values())
+
+    def addLinkItem(self, link_item):
+        """
+        Registers a link item that has been added to the scene.
+
+        :param link_item: LinkItem instance
+        """
+
+        self._link_items[link_item.link().id()] = link_item
+        for node_item in (link_item.sourceItem(), link_item.destinationItem()):
+            self._node_link_items.setdefault(node_item.node().id(), set()).add(link_item)
+
+    def getLinkItem(self, link_id):
+        """
+        Lookups for a link item using its link identifier.
+
+        :param link_id: link identifier
+
+        :returns: LinkItem instance or None
+        """
+
+        return self._link_items.get(link_id)
+
+    def linkItems(self, node_id=None):
+        """
+        Returns the link items on the scene.
+
+        :param node_id: only returns the link items connected to this node (optional)
+
+        :returns: list of LinkItem instances
+        """
+
+        if node_id is not None:
+            return list(self._node_link_items.get(node_id, ()))
+        return list(self._link_items.values())
+
     def addNote(self, note):
         """
         Adds a new note to this topology.
@@ -332,10 +412,52 @@ class Topology(object):
         self._ellipses.clear()
         self._images.clear()
         self._initialized_nodes.clear()
+        self._node_items.clear()
+        self._link_items.clear()
+        self._node_link_items.clear()
         self._resources_type = "local"
         self._instances = []
         log.info("topology has been reset")
 
+    def _dumpNodeGuiSettings(self, node_info):
+        """
+        Adds the GUI settings of a node to its representation.
+
+        :param node_info: node representation (dictionary)
+        """
+
+        item = self.getNodeItem(node_info["id"])
+        if not item:
+            return
+        node_info["x"] = item.x()
+        node_info["y"] = item.y()
+        if item.zValue() != 1.0:
+            node_info["z"] = item.zValue()
+        if item.label():
+            node_info["label"] = item.label().dump()
+        default_symbol_path = item.defaultRenderer().objectName()
+        if default_symbol_path:
+            node_info["default_symbol"] = default_symbol_path
+        hover_symbol_path = item.hoverRenderer().objectName()
+        if hover_symbol_path:
+            node_info["hover_symbol"] = hover_symbol_path
+
+    def dumpNode(self, node, include_gui_data=True):
+        """
+        Creates a representation of a single node, the node
+        configuration is not saved on the server.
+
+        :param node: Node instance
+        :param include_gui_data: either to include or not the GUI specific info.
+
+        :returns: node representation
+        """
+
+        node_info = node.dump()
+        if include_gui_data:
+            self._dumpNodeGuiSettings(node_info)
+        return node_info
+
     def _dump_gui_settings(self, topology):
         """
         Adds GUI settings to the topology when saving a topology.
@@ -345,34 +467,22 @@ class Topology(object):
 
         from .main_window import MainWindow
         main_window = MainWindow.instance()
-        view = main_window.uiGraphicsView
 
         if "nodes" in topology["topology"]:
-            for item in view.scene().items():
-                if isinstance(item, NodeItem):
-                    for node in topology["topology"]["nodes"]:
-                        if node["id"] == item.node().id():
-                            node["x"] = item.x()
-                            node["y"] = item.y()
-                            if item.zValue() != 1.0:
-                                node["z"] = item.zValue()
-                            if item.label():
-                                node["label"] = item.label().dump()
-                            default_symbol_path = item.defaultRenderer().objectName()
-                            if default_symbol_path:
-                                node["default_symbol"] = default_symbol_path
-                            hover_symbol_path = item.hoverRenderer().objectName()
-                            if hover_symbol_path:
-                                node["hover_symbol"] = hover_symbol_path
-                if isinstance(item, LinkItem):
-                    for link in topology["topology"]["links"]:
-                        if link["id"] == item.link().id():
-                            source_port_label = item.sourcePort().label()
-                            destination_port_label = item.destinationPort().label()
-                            if source_port_label:
-                                link["source_port_label"] = source_port_label.dump()
-                            if destination_port_label:
-                                link["destination_port_label"] = destination_port_label.dump()
+            for node in topology["topology"]["nodes"]:
+                self._dumpNodeGuiSettings(node)
+
+        if "links" in topology["topology"]:
+            for link in topology["topology"]["links"]:
+                item = self.getLinkItem(link["id"])
+                if not item:
+                    continue
+                source_port_label = item.sourcePort().label()
+                destination_port_label = item.destinationPort().label()
+                if source_port_label:
+                    link["source_port_label"] = source_port_label.dump()
+                if destination_port_label:
+                    link["destination_port_label"] = destination_port_label.dump()
 
         # notes
         if self._notes:
@@ -401,11 +511,12 @@ class Topology(object):
                     image_info["path"] = os.path.relpath(image_info["path"], main_window.projectSettings()["project_files_dir"])
                 topology_images.append(image_info)
 
-    def dump(self, include_gui_data=True):
+    def dump(self, include_gui_data=True, save_configs=True):
         """
         Creates a complete representation of the topology.
 
         :param include_gui_data: either to include or not the GUI specific info.
+        :param save_configs: either to ask the servers to save the node configurations.
 
         :returns: topology representation
         """
@@ -432,6 +543,8 @@ class Topology(object):
                 if node.server().id() not in servers:
                     servers[node.server().id()] = node.server()
                 log.info("saving node: {}".format(node.name()))
+                if save_configs:
+                    node.saveConfig()
                 topology_nodes.append(node.dump())
 
         # links
@@ -598,6 +711,7 @@ class Topology(object):
 
                 view.scene().addItem(node_item)
                 self.addNode(node)
+                self.addNodeItem(node_item)
                 main_window.uiTopologySummaryTreeWidget.addNode(node)
 
         self._resources_type = topology.get("resources_type")
@@ -643,12 +757,13 @@ class Topology(object):
                     topology_file_errors.append("Path to image {} doesn't exist".format(image_path))
                     continue
 
-                pixmap = QtGui.QPixmap(image_path)
-                if pixmap.isNull():
+                # images are decoded later, when they are painted
+                image = ImageCache.instance().image(image_path)
+                if image is None:
                     topology_file_errors.append("Image format not supported for {}".format(image_path))
                     continue
 
-                image_item = ImageItem(pixmap, image_path)
+                image_item = ImageItem(image, image_path)
                 image_item.load(topology_image)
                 view.scene().addItem(image_item)
                 self.addImage(image_item)
@@ -728,16 +843,13 @@ class Topology(object):
         :return: NoteItem instance
         """
 
-        from .main_window import MainWindow
-        view = MainWindow.instance().uiGraphicsView
-
-        for item in view.scene().items():
-            if isinstance(item, NodeItem) and node.id() == item.node().id():
-                port_label = NoteItem(item)
-                port_label.load(label_info)
-                port_label.hide()
-                return port_label
-        return None
+        node_item = self.getNodeItem(node.id())
+        if not node_item:
+            return None
+        port_label = NoteItem(node_item)
+        port_label.load(label_info)
+        port_label.hide()
+        return port_label
 
     def _reactivateUnsavedState(self):
         """
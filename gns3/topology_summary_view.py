@@ -19,112 +19,393 @@
 Topology summary view that list all the nodes, their status and connections.
 """
 
+import functools
+
 from .qt import QtGui, QtCore
 from .node import Node
 from .topology import Topology
-from .items.node_item import NodeItem
-from .items.link_item import LinkItem
 
 import logging
 log = logging.getLogger(__name__)
 
 
-class TopologyNodeItem(QtGui.QTreeWidgetItem):
+class TopologySummaryModel(QtCore.QAbstractItemModel):
     """
-    Custom item for the QTreeWidget instance
-    (topology summary view).
+    Model of the topology summary: nodes are the top level rows
+    and their connected ports are the children rows.
 
-    :param parent: parent widget
-    :param node: Node instance
+    Rows are inserted, removed and updated incrementally when nodes change,
+    node updates are coalesced until the event loop runs again.
+
+    :param parent: parent object
     """
 
-    def __init__(self, parent, node):
+    _icons = {}
 
-        QtGui.QTreeWidgetItem.__init__(self, parent)
-        self._node = node
-        self._parent = parent
+    def __init__(self, parent=None):
 
-        # we want to know about the node events
-        node.started_signal.connect(self._refreshStatusSlot)
-        node.stopped_signal.connect(self._refreshStatusSlot)
-        node.suspended_signal.connect(self._refreshStatusSlot)
-        node.updated_signal.connect(self._refreshNodeSlot)
-        node.deleted_signal.connect(self._deletedNodeSlot)
+        QtCore.QAbstractItemModel.__init__(self, parent)
+        self._nodes = []
+        self._node_rows = {}  # node ID -> row
+        self._ports = {}  # node ID -> connected ports, sorted by label
+        self._capturing_nodes = set()  # IDs of nodes with at least one capture
+        self._names = {}  # node ID -> last known name
+        self._pending_nodes = set()
+        self._slots = {}  # node ID -> connected slots
 
-        self._refreshStatusSlot()
-        self._refreshNodeSlot()
+        self._update_timer = QtCore.QTimer(self)
+        self._update_timer.setSingleShot(True)
+        self._update_timer.setInterval(0)
+        self._update_timer.timeout.connect(self._processPendingUpdatesSlot)
 
-    def _refreshStatusSlot(self):
+    @classmethod
+    def icon(cls, name):
         """
-        Changes the icon to show the node status (started, stopped etc.)
+        Returns a cached icon.
+
+        :param name: icon resource path
+
+        :returns: QIcon instance
         """
 
-        self.setText(0, self._node.name())
-        if self._node.status() == Node.started:
-            self.setIcon(0, QtGui.QIcon(':/icons/led_green.svg'))
-        elif self._node.status() == Node.suspended:
-            self.setIcon(0, QtGui.QIcon(':/icons/led_yellow.svg'))
-        else:
-            self.setIcon(0, QtGui.QIcon(':/icons/led_red.svg'))
+        if name not in cls._icons:
+            cls._icons[name] = QtGui.QIcon(name)
+        return cls._icons[name]
+
+    @staticmethod
+    def _portLabel(port):
+        """
+        Returns the text displayed for a port.
 
-    def _refreshNodeSlot(self):
+        :param port: Port instance
+
+        :returns: string
         """
-        Slot to update the node.
+
+        return "{} {}".format(port.name(), port.description())
+
+    def index(self, row, column, parent=QtCore.QModelIndex()):
         """
+        Returns the index of an item.
 
-        self.refresh()
+        :param row: row number
+        :param column: column number
+        :param parent: parent QModelIndex
 
-    def node(self):
+        :returns: QModelIndex instance
         """
-        Returns the node.
 
-        :return: Node instance
+        if not self.hasIndex(row, column, parent):
+            return QtCore.QModelIndex()
+        if not parent.isValid():
+            return self.createIndex(row, column)
+        return self.createIndex(row, column, self._nodes[parent.row()])
+
+    def parent(self, index):
         """
+        Returns the parent of an index, ports have their node as parent.
 
-        return self._node
+        :param index: QModelIndex instance
 
-    def refresh(self):
+        :returns: QModelIndex instance
         """
-        Updates the widget item with the current node name and list all the connections
-        as children.
+
+        if not index.isValid():
+            return QtCore.QModelIndex()
+        node = index.internalPointer()
+        if node is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(self._node_rows[node.id()], 0)
+
+    def rowCount(self, parent=QtCore.QModelIndex()):
         """
+        Returns the number of nodes or the number of connected ports of a node.
 
-        if self._node.name() != self.text(0):
-            # refresh all the other item if the node name has changed
-            self._parent.refreshAll(self)
+        :param parent: parent QModelIndex
 
-        self.setText(0, self._node.name())
-        ports = self._node.ports()
-        self.takeChildren()
+        :returns: integer
+        """
 
-        capturing = False
-        for port in ports:
-            if not port.isFree():
-                item = QtGui.QTreeWidgetItem()
-                item.setText(0, "{} {}".format(port.name(), port.description()))
-                item.setData(0, QtCore.Qt.UserRole, port)
-                if port.capturing():
-                    item.setIcon(0, QtGui.QIcon(':/icons/inspect.svg'))
-                    capturing = True
-                self.addChild(item)
+        if not parent.isValid():
+            return len(self._nodes)
+        if parent.internalPointer() is not None:
+            # ports have no children
+            return 0
+        return len(self._ports[self._nodes[parent.row()].id()])
 
-        if self._parent.show_only_devices_with_capture and capturing is False:
-            self.setHidden(True)
-        else:
-            self.setHidden(False)
+    def columnCount(self, parent=QtCore.QModelIndex()):
+        """
+        Returns the number of columns.
+
+        :param parent: parent QModelIndex
+
+        :returns: integer
+        """
+
+        return 1
+
+    def data(self, index, role=QtCore.Qt.DisplayRole):
+        """
+        Returns the data of an index for a given role.
+
+        :param index: QModelIndex instance
+        :param role: data role
 
-        self.sortChildren(0, QtCore.Qt.AscendingOrder)
+        :returns: data or None
+        """
+
+        if not index.isValid():
+            return None
+
+        node = index.internalPointer()
+        if node is None:
+            node = self._nodes[index.row()]
+            if role == QtCore.Qt.DisplayRole:
+                return node.name()
+            if role == QtCore.Qt.DecorationRole:
+                if node.status() == Node.started:
+                    return self.icon(":/icons/led_green.svg")
+                if node.status() == Node.suspended:
+                    return self.icon(":/icons/led_yellow.svg")
+                return self.icon(":/icons/led_red.svg")
+            if role == QtCore.Qt.UserRole:
+                return node
+            return None
+
+        port = self._ports[node.id()][index.row()]
+        if role == QtCore.Qt.DisplayRole:
+            return self._portLabel(port)
+        if role == QtCore.Qt.DecorationRole and port.capturing():
+            return self.icon(":/icons/inspect.svg")
+        if role == QtCore.Qt.UserRole:
+            return port
+        return None
 
-    def _deletedNodeSlot(self):
+    def nodeIndex(self, node):
         """
-        Removes the node from the view.
+        Returns the model index of a node.
+
+        :param node: Node instance
+
+        :returns: QModelIndex instance
         """
 
-        tree = self.treeWidget()
-        tree.takeTopLevelItem(tree.indexOfTopLevelItem(self))
+        row = self._node_rows.get(node.id())
+        if row is None:
+            return QtCore.QModelIndex()
+        return self.createIndex(row, 0)
 
+    def nodeFromIndex(self, index):
+        """
+        Returns the node of a top level index.
 
-class TopologySummaryView(QtGui.QTreeWidget):
+        :param index: QModelIndex instance
+
+        :returns: Node instance or None if the index is a port
+        """
+
+        if not index.isValid() or index.internalPointer() is not None:
+            return None
+        return self._nodes[index.row()]
+
+    def isCapturing(self, row):
+        """
+        Returns either a node has at least one port capturing packets.
+
+        :param row: top level row
+
+        :returns: boolean
+        """
+
+        return self._nodes[row].id() in self._capturing_nodes
+
+    def addNode(self, node):
+        """
+        Appends a node to the model.
+
+        :param node: Node instance
+        """
+
+        node_id = node.id()
+        if node_id in self._node_rows:
+            return
+
+        row = len(self._nodes)
+        self.beginInsertRows(QtCore.QModelIndex(), row, row)
+        self._nodes.append(node)
+        self._node_rows[node_id] = row
+        self._ports[node_id] = []
+        self._names[node_id] = node.name()
+        self.endInsertRows()
+
+        slots = {"status": functools.partial(self._nodeStatusChangedSlot, node),
+                 "updated": functools.partial(self._nodeUpdatedSlot, node),
+                 "deleted": functools.partial(self.removeNode, node)}
+        node.started_signal.connect(slots["status"])
+        node.stopped_signal.connect(slots["status"])
+        node.suspended_signal.connect(slots["status"])
+        node.updated_signal.connect(slots["updated"])
+        node.deleted_signal.connect(slots["deleted"])
+        self._slots[node_id] = slots
+
+        self._refreshPorts(node)
+
+    def removeNode(self, node):
+        """
+        Removes a node from the model.
+
+        :param node: Node instance
+        """
+
+        node_id = node.id()
+        row = self._node_rows.get(node_id)
+        if row is None:
+            return
+
+        slots = self._slots.pop(node_id)
+        node.started_signal.disconnect(slots["status"])
+        node.stopped_signal.disconnect(slots["status"])
+        node.suspended_signal.disconnect(slots["status"])
+        node.updated_signal.disconnect(slots["updated"])
+        node.deleted_signal.disconnect(slots["deleted"])
+
+        self.beginRemoveRows(QtCore.QModelIndex(), row, row)
+        del self._nodes[row]
+        del self._node_rows[node_id]
+        del self._ports[node_id]
+        del self._names[node_id]
+        self._capturing_nodes.discard(node_id)
+        self._pending_nodes.discard(node)
+        for index in range(row, len(self._nodes)):
+            self._node_rows[self._nodes[index].id()] = index
+        self.endRemoveRows()
+
+    def clear(self):
+        """
+        Removes all the nodes from the model.
+        """
+
+        for node in list(self._nodes):
+            slots = self._slots.pop(node.id())
+            node.started_signal.disconnect(slots["status"])
+            node.stopped_signal.disconnect(slots["status"])
+            node.suspended_signal.disconnect(slots["status"])
+            node.updated_signal.disconnect(slots["updated"])
+            node.deleted_signal.disconnect(slots["deleted"])
+
+        self.beginResetModel()
+        self._nodes = []
+        self._node_rows.clear()
+        self._ports.clear()
+        self._names.clear()
+        self._capturing_nodes.clear()
+        self._pending_nodes.clear()
+        self.endResetModel()
+
+    def _nodeStatusChangedSlot(self, node):
+        """
+        Slot called when a node has been started, stopped or suspended.
+
+        :param node: Node instance
+        """
+
+        index = self.nodeIndex(node)
+        if index.isValid():
+            self.dataChanged.emit(index, index)
+
+    def _nodeUpdatedSlot(self, node):
+        """
+        Slot called when a node has been updated.
+
+        :param node: Node instance
+        """
+
+        self._pending_nodes.add(node)
+        if not self._update_timer.isActive():
+            self._update_timer.start()
+
+    def _processPendingUpdatesSlot(self):
+        """
+        Refreshes the nodes updated since the last time the event loop ran.
+        """
+
+        pending_nodes = self._pending_nodes
+        self._pending_nodes = set()
+        for node in pending_nodes:
+            if node.id() not in self._node_rows:
+                continue
+            if node.name() != self._names[node.id()]:
+                self._names[node.id()] = node.name()
+                index = self.nodeIndex(node)
+                self.dataChanged.emit(index, index)
+                self._refreshNeighbourPorts(node)
+            self._refreshPorts(node)
+
+    def _refreshNeighbourPorts(self, node):
+        """
+        Refreshes the ports connected to a node which has been renamed,
+        their description includes the node name.
+
+        :param node: Node instance
+        """
+
+        for port in node.ports():
+            neighbour = port.destinationNode()
+            destination_port = port.destinationPort()
+            if neighbour is None or destination_port is None or neighbour.id() not in self._node_rows:
+                continue
+            neighbour_ports = self._ports[neighbour.id()]
+            if destination_port in neighbour_ports:
+                row = neighbour_ports.index(destination_port)
+                index = self.createIndex(row, 0, neighbour)
+                self.dataChanged.emit(index, index)
+
+    def _refreshPorts(self, node):
+        """
+        Updates the port rows of a node, only the differences
+        are applied to the model.
+
+        :param node: Node instance
+        """
+
+        node_id = node.id()
+        parent = self.nodeIndex(node)
+        old_ports = self._ports[node_id]
+        new_ports = sorted([port for port in node.ports() if not port.isFree()], key=self._portLabel)
+
+        if any(port.capturing() for port in new_ports):
+            self._capturing_nodes.add(node_id)
+        else:
+            self._capturing_nodes.discard(node_id)
+
+        new_port_set = set(new_ports)
+        for row in reversed(range(len(old_ports))):
+            if old_ports[row] not in new_port_set:
+                self.beginRemoveRows(parent, row, row)
+                del old_ports[row]
+                self.endRemoveRows()
+
+        old_port_set = set(old_ports)
+        if old_ports != [port for port in new_ports if port in old_port_set]:
+            # the order of the remaining ports has changed
+            self.beginRemoveRows(parent, 0, len(old_ports) - 1)
+            del old_ports[:]
+            self.endRemoveRows()
+            old_port_set.clear()
+
+        for row, port in enumerate(new_ports):
+            if port not in old_port_set:
+                self.beginInsertRows(parent, row, row)
+                old_ports.insert(row, port)
+                self.endInsertRows()
+
+        if old_ports:
+            self.dataChanged.emit(self.index(0, 0, parent), self.index(len(old_ports) - 1, 0, parent))
+        # the capture filter depends on the node row
+        self.dataChanged.emit(parent, parent)
+
+
+class TopologySummaryView(QtGui.QTreeView):
     """
     Topology summary view implementation.
 
@@ -133,11 +414,16 @@ class TopologySummaryView(QtGui.QTreeWidget):
 
     def __init__(self, parent):
 
-        QtGui.QTreeWidget.__init__(self, parent)
+        QtGui.QTreeView.__init__(self, parent)
         self._topology = Topology.instance()
-        self.itemSelectionChanged.connect(self._itemSelectionChangedSlot)
         self.show_only_devices_with_capture = False
 
+        self._model = TopologySummaryModel(self)
+        self.setModel(self._model)
+        self._model.rowsInserted.connect(self._rowsInsertedSlot)
+        self._model.dataChanged.connect(self._dataChangedSlot)
+        self.selectionModel().currentChanged.connect(self._currentChangedSlot)
+
     def addNode(self, node):
         """
         Adds a node to the summary view.
@@ -153,19 +439,51 @@ class TopologySummaryView(QtGui.QTreeWidget):
         Clears all the topology summary.
         """
 
-        QtGui.QTreeWidget.clear(self)
+        self._model.clear()
 
-    def refreshAll(self, source_child=None):
+    def refreshAll(self):
         """
-        Refreshes all the items.
+        Applies the capture filter to all the nodes.
         """
 
-        root = self.invisibleRootItem()
-        for index in range(0, root.childCount()):
-            child = root.child(index)
-            if source_child and source_child == child:
-                continue
-            child.refresh()
+        for row in range(self._model.rowCount()):
+            self._updateRowVisibility(row)
+
+    def _updateRowVisibility(self, row):
+        """
+        Shows or hides a node depending on the capture filter.
+
+        :param row: top level row
+        """
+
+        hidden = self.show_only_devices_with_capture and not self._model.isCapturing(row)
+        if self.isRowHidden(row, QtCore.QModelIndex()) != hidden:
+            self.setRowHidden(row, QtCore.QModelIndex(), hidden)
+
+    def _rowsInsertedSlot(self, parent, first, last):
+        """
+        Slot called when rows have been inserted in the model.
+
+        :param parent: parent QModelIndex
+        :param first: first inserted row
+        :param last: last inserted row
+        """
+
+        if not parent.isValid():
+            for row in range(first, last + 1):
+                self._updateRowVisibility(row)
+
+    def _dataChangedSlot(self, top_left, bottom_right):
+        """
+        Slot called when data have changed in the model.
+
+        :param top_left: top left QModelIndex
+        :param bottom_right: bottom right QModelIndex
+        """
+
+        if not top_left.parent().isValid():
+            for row in range(top_left.row(), bottom_right.row() + 1):
+                self._updateRowVisibility(row)
 
     def _createdNodeSlot(self, node_id):
         """
@@ -183,28 +501,43 @@ class TopologySummaryView(QtGui.QTreeWidget):
             log.error("could not find node with ID {}".format(node_id))
             return
 
-        TopologyNodeItem(self, node)
+        self._model.addNode(node)
+
+    def _currentChangedSlot(self, current, previous):
+        """
+        Slot called when an item is selected in the view.
 
-    def _itemSelectionChangedSlot(self):
+        :param current: current QModelIndex
+        :param previous: previous QModelIndex
         """
-        Slot called when an item is selected in the TreeWidget.
+
+        if not current.isValid():
+            return
+
+        node = self._model.nodeFromIndex(current)
+        for item in self._topology.nodeItems():
+            item.setSelected(node is not None and item.node().id() == node.id())
+        for item in self._topology.linkItems():
+            item.setHovered(False)
+
+        if node is None:
+            port = current.data(QtCore.Qt.UserRole)
+            for item in self._linkItemsForPort(current.parent(), port):
+                item.setHovered(True)
+
+    def _linkItemsForPort(self, parent, port):
+        """
+        Returns the link items connected to a port.
+
+        :param parent: QModelIndex of the node
+        :param port: Port instance
+
+        :returns: list of LinkItem instances
         """
 
-        current_item = self.currentItem()
-        if current_item:
-            from .main_window import MainWindow
-            view = MainWindow.instance().uiGraphicsView
-            for item in view.scene().items():
-                if isinstance(item, NodeItem):
-                    item.setSelected(False)
-                    if isinstance(current_item, TopologyNodeItem) and item.node().id() == current_item.node().id():
-                        item.setSelected(True)
-                if isinstance(item, LinkItem):
-                    item.setHovered(False)
-                    if not isinstance(current_item, TopologyNodeItem):
-                        port = current_item.data(0, QtCore.Qt.UserRole)
-                        if item.sourcePort() == port or item.destinationPort() == port:
-                            item.setHovered(True)
+        node = self._model.nodeFromIndex(parent)
+        return [item for item in self._topology.linkItems(node.id())
+                if item.sourcePort() == port or item.destinationPort() == port]
 
     def mousePressEvent(self, event):
         """
@@ -216,7 +549,7 @@ class TopologySummaryView(QtGui.QTreeWidget):
         if event.button() == QtCore.Qt.RightButton:
             self._showContextualMenu()
         else:
-            QtGui.QTreeWidget.mousePressEvent(self, event)
+            QtGui.QTreeView.mousePressEvent(self, event)
 
     def _showContextualMenu(self):
         """
@@ -250,19 +583,18 @@ class TopologySummaryView(QtGui.QTreeWidget):
         self.connect(stop_all_captures, QtCore.SIGNAL('triggered()'), self._stopAllCapturesSlot)
         menu.addAction(stop_all_captures)
 
-        current_item = self.currentItem()
+        current = self.currentIndex()
         from .main_window import MainWindow
         view = MainWindow.instance().uiGraphicsView
-        if current_item and not current_item.isHidden():
+        if current.isValid() and not self.isRowHidden(current.row(), current.parent()):
             menu.addSeparator()
-            if isinstance(current_item, TopologyNodeItem):
+            if self._model.nodeFromIndex(current) is not None:
                 view.populateDeviceContextualMenu(menu)
             else:
-                port = current_item.data(0, QtCore.Qt.UserRole)
-                for item in view.scene().items():
-                    if isinstance(item, LinkItem) and (item.sourcePort() == port or item.destinationPort() == port):
-                        item.populateLinkContextualMenu(menu)
-                        break
+                port = current.data(QtCore.Qt.UserRole)
+                for item in self._linkItemsForPort(current.parent(), port):
+                    item.populateLinkContextualMenu(menu)
+                    break
 
         menu.exec_(QtGui.QCursor.pos())
 
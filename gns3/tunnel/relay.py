@@ -0,0 +1,579 @@
+"""
+Relay engine for the SSH tunnel endpoints.
+
+All the endpoints (listening sockets) and the connections relayed to
+SSH channels are serviced by one selector loop running in one thread.
+Opening an SSH channel needs a round trip to the server, it is done by
+a small pool of connector threads so the loop never waits for it.
+"""
+
+import time
+import heapq
+import queue
+import socket
+import selectors
+import threading
+import collections
+import concurrent.futures
+import logging
+
+log = logging.getLogger(__name__)
+
+
+class RelayStats(object):
+    """
+    Byte and latency counters of an endpoint. Latency is the time
+    data waits in the relay buffers before being sent.
+    """
+
+    def __init__(self):
+        self.connections = 0
+        self.active_connections = 0
+        self.bytes_to_remote = 0
+        self.bytes_to_local = 0
+        self.latency_total = 0.0
+        self.latency_max = 0.0
+        self.latency_count = 0
+
+    def add_latency(self, latency):
+        self.latency_total += latency
+        self.latency_count += 1
+        if latency > self.latency_max:
+            self.latency_max = latency
+
+    def as_dict(self):
+        average = 0.0
+        if self.latency_count:
+            average = self.latency_total / self.latency_count
+        return {"connections": self.connections,
+                "active_connections": self.active_connections,
+                "bytes_to_remote": self.bytes_to_remote,
+                "bytes_to_local": self.bytes_to_local,
+                "latency_avg": average,
+                "latency_max": self.latency_max}
+
+
+class SocketEnd(object):
+    """
+    Non-blocking socket side of a relayed connection.
+    """
+
+    # the selector tells when the socket can be written
+    write_selectable = True
+
+    def __init__(self, sock):
+        self.sock = sock
+        sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def recv(self, size):
+        """
+        Returns the received data, b"" when the peer has closed
+        the connection or None when there is nothing to read.
+        """
+
+        try:
+            return self.sock.recv(size)
+        except (BlockingIOError, InterruptedError):
+            return None
+        except OSError:
+            return b""
+
+    def send(self, data):
+        """
+        Returns the number of bytes sent (0 if the socket would block).
+        """
+
+        try:
+            return self.sock.send(data)
+        except (BlockingIOError, InterruptedError):
+            return 0
+
+    def close(self):
+        self.sock.close()
+
+
+class ChannelEnd(SocketEnd):
+    """
+    SSH channel side of a relayed connection. The channel can be
+    selected for reading only, writes are retried by the loop.
+    """
+
+    write_selectable = False
+
+    def __init__(self, chan):
+        self.sock = chan
+        chan.setblocking(0)
+
+    def recv(self, size):
+        try:
+            return self.sock.recv(size)
+        except socket.timeout:
+            return None
+
+    def send(self, data):
+        if self.sock.closed:
+            raise OSError("channel closed")
+        try:
+            return self.sock.send(data)
+        except socket.timeout:
+            # the SSH window is full
+            return 0
+
+
+class RelayBuffer(object):
+    """
+    Data waiting to be written to one end of a connection.
+    """
+
+    def __init__(self):
+        self.data = bytearray()
+        self._chunks = collections.deque()  # (reception time, size)
+
+    def __len__(self):
+        return len(self.data)
+
+    def append(self, data):
+        self.data.extend(data)
+        self._chunks.append([time.time(), len(data)])
+
+    def consume(self, size, stats):
+        """
+        Removes sent data and records how long it has waited.
+        """
+
+        del self.data[:size]
+        now = time.time()
+        while size and self._chunks:
+            chunk = self._chunks[0]
+            if chunk[1] <= size:
+                size -= chunk[1]
+                stats.add_latency(now - chunk[0])
+                self._chunks.popleft()
+            else:
+                chunk[1] -= size
+                size = 0
+
+
+class RelayConnection(object):
+    """
+    Local connection relayed to an SSH channel. Data is only read from
+    an end while the buffer of the other end has room (flow control).
+    """
+
+    def __init__(self, relay, local_end, remote_end, stats, on_close=None):
+        self._relay = relay
+        self._stats = stats
+        self._on_close = on_close
+        self.local_end = local_end
+        self.remote_end = remote_end
+        self._buffers = {local_end: RelayBuffer(), remote_end: RelayBuffer()}
+        self._peers = {local_end: remote_end, remote_end: local_end}
+        self._eof = set()
+        self.closed = False
+
+    def pending_write(self, end):
+        return len(self._buffers[end]) > 0
+
+    def retry(self):
+        """
+        Called by the loop to retry writing to the SSH channel.
+        """
+
+        self.flush(self.remote_end)
+
+    def interest(self, end):
+        """
+        Returns the selector events an end must be registered for.
+        """
+
+        events = 0
+        if end not in self._eof and len(self._buffers[self._peers[end]]) < self._relay.buffer_size:
+            events |= selectors.EVENT_READ
+        if end.write_selectable and self._buffers[end]:
+            events |= selectors.EVENT_WRITE
+        return events
+
+    def handle(self, end, mask):
+        """
+        Called by the loop when an end is ready.
+        """
+
+        if mask & selectors.EVENT_READ:
+            self._read(end)
+        if not self.closed and mask & selectors.EVENT_WRITE:
+            self.flush(end)
+
+    def _read(self, end):
+        peer = self._peers[end]
+        room = self._relay.buffer_size - len(self._buffers[peer])
+        if room <= 0:
+            return
+        data = end.recv(min(self._relay.recv_size, room))
+        if data is None:
+            return
+        if not data:
+            self._eof.add(end)
+        else:
+            if end is self.local_end:
+                self._stats.bytes_to_remote += len(data)
+            else:
+                self._stats.bytes_to_local += len(data)
+            self._buffers[peer].append(data)
+        self.flush(peer)
+
+    def flush(self, end):
+        """
+        Writes as much buffered data as possible to an end,
+        partial writes leave the rest in the buffer.
+        """
+
+        buf = self._buffers[end]
+        try:
+            while buf:
+                sent = end.send(bytes(buf.data[:self._relay.recv_size]))
+                if not sent:
+                    break
+                buf.consume(sent, self._stats)
+        except OSError as e:
+            log.debug("relay write failed: %s", e)
+            self.close()
+            return
+
+        # a connection is closed once an end has closed and its data is delivered
+        for closed_end in self._eof:
+            if not self._buffers[self._peers[closed_end]]:
+                self.close()
+                return
+        self._relay.update(self)
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self._stats.active_connections -= 1
+        self._relay.unregister(self)
+        for end in (self.local_end, self.remote_end):
+            try:
+                end.close()
+            except OSError:
+                pass
+        if self._on_close is not None:
+            self._on_close(self)
+
+
+class RelayListener(object):
+    """
+    Listening socket of an endpoint, accepted connections are
+    relayed to channels opened by the connect function.
+    """
+
+    def __init__(self, relay, sock, connect):
+        self._relay = relay
+        self.sock = sock
+        self._connect = connect
+        self.stats = RelayStats()
+        self.connections = set()
+        sock.setblocking(False)
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def handle(self, end, mask):
+        try:
+            client, peer = self.sock.accept()
+        except (BlockingIOError, InterruptedError):
+            return
+        except OSError as e:
+            log.warning("could not accept tunnel connection: %s", e)
+            return
+        future = self._relay.connectors.submit(self._connect, peer)
+        future.add_done_callback(lambda future: self._relay.call(self._connected, client, peer, future))
+
+    def _connected(self, client, peer, future):
+        """
+        Called in the loop thread once the channel has been opened.
+        """
+
+        try:
+            chan = future.result()
+        except Exception as e:
+            log.warning("could not open tunnel channel for %s:%s: %s", peer[0], peer[1], e)
+            chan = None
+        if chan is None or self.sock.fileno() == -1:
+            client.close()
+            if chan is not None:
+                chan.close()
+            return
+        self.stats.connections += 1
+        self.stats.active_connections += 1
+        connection = RelayConnection(self._relay,
+                                     SocketEnd(client),
+                                     self._relay.channel_end(chan),
+                                     self.stats,
+                                     self.connections.discard)
+        self.connections.add(connection)
+        self._relay.update(connection)
+
+    def close(self):
+        for connection in list(self.connections):
+            connection.close()
+        self.connections.clear()
+        try:
+            self._relay.selector.unregister(self.sock)
+        except (KeyError, ValueError):
+            pass
+        self.sock.close()
+
+
+class TimerHandle(object):
+    """
+    Function to be run by the loop after a delay.
+    """
+
+    def __init__(self, function, args):
+        self.function = function
+        self.args = args
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class Relay(object):
+    """
+    Selector loop servicing all the endpoints and their connections.
+
+    :param buffer_size: maximum data buffered per direction of a connection
+    :param recv_size: maximum size of a read or a write
+    """
+
+    # delay between retries of writes to channels which cannot be selected for writing
+    RETRY_DELAY = 0.01
+
+    def __init__(self, buffer_size=1024 * 1024, recv_size=64 * 1024, connector_threads=4):
+        self.buffer_size = buffer_size
+        self.recv_size = recv_size
+        self.selector = selectors.DefaultSelector()
+        self.connectors = concurrent.futures.ThreadPoolExecutor(max_workers=connector_threads)
+        self._calls = queue.Queue()
+        self._wakeup_recv, self._wakeup_send = socket.socketpair()
+        self._wakeup_recv.setblocking(False)
+        self.selector.register(self._wakeup_recv, selectors.EVENT_READ, None)
+        self._registered = {}  # end -> (connection, events)
+        self._retries = set()  # connections with data for a channel
+        self._timers = []  # heap of (time, sequence, TimerHandle)
+        self._timer_sequence = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def start(self):
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="TunnelRelay")
+                self._thread.daemon = True
+                self._thread.start()
+
+    def call(self, function, *args, wait=False):
+        """
+        Runs a function in the loop thread.
+
+        :param wait: wait for the function to have been run
+        """
+
+        if threading.current_thread() is self._thread:
+            function(*args)
+            return
+        self.start()
+        done = threading.Event() if wait else None
+        self._calls.put((function, args, done))
+        try:
+            self._wakeup_send.send(b"\0")
+        except (BlockingIOError, InterruptedError):
+            # the loop has already been woken up
+            pass
+        if done is not None:
+            done.wait()
+
+    def call_later(self, delay, function, *args):
+        """
+        Runs a function in the loop thread after a delay.
+
+        :returns: TimerHandle instance, to cancel the call
+        """
+
+        handle = TimerHandle(function, args)
+
+        def schedule():
+            self._timer_sequence += 1
+            heapq.heappush(self._timers, (time.time() + delay, self._timer_sequence, handle))
+        self.call(schedule)
+        return handle
+
+    def _run_timers(self):
+        """
+        Runs the expired timers and returns the time until the next one.
+        """
+
+        while self._timers:
+            when, _, handle = self._timers[0]
+            if when > time.time():
+                return when - time.time()
+            heapq.heappop(self._timers)
+            if not handle.cancelled:
+                try:
+                    handle.function(*handle.args)
+                except Exception:
+                    log.exception("tunnel relay timer failed")
+        return None
+
+    def add_listener(self, local_address, connect):
+        """
+        Listens on a local address, each accepted connection is relayed
+        to the channel returned by connect(peer_address).
+
+        :returns: RelayListener instance
+        """
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            sock.bind(local_address)
+        except OSError:
+            sock.close()
+            raise
+        return self.listen(sock, connect)
+
+    def listen(self, sock, connect):
+        """
+        Listens on an already bound socket, each accepted connection
+        is relayed to the channel returned by connect(peer_address).
+
+        :returns: RelayListener instance
+        """
+
+        try:
+            sock.listen(socket.SOMAXCONN)
+        except OSError:
+            sock.close()
+            raise
+        listener = RelayListener(self, sock, connect)
+        self.call(self.selector.register, sock, selectors.EVENT_READ, (listener, listener), wait=True)
+        return listener
+
+    def remove_listener(self, listener):
+        """
+        Stops listening and closes the connections of a listener.
+        """
+
+        self.call(listener.close, wait=True)
+
+    def update(self, connection):
+        """
+        Registers the ends of a connection for the events they need.
+        """
+
+        if connection.closed:
+            return
+        for end in (connection.local_end, connection.remote_end):
+            events = connection.interest(end)
+            registered = self._registered.get(end)
+            if registered is not None and registered[1] == events:
+                continue
+            if registered is not None:
+                if events:
+                    self.selector.modify(end, events, (connection, end))
+                else:
+                    self.selector.unregister(end)
+            elif events:
+                self.selector.register(end, events, (connection, end))
+            if events:
+                self._registered[end] = (connection, events)
+            else:
+                self._registered.pop(end, None)
+        if connection.pending_write(connection.remote_end) and not connection.remote_end.write_selectable:
+            self.retry_later(connection)
+        else:
+            self.cancel_retry(connection)
+
+    def retry_later(self, handler):
+        """
+        Makes the loop call handler.retry() until cancel_retry() is called,
+        for writes to channels which cannot be selected for writing.
+        """
+
+        self._retries.add(handler)
+
+    def cancel_retry(self, handler):
+        self._retries.discard(handler)
+
+    @staticmethod
+    def channel_end(chan):
+        """
+        Returns the relay end for a channel returned by a connect function.
+        """
+
+        if isinstance(chan, socket.socket):
+            return SocketEnd(chan)
+        return ChannelEnd(chan)
+
+    def unregister(self, connection):
+        for end in (connection.local_end, connection.remote_end):
+            if self._registered.pop(end, None) is not None:
+                try:
+                    self.selector.unregister(end)
+                except (KeyError, ValueError):
+                    pass
+        self.cancel_retry(connection)
+
+    def _run_calls(self):
+        try:
+            while self._wakeup_recv.recv(4096):
+                pass
+        except (BlockingIOError, InterruptedError):
+            pass
+        while True:
+            try:
+                function, args, done = self._calls.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                function(*args)
+            except Exception:
+                log.exception("tunnel relay call failed")
+            finally:
+                if done is not None:
+                    done.set()
+
+    def _run(self):
+        while True:
+            timeout = self._run_timers()
+            if self._retries and (timeout is None or timeout > self.RETRY_DELAY):
+                timeout = self.RETRY_DELAY
+            for key, mask in self.selector.select(timeout):
+                if key.data is None:
+                    self._run_calls()
+                    continue
+                handler, end = key.data
+                try:
+                    handler.handle(end, mask)
+                except Exception:
+                    log.exception("tunnel relay error")
+                    if isinstance(handler, RelayConnection):
+                        handler.close()
+            for handler in list(self._retries):
+                handler.retry()
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of Relay.
+
+        :returns: instance of Relay
+        """
+
+        if not hasattr(Relay, "_instance"):
+            Relay._instance = Relay()
+        return Relay._instance
@@ -1,10 +1,13 @@
 import os
 import sys
 import socket
+import threading
 import paramiko
 import logging
 from io import StringIO
 from .endpoint import Endpoint
+from .relay import Relay
+from .udp_tunnel import UDPTunnel
 
 log = logging.getLogger(__name__)
 
@@ -31,6 +34,9 @@ if enable_debug:
 
 class Tunnel(object):
 
+    # time an unused endpoint keeps listening, in case it is used again (in seconds)
+    ENDPOINT_IDLE_TIMEOUT = 60
+
     def __init__(self, hostname, port, username=None, password=None, client_key=None, server_key=None):
         """
         Sets up the ssl connection for tunnel support.
@@ -55,6 +61,11 @@ class Tunnel(object):
         self.transport.set_keepalive(30)
 
         self.end_points = {}
+        # endpoints by remote address, shared by all their users
+        self._pool = {}
+        self._pool_lock = threading.Lock()
+        self.relay = Relay.instance()
+        self._udp_tunnel = None
         self.connected = False
 
         self._connect()
@@ -83,10 +94,15 @@ class Tunnel(object):
 
         return my_pkey
 
-    def _find_unused_local_port(self):
+    def _bind_local_port(self):
+        """
+        Binds a socket to an unused local port, the socket is kept
+        and listened on so the port cannot be taken in the meantime.
+        """
+
         s = socket.socket()
         s.bind(('127.0.0.1', 0))
-        return s.getsockname()
+        return s
 
     def is_connected(self):
         """
@@ -109,23 +125,100 @@ class Tunnel(object):
 
 
     def disconnect(self):
-        for name, end_point in self.end_points.items():
-            self.remove_endpoint(name)
+        with self._pool_lock:
+            end_points = list(self.end_points.values())
+            self.end_points.clear()
+            self._pool.clear()
+        for end_point in end_points:
+            if end_point.expiry is not None:
+                end_point.expiry.cancel()
+            end_point.disable()
+        if self._udp_tunnel is not None:
+            self._udp_tunnel.close()
+            self._udp_tunnel = None
         self.transport.close()
 
+    def udp_tunnel(self):
+        """
+        Returns the tunnel carrying the UDP links to this server.
+        """
+
+        if self._udp_tunnel is None:
+            self._udp_tunnel = UDPTunnel(self.transport, self.relay)
+        return self._udp_tunnel
+
     def add_endpoint(self, remote_ip, remote_port):
-        remote_address = (remote_ip, int(remote_port))
-        local_address = self._find_unused_local_port()
+        """
+        Returns an endpoint listening locally for a remote address,
+        an existing endpoint for the same address is reused.
+        Each call must be matched by a call to remove_endpoint().
+        """
 
-        new_endpoint = Endpoint(local_address, remote_address, self.transport)
-        new_endpoint.enable()
-        self.end_points[new_endpoint.getId()] = new_endpoint
+        remote_address = (remote_ip, int(remote_port))
+        with self._pool_lock:
+            end_point = self._acquire_endpoint(remote_address)
+        if end_point is not None:
+            return end_point
+
+        # enabling waits for the relay loop, which takes the pool lock to expire
+        # endpoints, so the new endpoint is created without holding the lock
+        sock = self._bind_local_port()
+        new_end_point = Endpoint(sock.getsockname(), remote_address, self.transport, self.relay, sock)
+        new_end_point.enable()
+        with self._pool_lock:
+            end_point = self._acquire_endpoint(remote_address)
+            if end_point is None:
+                end_point = new_end_point
+                end_point.refcount = 1
+                self.end_points[end_point.getId()] = end_point
+                self._pool[remote_address] = end_point
+                return end_point
+
+        # another thread added an endpoint for this address in the meantime
+        new_end_point.disable()
+        return end_point
+
+    def _acquire_endpoint(self, remote_address):
+        """
+        Takes a reference on the pooled endpoint of an address, None if
+        there is none. Must be called with the pool lock held.
+        """
 
-        return new_endpoint
+        end_point = self._pool.get(remote_address)
+        if end_point is None:
+            return None
+        if end_point.expiry is not None:
+            end_point.expiry.cancel()
+            end_point.expiry = None
+        end_point.refcount += 1
+        return end_point
 
     def remove_endpoint(self, endpoint):
-        if endpoint.getId() in self.end_points:
-            self.end_points[endpoint.getId()].disable()
+        """
+        Releases an endpoint, it is closed once it has
+        not been used for ENDPOINT_IDLE_TIMEOUT seconds.
+        """
+
+        with self._pool_lock:
+            if self.end_points.get(endpoint.getId()) is not endpoint or endpoint.refcount <= 0:
+                return
+            endpoint.refcount -= 1
+            if endpoint.refcount == 0:
+                endpoint.expiry = self.relay.call_later(self.ENDPOINT_IDLE_TIMEOUT, self._expire_endpoint, endpoint)
+
+    def _expire_endpoint(self, endpoint):
+        """
+        Closes an endpoint nobody has used since it was released.
+        """
+
+        with self._pool_lock:
+            if endpoint.refcount or self.end_points.get(endpoint.getId()) is not endpoint:
+                return
+            del self.end_points[endpoint.getId()]
+            if self._pool.get(endpoint.remote_address) is endpoint:
+                del self._pool[endpoint.remote_address]
+            endpoint.expiry = None
+        endpoint.disable()
 
     def list_endpoints(self):
         remotes = {}
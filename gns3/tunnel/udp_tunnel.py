@@ -0,0 +1,350 @@
+"""
+UDP over SSH for the links between a local node and a node on a cloud server.
+
+The datagrams of all the links to a cloud server are carried by one SSH
+channel, running a small helper on the server which sends them to the
+cloud nodes over its loopback interface. Datagrams are framed with a
+5 bytes header (type, flow, length) and the datagrams available at the
+same time are sent in one channel write.
+
+A flow is opened with an OPEN frame carrying the port of the cloud node
+and the port to bind on the server (0 for any), the helper replies with
+an OPENED frame carrying the bound port, or a FAILED frame.
+"""
+
+import base64
+import itertools
+import socket
+import struct
+import selectors
+import logging
+
+from .relay import Relay
+
+log = logging.getLogger(__name__)
+
+HEADER = struct.Struct("!BHH")
+PORT = struct.Struct("!H")
+OPEN_PORTS = struct.Struct("!HH")
+OPEN, OPENED, DATA, CLOSE, FAILED = 1, 2, 3, 4, 5
+
+# runs on the cloud server, reads frames on stdin and writes frames on stdout
+HELPER_SCRIPT = r'''
+import os, sys, socket, struct, selectors
+HEADER = struct.Struct("!BHH")
+PORT = struct.Struct("!H")
+OPEN_PORTS = struct.Struct("!HH")
+OPEN, OPENED, DATA, CLOSE, FAILED = 1, 2, 3, 4, 5
+selector = selectors.DefaultSelector()
+selector.register(0, selectors.EVENT_READ, None)
+flows = {}
+incoming = bytearray()
+outgoing = bytearray()
+while True:
+    for key, _ in selector.select():
+        if key.data is None:
+            data = os.read(0, 65536)
+            if not data:
+                sys.exit(0)
+            incoming += data
+            while len(incoming) >= HEADER.size:
+                kind, flow, size = HEADER.unpack_from(incoming)
+                if len(incoming) < HEADER.size + size:
+                    break
+                payload = bytes(incoming[HEADER.size:HEADER.size + size])
+                del incoming[:HEADER.size + size]
+                if kind == OPEN:
+                    target_port, bind_port = OPEN_PORTS.unpack(payload)
+                    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+                    try:
+                        sock.bind(("127.0.0.1", bind_port))
+                    except OSError:
+                        sock.close()
+                        outgoing += HEADER.pack(FAILED, flow, 0)
+                        continue
+                    sock.setblocking(False)
+                    flows[flow] = (sock, ("127.0.0.1", target_port))
+                    selector.register(sock, selectors.EVENT_READ, flow)
+                    outgoing += HEADER.pack(OPENED, flow, PORT.size) + PORT.pack(sock.getsockname()[1])
+                elif kind == DATA and flow in flows:
+                    try:
+                        flows[flow][0].sendto(payload, flows[flow][1])
+                    except OSError:
+                        pass
+                elif kind == CLOSE and flow in flows:
+                    sock = flows.pop(flow)[0]
+                    selector.unregister(sock)
+                    sock.close()
+        else:
+            sock = flows[key.data][0]
+            for _ in range(64):
+                try:
+                    datagram = sock.recv(65535)
+                except OSError:
+                    break
+                outgoing += HEADER.pack(DATA, key.data, len(datagram)) + datagram
+    data = bytes(outgoing)
+    del outgoing[:]
+    while data:
+        data = data[os.write(1, data):]
+'''
+
+HELPER_COMMAND = "python3 -u -c \"import base64;exec(base64.b64decode('{}'))\"".format(
+    base64.b64encode(HELPER_SCRIPT.encode("utf-8")).decode("ascii"))
+
+
+class UDPFlow(object):
+    """
+    Datagrams exchanged between a local UDP port and a UDP port on the
+    cloud server. Datagrams received by the local socket are sent to the
+    cloud, datagrams from the cloud are sent to the local target.
+    """
+
+    def __init__(self, tunnel, flow_id, sock, target, remote_target_port, callback, remote_bind_port=0):
+        self.tunnel = tunnel
+        self.id = flow_id
+        self.sock = sock
+        self.target = target
+        self.local_host, self.local_port = sock.getsockname()
+        self.remote_target_port = remote_target_port
+        # port requested for the helper socket, 0 for any
+        self.remote_bind_port = remote_bind_port
+        # port of the helper socket on the cloud server, known once opened
+        self.remote_port = None
+        # set when the flow has been closed by the tunnel
+        self.closed = False
+        self.callback = callback
+        self.datagrams_to_remote = 0
+        self.datagrams_to_local = 0
+        self.dropped = 0
+
+    def fileno(self):
+        return self.sock.fileno()
+
+
+class UDPTunnel(object):
+    """
+    Multiplexes UDP flows over one SSH channel, serviced by the relay loop.
+    """
+
+    # datagrams read from a socket before writing them to the channel
+    BATCH_SIZE = 64
+
+    def __init__(self, transport, relay=None, buffer_size=1024 * 1024):
+        self.transport = transport
+        self.relay = relay or Relay.instance()
+        self.buffer_size = buffer_size
+        self._channel = None
+        self._connecting = False
+        self._flows = {}
+        self._flow_ids = itertools.count(1)
+        self._incoming = bytearray()
+        self._outgoing = bytearray()
+
+    def _open_channel(self):
+        """
+        Starts the helper on the cloud server (called by a connector thread).
+        """
+
+        chan = self.transport.open_session()
+        chan.exec_command(HELPER_COMMAND)
+        return chan
+
+    def open_flow(self, local_host, target, remote_target_port, callback, local_port=0, remote_port=0):
+        """
+        Opens a flow, callback(flow) is called from the relay thread once
+        the helper has allocated its UDP port (flow.remote_port), and with
+        flow.closed set if the flow could not be opened or, once opened,
+        has been closed because the helper has exited.
+
+        :param local_host: address to bind the local UDP socket to
+        :param target: local (host, port) to send the datagrams from the cloud to
+        :param remote_target_port: UDP port on the cloud server to send the local datagrams to
+        :param local_port: port to bind the local UDP socket to, 0 for any
+        :param remote_port: port to bind the helper socket to, 0 for any
+
+        :returns: UDPFlow instance
+        """
+
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        try:
+            sock.bind((local_host, local_port))
+        except OSError:
+            sock.close()
+            raise
+        sock.setblocking(False)
+        flow = UDPFlow(self, next(self._flow_ids) & 0xffff, sock, target, remote_target_port, callback,
+                       remote_bind_port=remote_port)
+        self.relay.call(self._open_flow, flow)
+        return flow
+
+    def reopen_flow(self, flow, callback):
+        """
+        Opens again a flow closed by the tunnel, with the same local
+        and cloud ports so the NIOs using them keep working.
+
+        :param flow: UDPFlow instance which had been opened
+
+        :returns: UDPFlow instance
+        """
+
+        return self.open_flow(flow.local_host, flow.target, flow.remote_target_port, callback,
+                              local_port=flow.local_port, remote_port=flow.remote_port)
+
+    def _open_flow(self, flow):
+        self._flows[flow.id] = flow
+        self.relay.selector.register(flow.sock, selectors.EVENT_READ, (self, flow))
+        self._send(OPEN, flow, OPEN_PORTS.pack(flow.remote_target_port, flow.remote_bind_port))
+        if self._channel is None and not self._connecting:
+            self._connecting = True
+            future = self.relay.connectors.submit(self._open_channel)
+            future.add_done_callback(lambda future: self.relay.call(self._channel_opened, future))
+        self.flush()
+
+    def _channel_opened(self, future):
+        self._connecting = False
+        try:
+            self._channel = self.relay.channel_end(future.result())
+        except Exception as e:
+            log.error("could not start the UDP tunnel helper: %s", e)
+            self._fail()
+            return
+        self.relay.selector.register(self._channel, selectors.EVENT_READ, (self, self._channel))
+        self.flush()
+
+    def _fail(self):
+        """
+        Closes the flows after the channel has failed,
+        the callback of each flow is called.
+        """
+
+        self._outgoing.clear()
+        for flow in list(self._flows.values()):
+            self._close_flow(flow, notify=False)
+            flow.closed = True
+            flow.callback(flow)
+
+    def close_flow(self, flow):
+        self.relay.call(self._close_flow, flow)
+
+    def _close_flow(self, flow, notify=True):
+        if self._flows.pop(flow.id, None) is None:
+            return
+        self.relay.selector.unregister(flow.sock)
+        flow.sock.close()
+        if notify:
+            self._send(CLOSE, flow, b"")
+            self.flush()
+
+    def close(self):
+        """
+        Closes all the flows and the channel.
+        """
+
+        def close():
+            for flow in list(self._flows.values()):
+                self._close_flow(flow, notify=False)
+            if self._channel is not None:
+                self.relay.selector.unregister(self._channel)
+                self.relay.cancel_retry(self)
+                self._channel.close()
+                self._channel = None
+        self.relay.call(close, wait=True)
+
+    def _send(self, kind, flow, payload):
+        """
+        Queues a frame, datagrams are dropped when the channel cannot keep up.
+        """
+
+        if kind == DATA and len(self._outgoing) > self.buffer_size:
+            flow.dropped += 1
+            return
+        self._outgoing += HEADER.pack(kind, flow.id, len(payload))
+        self._outgoing += payload
+
+    def flush(self):
+        """
+        Writes the queued frames to the channel.
+        """
+
+        if self._channel is None:
+            return
+        try:
+            while self._outgoing:
+                sent = self._channel.send(bytes(self._outgoing[:self.relay.recv_size]))
+                if not sent:
+                    break
+                del self._outgoing[:sent]
+        except OSError as e:
+            log.error("UDP tunnel channel failed: %s", e)
+            self._channel_closed()
+            return
+        if self._outgoing:
+            self.relay.retry_later(self)
+        else:
+            self.relay.cancel_retry(self)
+
+    def retry(self):
+        self.flush()
+
+    def _channel_closed(self):
+        self.relay.selector.unregister(self._channel)
+        self.relay.cancel_retry(self)
+        self._channel.close()
+        self._channel = None
+        self._fail()
+
+    def handle(self, end, mask):
+        if end is self._channel:
+            self._read_channel()
+        else:
+            self._read_flow(end)
+
+    def _read_flow(self, flow):
+        for _ in range(self.BATCH_SIZE):
+            try:
+                datagram = flow.sock.recv(65535)
+            except (BlockingIOError, InterruptedError):
+                break
+            except OSError:
+                # e.g. ICMP port unreachable reported on the socket
+                continue
+            flow.datagrams_to_remote += 1
+            self._send(DATA, flow, datagram)
+        self.flush()
+
+    def _read_channel(self):
+        data = self._channel.recv(self.relay.recv_size)
+        if data is None:
+            return
+        if not data:
+            log.error("UDP tunnel helper has exited")
+            self._channel_closed()
+            return
+
+        self._incoming += data
+        offset = 0
+        while len(self._incoming) - offset >= HEADER.size:
+            kind, flow_id, size = HEADER.unpack_from(self._incoming, offset)
+            if len(self._incoming) - offset < HEADER.size + size:
+                break
+            payload = bytes(self._incoming[offset + HEADER.size:offset + HEADER.size + size])
+            offset += HEADER.size + size
+            flow = self._flows.get(flow_id)
+            if flow is None:
+                continue
+            if kind == DATA:
+                try:
+                    flow.sock.sendto(payload, flow.target)
+                    flow.datagrams_to_local += 1
+                except OSError:
+                    flow.dropped += 1
+            elif kind == OPENED:
+                flow.remote_port = PORT.unpack(payload)[0]
+                flow.callback(flow)
+            elif kind == FAILED:
+                log.error("the UDP tunnel helper could not open a port for flow %s", flow_id)
+                self._close_flow(flow, notify=False)
+                flow.closed = True
+                flow.callback(flow)
+        del self._incoming[:offset]
@@ -127,8 +127,11 @@ class Ui_CloudPreferencesPageWidget(object):
         spacerItem2 = QtGui.QSpacerItem(40, 20, QtGui.QSizePolicy.Expanding, QtGui.QSizePolicy.Minimum)
         self.horizontalLayout_3.addItem(spacerItem2)
         self.gridLayout.addLayout(self.horizontalLayout_3, 14, 0, 2, 3)
+        self.uiSyncProjectsCheckBox = QtGui.QCheckBox(CloudPreferencesPageWidget)
+        self.uiSyncProjectsCheckBox.setObjectName(_fromUtf8("uiSyncProjectsCheckBox"))
+        self.gridLayout.addWidget(self.uiSyncProjectsCheckBox, 18, 0, 1, 3)
         spacerItem3 = QtGui.QSpacerItem(20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
-        self.gridLayout.addItem(spacerItem3, 18, 0, 1, 1)
+        self.gridLayout.addItem(spacerItem3, 19, 0, 1, 1)
 
         self.retranslateUi(CloudPreferencesPageWidget)
         QtCore.QMetaObject.connectSlotsByName(CloudPreferencesPageWidget)
@@ -151,4 +154,5 @@ class Ui_CloudPreferencesPageWidget(object):
         self.uiForgetAPIKeyRadioButton.setText(_translate("CloudPreferencesPageWidget", "Forget these settings on exit\n"
 "(Suggested for public computers)", None))
         self.uiTimeoutLabel2.setText(_translate("CloudPreferencesPageWidget", "minutes of lost communication", None))
+        self.uiSyncProjectsCheckBox.setText(_translate("CloudPreferencesPageWidget", "Export only the project files changed since the last export", None))
 
@@ -199,6 +199,30 @@ class Ui_GeneralPreferencesPageWidget(object):
         self.uiDelayConsoleAllSpinBox.setProperty("value", 500)
         self.uiDelayConsoleAllSpinBox.setObjectName(_fromUtf8("uiDelayConsoleAllSpinBox"))
         self.gridLayout_7.addWidget(self.uiDelayConsoleAllSpinBox, 3, 0, 1, 1)
+        self.uiEmbeddedConsoleCheckBox = QtGui.QCheckBox(self.uiConsoleMiscGroupBox)
+        self.uiEmbeddedConsoleCheckBox.setObjectName(_fromUtf8("uiEmbeddedConsoleCheckBox"))
+        self.gridLayout_7.addWidget(self.uiEmbeddedConsoleCheckBox, 4, 0, 1, 1)
+        self.uiEmbeddedConsoleScrollbackLabel = QtGui.QLabel(self.uiConsoleMiscGroupBox)
+        self.uiEmbeddedConsoleScrollbackLabel.setObjectName(_fromUtf8("uiEmbeddedConsoleScrollbackLabel"))
+        self.gridLayout_7.addWidget(self.uiEmbeddedConsoleScrollbackLabel, 5, 0, 1, 1)
+        self.uiEmbeddedConsoleScrollbackSpinBox = QtGui.QSpinBox(self.uiConsoleMiscGroupBox)
+        self.uiEmbeddedConsoleScrollbackSpinBox.setMinimum(100)
+        self.uiEmbeddedConsoleScrollbackSpinBox.setMaximum(1000000)
+        self.uiEmbeddedConsoleScrollbackSpinBox.setProperty("value", 5000)
+        self.uiEmbeddedConsoleScrollbackSpinBox.setObjectName(_fromUtf8("uiEmbeddedConsoleScrollbackSpinBox"))
+        self.gridLayout_7.addWidget(self.uiEmbeddedConsoleScrollbackSpinBox, 6, 0, 1, 1)
+        self.uiCaptureConsoleSessionsCheckBox = QtGui.QCheckBox(self.uiConsoleMiscGroupBox)
+        self.uiCaptureConsoleSessionsCheckBox.setObjectName(_fromUtf8("uiCaptureConsoleSessionsCheckBox"))
+        self.gridLayout_7.addWidget(self.uiCaptureConsoleSessionsCheckBox, 7, 0, 1, 1)
+        self.uiConsoleMaxLinesLabel = QtGui.QLabel(self.uiConsoleMiscGroupBox)
+        self.uiConsoleMaxLinesLabel.setObjectName(_fromUtf8("uiConsoleMaxLinesLabel"))
+        self.gridLayout_7.addWidget(self.uiConsoleMaxLinesLabel, 8, 0, 1, 1)
+        self.uiConsoleMaxLinesSpinBox = QtGui.QSpinBox(self.uiConsoleMiscGroupBox)
+        self.uiConsoleMaxLinesSpinBox.setMinimum(100)
+        self.uiConsoleMaxLinesSpinBox.setMaximum(1000000)
+        self.uiConsoleMaxLinesSpinBox.setProperty("value", 10000)
+        self.uiConsoleMaxLinesSpinBox.setObjectName(_fromUtf8("uiConsoleMaxLinesSpinBox"))
+        self.gridLayout_7.addWidget(self.uiConsoleMaxLinesSpinBox, 9, 0, 1, 1)
         self.verticalLayout_3.addWidget(self.uiConsoleMiscGroupBox)
         spacerItem2 = QtGui.QSpacerItem(20, 40, QtGui.QSizePolicy.Minimum, QtGui.QSizePolicy.Expanding)
         self.verticalLayout_3.addItem(spacerItem2)
@@ -305,11 +329,19 @@ class Ui_GeneralPreferencesPageWidget(object):
         self.uiSerialConsoleCommandLineEdit.setToolTip(_translate("GeneralPreferencesPageWidget", "<html><head/><body><p>Command line replacements:</p><p>%d = device hostname</p><p>%s = device pipe file</p></body></html>", None))
         self.uiSerialConsolePreconfiguredCommandPushButton.setText(_translate("GeneralPreferencesPageWidget", "&Set", None))
         self.uiConsoleMiscGroupBox.setTitle(_translate("GeneralPreferencesPageWidget", "Miscellaneous", None))
-        self.uiCloseConsoleWindowsOnDeleteCheckBox.setText(_translate("GeneralPreferencesPageWidget", "Close any connected console window when deleting a node", None))
+        self.uiCloseConsoleWindowsOnDeleteCheckBox.setText(_translate("GeneralPreferencesPageWidget", "Close the built-in console tabs of a node when it is stopped or deleted", None))
         self.uiBringConsoleWindowToFrontCheckBox.setToolTip(_translate("GeneralPreferencesPageWidget", "<html>This option will attempt to bring existing opened console window to front, instead of opening a new window.<br>If no existing opened console window exists, it will start a new  console window.</html>", None))
         self.uiBringConsoleWindowToFrontCheckBox.setText(_translate("GeneralPreferencesPageWidget", "Bring console window to front (experimental feature)", None))
         self.uiSlowConsoleAllLabel.setText(_translate("GeneralPreferencesPageWidget", "Delay between each console launch when consoling to all devices:", None))
         self.uiDelayConsoleAllSpinBox.setSuffix(_translate("GeneralPreferencesPageWidget", " ms", None))
+        self.uiEmbeddedConsoleCheckBox.setToolTip(_translate("GeneralPreferencesPageWidget", "<html>Telnet consoles are opened in tabs of a dock window instead of starting a console application for each device.</html>", None))
+        self.uiEmbeddedConsoleCheckBox.setText(_translate("GeneralPreferencesPageWidget", "Use the built-in tabbed console for Telnet connections", None))
+        self.uiEmbeddedConsoleScrollbackLabel.setText(_translate("GeneralPreferencesPageWidget", "Lines kept in each built-in console:", None))
+        self.uiEmbeddedConsoleScrollbackSpinBox.setSuffix(_translate("GeneralPreferencesPageWidget", " lines", None))
+        self.uiCaptureConsoleSessionsCheckBox.setToolTip(_translate("GeneralPreferencesPageWidget", "<html>The output of the built-in consoles is saved in the consoles directory of the project.</html>", None))
+        self.uiCaptureConsoleSessionsCheckBox.setText(_translate("GeneralPreferencesPageWidget", "Capture the built-in console sessions to log files", None))
+        self.uiConsoleMaxLinesLabel.setText(_translate("GeneralPreferencesPageWidget", "Lines kept in the GNS3 console:", None))
+        self.uiConsoleMaxLinesSpinBox.setSuffix(_translate("GeneralPreferencesPageWidget", " lines", None))
         self.uiTabWidget.setTabText(self.uiTabWidget.indexOf(self.uiConsoleTab), _translate("GeneralPreferencesPageWidget", "Console applications", None))
         self.uiSceneWidthLabel.setText(_translate("GeneralPreferencesPageWidget", "Default width:", None))
         self.uiSceneWidthSpinBox.setSuffix(_translate("GeneralPreferencesPageWidget", " pixels", None))
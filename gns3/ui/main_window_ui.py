@@ -528,7 +528,6 @@ class Ui_MainWindow(object):
         self.uiConsoleDockWidget.setWindowTitle(_translate("MainWindow", "Console", None))
         self.uiAnnotationToolBar.setWindowTitle(_translate("MainWindow", "Drawing", None))
         self.uiTopologySummaryDockWidget.setWindowTitle(_translate("MainWindow", "Topology Summary", None))
-        self.uiTopologySummaryTreeWidget.headerItem().setText(0, _translate("MainWindow", "1", None))
         self.uiCloudInspectorDockWidget.setWindowTitle(_translate("MainWindow", "Cloud Inspector", None))
         self.uiAboutAction.setText(_translate("MainWindow", "&About", None))
         self.uiAboutAction.setStatusTip(_translate("MainWindow", "About", None))
@@ -0,0 +1,502 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Cache of the images displayed on the scene.
+
+Images are decoded by a worker thread into a set of downsampled
+versions (mipmaps), the full resolution version is only kept in memory
+while the scene is zoomed in on it. An image file is shared by all
+the items displaying it.
+"""
+
+import collections
+import math
+import os
+import queue
+import weakref
+
+from ..qt import QtCore, QtGui
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class CachedImage(object):
+    """
+    Image shared by all the items displaying the same file.
+
+    :param key: image key
+    :param path: path to the image file
+    :param size: QSize instance, size of the full resolution image
+    """
+
+    def __init__(self, key, path, size):
+
+        self._key = key
+        self._path = path
+        self._size = size
+        self._mipmaps = []  # downsampled pixmaps, largest first
+        self._full_pixmap = None
+        self._mipmaps_requested = False
+        self._mipmaps_decoded = False
+        self._loading_full = False
+        self._failed = False
+
+    def key(self):
+        """
+        Returns the key of this image.
+
+        :returns: key (string)
+        """
+
+        return self._key
+
+    def path(self):
+        """
+        Returns the path to the image file.
+
+        :returns: path to the image
+        """
+
+        return self._path
+
+    def size(self):
+        """
+        Returns the full resolution size of this image.
+
+        :returns: QSize instance
+        """
+
+        return self._size
+
+    def isLoaded(self):
+        """
+        Returns either at least one resolution of this image is available.
+
+        :returns: boolean
+        """
+
+        return bool(self._mipmaps) or self._full_pixmap is not None
+
+    def pixmap(self, scale, block=False):
+        """
+        Returns the pixmap the most appropriate to display
+        this image at a given scale.
+
+        :param scale: level of detail (1.0 is the full resolution)
+        :param block: decodes the image now if it isn't available (exports only)
+
+        :returns: QPixmap instance or None if the image isn't decoded yet
+        """
+
+        if self._failed:
+            return None
+
+        if block:
+            return self._exportPixmap(scale)
+
+        cache = ImageCache.instance()
+        if not self._mipmaps_requested:
+            self._mipmaps_requested = True
+            cache.decode(self, full=False)
+
+        if scale > 0.5 or not self._mipmaps:
+            if self._full_pixmap is not None:
+                cache.touch(self)
+                return self._full_pixmap
+            # small images are decoded at full resolution with the mipmaps
+            if self._mipmaps_decoded and not self._loading_full:
+                self._loading_full = True
+                cache.decode(self, full=True)
+
+        if not self._mipmaps:
+            return self._full_pixmap
+
+        return self._mipmap(scale)
+
+    def _mipmap(self, scale):
+        """
+        Returns the mipmap matching a scale.
+
+        :param scale: level of detail (1.0 is the full resolution)
+
+        :returns: QPixmap instance
+        """
+
+        # each mipmap level is half the size of the previous one
+        level = 0
+        if scale > 0:
+            level = max(0, int(math.floor(math.log(1.0 / scale, 2))) - 1)
+        return self._mipmaps[min(level, len(self._mipmaps) - 1)]
+
+    def _exportPixmap(self, scale):
+        """
+        Returns the pixmap to export this image at a given scale,
+        the full resolution is decoded now if it is needed.
+
+        :param scale: level of detail (1.0 is the full resolution)
+
+        :returns: QPixmap instance or None if the image cannot be decoded
+        """
+
+        if scale <= 0.5 and self._mipmaps:
+            return self._mipmap(scale)
+        if self._full_pixmap is not None:
+            return self._full_pixmap
+
+        image = QtGui.QImageReader(self._path).read()
+        if image.isNull():
+            return None
+        # the image is released before the ones displayed by the views
+        ImageCache.instance().addFullImage(self, image, recent=False)
+        if self._full_pixmap is None:
+            # released right away, over the memory budget
+            return QtGui.QPixmap.fromImage(image)
+        return self._full_pixmap
+
+    def _setMipmaps(self, images):
+        """
+        Sets the downsampled versions of this image (called in the GUI thread).
+
+        :param images: list of QImage instances, largest first
+        """
+
+        self._mipmaps_decoded = True
+        self._mipmaps = [QtGui.QPixmap.fromImage(image) for image in images]
+
+    def _setFullPixmap(self, image):
+        """
+        Sets the full resolution version of this image (called in the GUI thread).
+
+        :param image: QImage instance
+        """
+
+        self._loading_full = False
+        self._full_pixmap = QtGui.QPixmap.fromImage(image)
+
+    def _setFailed(self):
+        """
+        Marks this image as impossible to decode.
+        """
+
+        self._failed = True
+        self._loading_full = False
+
+    def _releaseFullPixmap(self):
+        """
+        Releases the full resolution version of this image.
+        """
+
+        self._full_pixmap = None
+
+    def cost(self):
+        """
+        Returns the memory used by the full resolution version of this image.
+
+        :returns: size in bytes
+        """
+
+        return self._size.width() * self._size.height() * 4
+
+
+class ImageDecoderThread(QtCore.QThread):
+    """
+    Thread decoding image files, it stops as soon as there is
+    nothing left to decode.
+
+    :param min_mipmap_size: size of the smallest mipmap
+    :param full_size_threshold: images up to this size (in pixels) are
+    not downsampled, their full resolution is always kept in memory
+    """
+
+    # key, full resolution, list of QImage
+    decoded = QtCore.Signal(str, bool, list)
+    failed = QtCore.Signal(str)
+
+    def __init__(self, min_mipmap_size=128, full_size_threshold=1024 * 1024):
+
+        QtCore.QThread.__init__(self)
+        self._min_mipmap_size = min_mipmap_size
+        self._full_size_threshold = full_size_threshold
+        self._queue = queue.Queue()
+
+    def decode(self, key, path, full):
+        """
+        Queues an image to decode.
+
+        :param key: image key
+        :param path: path to the image file
+        :param full: decode the full resolution instead of the mipmaps
+        """
+
+        self._queue.put((key, path, full))
+        if not self.isRunning():
+            self.start()
+
+    def pending(self):
+        """
+        Returns either images are waiting to be decoded.
+
+        :returns: boolean
+        """
+
+        return not self._queue.empty()
+
+    def run(self):
+        """
+        Thread starting point.
+        """
+
+        while True:
+            try:
+                key, path, full = self._queue.get(timeout=1)
+            except queue.Empty:
+                return
+
+            image = QtGui.QImageReader(path).read()
+            if image.isNull():
+                log.error("could not decode image {}".format(path))
+                self.failed.emit(key)
+                continue
+
+            if full:
+                self.decoded.emit(key, True, [image])
+                continue
+
+            if image.width() * image.height() <= self._full_size_threshold:
+                # small enough to be kept at full resolution
+                self.decoded.emit(key, True, [image])
+                self.decoded.emit(key, False, [])
+                continue
+
+            mipmaps = []
+            while max(image.width(), image.height()) > self._min_mipmap_size:
+                image = image.scaled(max(1, image.width() // 2),
+                                     max(1, image.height() // 2),
+                                     QtCore.Qt.IgnoreAspectRatio,
+                                     QtCore.Qt.SmoothTransformation)
+                mipmaps.append(image)
+            self.decoded.emit(key, False, mipmaps)
+
+
+class ImageCache(QtCore.QObject):
+    """
+    Cache of the images displayed on the scene, by file.
+    Images are kept as long as an item is displaying them.
+
+    :param max_full_size: memory budget for the full resolution images
+    :param full_size_threshold: images up to this size (in pixels) are
+    always kept at full resolution
+    """
+
+    # emitted with the image key when a new resolution is available
+    updated = QtCore.Signal(str)
+
+    def __init__(self, max_full_size=128 * 1024 * 1024, full_size_threshold=1024 * 1024):
+
+        QtCore.QObject.__init__(self)
+        self._images = weakref.WeakValueDictionary()
+        self._exporting = False
+        self._max_full_size = max_full_size
+        self._full_size = 0
+        # least recently used full resolution images (key -> cost)
+        self._full_images = collections.OrderedDict()
+        self._full_size_threshold = full_size_threshold
+
+        self._decoder = ImageDecoderThread(full_size_threshold=full_size_threshold)
+        self._decoder.decoded.connect(self._decodedSlot)
+        self._decoder.failed.connect(self._failedSlot)
+        self._decoder.finished.connect(self._decoderFinishedSlot)
+
+    def _fileKey(self, path):
+        """
+        Returns a key identifying an image file, it changes
+        when the file is modified.
+
+        :param path: path to the image file
+
+        :returns: key (string)
+        """
+
+        path = os.path.realpath(path)
+        stat = os.stat(path)
+        return "{}:{}:{}".format(path, stat.st_size, stat.st_mtime_ns)
+
+    def setExporting(self, exporting):
+        """
+        Sets either the scene is being rendered for an export, the
+        images are then decoded when they are painted.
+
+        :param exporting: boolean
+        """
+
+        self._exporting = exporting
+
+    def isExporting(self):
+        """
+        Returns either the scene is being rendered for an export.
+
+        :returns: boolean
+        """
+
+        return self._exporting
+
+    def image(self, path):
+        """
+        Returns the shared image for an image file, the image
+        is decoded the first time it is painted.
+
+        :param path: path to the image file
+
+        :returns: CachedImage instance or None if the file cannot be read
+        """
+
+        try:
+            key = self._fileKey(path)
+        except OSError as e:
+            log.error("could not read image {}: {}".format(path, e))
+            return None
+
+        image = self._images.get(key)
+        if image is not None:
+            return image
+
+        # only the header is read to get the size
+        reader = QtGui.QImageReader(path)
+        size = reader.size()
+        if not reader.canRead() or not size.isValid():
+            return None
+
+        image = CachedImage(key, path, size)
+        self._images[key] = image
+        return image
+
+    def decode(self, image, full):
+        """
+        Requests a worker thread to decode an image.
+
+        :param image: CachedImage instance
+        :param full: decode the full resolution instead of the mipmaps
+        """
+
+        self._decoder.decode(image.key(), image.path(), full)
+
+    def touch(self, image):
+        """
+        Marks a full resolution image as recently used.
+
+        :param image: CachedImage instance
+        """
+
+        if image.key() in self._full_images:
+            self._full_images.move_to_end(image.key())
+
+    def _decodedSlot(self, key, full, images):
+        """
+        Slot called when an image has been decoded.
+
+        :param key: image key
+        :param full: full resolution or mipmaps
+        :param images: list of QImage instances
+        """
+
+        image = self._images.get(key)
+        if image is None:
+            # no item displays this image anymore
+            return
+
+        if not full:
+            image._setMipmaps(images)
+            self.updated.emit(key)
+            return
+
+        self.addFullImage(image, images[0])
+        self.updated.emit(key)
+
+    def addFullImage(self, image, full_image, recent=True):
+        """
+        Sets the full resolution version of an image, within the memory budget.
+
+        :param image: CachedImage instance
+        :param full_image: QImage instance
+        :param recent: marks the image as the most recently used, otherwise
+        as the least recently used
+        """
+
+        image._setFullPixmap(full_image)
+        size = image.size()
+        if size.width() * size.height() <= self._full_size_threshold:
+            # small images are never released
+            return
+        key = image.key()
+        if key not in self._full_images:
+            self._full_images[key] = image.cost()
+            self._full_size += image.cost()
+        self._full_images.move_to_end(key, last=recent)
+        self._evict(keep=key if recent else None)
+
+    def _evict(self, keep):
+        """
+        Releases the least recently used full resolution images
+        until the memory budget is respected.
+
+        :param keep: key of an image to keep
+        """
+
+        for key in list(self._full_images):
+            if self._full_size <= self._max_full_size:
+                break
+            if key == keep:
+                continue
+            self._full_size -= self._full_images.pop(key)
+            image = self._images.get(key)
+            if image is not None:
+                image._releaseFullPixmap()
+
+    def _failedSlot(self, key):
+        """
+        Slot called when an image could not be decoded.
+
+        :param key: image key
+        """
+
+        image = self._images.get(key)
+        if image is not None:
+            image._setFailed()
+            self.updated.emit(key)
+
+    def _decoderFinishedSlot(self):
+        """
+        Slot called when the decoder thread has stopped.
+        """
+
+        # an image may have been queued while the thread was stopping
+        if self._decoder.pending():
+            self._decoder.start()
+
+    @staticmethod
+    def instance():
+        """
+        Singleton to return only one instance of ImageCache.
+
+        :returns: instance of ImageCache
+        """
+
+        if not hasattr(ImageCache, "_instance"):
+            ImageCache._instance = ImageCache()
+        return ImageCache._instance
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Runs an operation (start, stop, suspend or reload) on many nodes
+with a bounded number of operations in progress at the same time.
+"""
+
+import collections
+import fnmatch
+import functools
+import re
+import time
+
+from ..qt import QtCore
+from ..node import Node
+
+import logging
+log = logging.getLogger(__name__)
+
+# operation -> (node signal emitted on completion, node status reached)
+OPERATIONS = {"start": ("started_signal", Node.started),
+              "stop": ("stopped_signal", Node.stopped),
+              "suspend": ("suspended_signal", Node.suspended),
+              "reload": ("reloaded_signal", None)}
+
+
+def select_nodes(nodes, patterns):
+    """
+    Selects nodes using patterns, a node is selected
+    if it matches at least one pattern:
+
+    /all: all the nodes
+    /regex/: regular expression on the node name
+    type:glob: glob on the node type (e.g. type:C7200)
+    server:glob: glob on the node server (e.g. server:192.168.1.*)
+    glob: glob on the node name (e.g. R*)
+
+    :param nodes: list of Node instances
+    :param patterns: list of patterns
+
+    :returns: list of selected nodes, list of patterns matching no node
+    """
+
+    matchers = []
+    for pattern in patterns:
+        if pattern == "/all":
+            matcher = lambda node: True
+        elif len(pattern) > 2 and pattern.startswith("/") and pattern.endswith("/"):
+            regex = re.compile(pattern[1:-1])
+            matcher = lambda node, regex=regex: regex.search(node.name()) is not None
+        elif pattern.startswith("type:"):
+            matcher = lambda node, glob=pattern[5:]: fnmatch.fnmatchcase(node.__class__.__name__, glob)
+        elif pattern.startswith("server:"):
+            matcher = lambda node, glob=pattern[7:]: fnmatch.fnmatchcase("{}:{}".format(node.server().host, node.server().port), glob)
+        else:
+            matcher = lambda node, glob=pattern: fnmatch.fnmatchcase(node.name(), glob)
+        matchers.append((pattern, matcher))
+
+    selected = []
+    unmatched = set(patterns)
+    for node in nodes:
+        matched = False
+        for pattern, matcher in matchers:
+            if matcher(node):
+                unmatched.discard(pattern)
+                matched = True
+        if matched:
+            selected.append(node)
+    return selected, [pattern for pattern in patterns if pattern in unmatched]
+
+
+class NodeScheduler(QtCore.QObject):
+    """
+    Runs an operation on nodes, at most max_concurrency
+    operations are waiting for a server answer at the same time.
+
+    :param operation: operation name (see OPERATIONS)
+    :param nodes: list of Node instances
+    :param max_concurrency: maximum number of operations in progress
+    :param timeout: time to wait for a node to complete the operation (in seconds)
+    """
+
+    # emitted with the list of (node name, result, duration) when all nodes are done
+    finished = QtCore.Signal(list)
+
+    def __init__(self, operation, nodes, max_concurrency=10, timeout=120):
+
+        QtCore.QObject.__init__(self)
+        self._operation = operation
+        self._signal_name, self._target_status = OPERATIONS[operation]
+        self._queue = collections.deque(nodes)
+        self._max_concurrency = max(1, max_concurrency)
+        self._timeout = timeout
+        self._running = {}  # node ID -> (node, start time, connected slots)
+        self._results = []
+        self._start_time = None
+        # nodes may complete synchronously and re-enter _schedule()
+        self._finished = False
+
+        self._timeout_timer = QtCore.QTimer(self)
+        self._timeout_timer.setInterval(1000)
+        self._timeout_timer.timeout.connect(self._checkTimeoutsSlot)
+
+    def operation(self):
+        """
+        Returns the operation run by this scheduler.
+
+        :returns: operation name
+        """
+
+        return self._operation
+
+    def elapsed(self):
+        """
+        Returns the time since the scheduler has been started.
+
+        :returns: duration in seconds
+        """
+
+        if self._start_time is None:
+            return 0.0
+        return time.time() - self._start_time
+
+    def isRunning(self):
+        """
+        Returns either operations are still pending or in progress.
+
+        :returns: boolean
+        """
+
+        return bool(self._queue or self._running)
+
+    def start(self):
+        """
+        Starts running the operation on the nodes.
+        """
+
+        self._start_time = time.time()
+        self._timeout_timer.start()
+        self._schedule()
+
+    def cancel(self):
+        """
+        Cancels the pending operations, operations
+        already in progress are not waited for anymore.
+        """
+
+        while self._queue:
+            node = self._queue.popleft()
+            self._results.append((node.name(), "cancelled", 0.0))
+        for node_id in list(self._running):
+            self._complete(node_id, "cancelled")
+
+    def _schedule(self):
+        """
+        Starts operations until the concurrency limit is reached.
+        """
+
+        while self._queue and len(self._running) < self._max_concurrency:
+            node = self._queue.popleft()
+            if not hasattr(node, self._operation) or not node.initialized():
+                self._results.append((node.name(), "not supported", 0.0))
+                continue
+            if self._target_status is not None and node.status() == self._target_status:
+                self._results.append((node.name(), "skipped", 0.0))
+                continue
+
+            slots = (functools.partial(self._completedSlot, node.id()),
+                     functools.partial(self._errorSlot, node.id()),
+                     functools.partial(self._serverErrorSlot, node.id()))
+            getattr(node, self._signal_name).connect(slots[0])
+            node.error_signal.connect(slots[1])
+            node.server_error_signal.connect(slots[2])
+            self._running[node.id()] = (node, time.time(), slots)
+            log.debug("%s: %s", self._operation, node.name())
+            getattr(node, self._operation)()
+
+        if not self.isRunning() and not self._finished:
+            self._finished = True
+            self._timeout_timer.stop()
+            self.finished.emit(self._results)
+
+    def _complete(self, node_id, result):
+        """
+        Records the result of an operation on a node.
+
+        :param node_id: node identifier
+        :param result: result description
+        """
+
+        if node_id not in self._running:
+            return
+        node, start_time, slots = self._running.pop(node_id)
+        getattr(node, self._signal_name).disconnect(slots[0])
+        node.error_signal.disconnect(slots[1])
+        node.server_error_signal.disconnect(slots[2])
+        self._results.append((node.name(), result, time.time() - start_time))
+
+    def _completedSlot(self, node_id):
+        """
+        Slot called when a node has completed the operation.
+
+        :param node_id: node identifier
+        """
+
+        self._complete(node_id, "ok")
+        self._schedule()
+
+    def _errorSlot(self, node_id, error_node_id, message):
+        """
+        Slot called when a node reports an error.
+
+        :param node_id: node identifier
+        :param error_node_id: node identifier sent with the error
+        :param message: error message
+        """
+
+        self._complete(node_id, "error: {}".format(message))
+        self._schedule()
+
+    def _serverErrorSlot(self, node_id, error_node_id, code, message):
+        """
+        Slot called when the server returns an error for a node.
+
+        :param node_id: node identifier
+        :param error_node_id: node identifier sent with the error
+        :param code: error code
+        :param message: error message
+        """
+
+        self._complete(node_id, "error: {}".format(message))
+        self._schedule()
+
+    def _checkTimeoutsSlot(self):
+        """
+        Slot called every second to give up on nodes taking too long.
+        """
+
+        now = time.time()
+        for node_id, (node, start_time, slots) in list(self._running.items()):
+            if now - start_time > self._timeout:
+                self._complete(node_id, "timeout")
+        self._schedule()
@@ -0,0 +1,254 @@
+# -*- coding: utf-8 -*-
+#
+# Copyright (C) 2014 GNS3 Technologies Inc.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+"""
+Thread to export very large scenes to PNG files without
+rendering the whole scene into a single image.
+"""
+
+import os
+import queue
+import struct
+import zlib
+
+from ..qt import QtCore, QtGui
+from .image_cache import ImageCache
+
+import logging
+log = logging.getLogger(__name__)
+
+
+class PNGStreamWriter(object):
+    """
+    Writes a PNG file row by row, only the compressed data
+    is buffered in memory.
+
+    :param fileobj: file object opened in binary mode
+    :param width: image width
+    :param height: image height
+    """
+
+    signature = b"\x89PNG\r\n\x1a\n"
+
+    # size of the compressed data written in each IDAT chunk
+    chunk_size = 1024 * 1024
+
+    def __init__(self, fileobj, width, height):
+
+        self._file = fileobj
+        self._width = width
+        self._height = height
+        self._rows = 0
+        self._compressor = zlib.compressobj(6)
+        self._buffer = []
+        self._buffer_size = 0
+
+        self._file.write(self.signature)
+        # 8-bit depth, RGB color type, default compression, filter and interlace
+        self._writeChunk(b"IHDR", struct.pack("!IIBBBBB", width, height, 8, 2, 0, 0, 0))
+
+    def _writeChunk(self, chunk_type, data):
+        """
+        Writes a PNG chunk.
+
+        :param chunk_type: chunk type (4 bytes)
+        :param data: chunk data
+        """
+
+        self._file.write(struct.pack("!I", len(data)))
+        self._file.write(chunk_type)
+        self._file.write(data)
+        self._file.write(struct.pack("!I", zlib.crc32(chunk_type + data) & 0xffffffff))
+
+    def _flush(self, final=False):
+        """
+        Writes the buffered compressed data in an IDAT chunk.
+
+        :param final: flushes the compressor as well
+        """
+
+        if final:
+            data = self._compressor.flush()
+            self._buffer.append(data)
+            self._buffer_size += len(data)
+        if self._buffer_size:
+            self._writeChunk(b"IDAT", b"".join(self._buffer))
+            self._buffer = []
+            self._buffer_size = 0
+
+    def writeRows(self, data, bytes_per_line, rows):
+        """
+        Writes RGB rows.
+
+        :param data: raw RGB888 data
+        :param bytes_per_line: number of bytes per line in data (including padding)
+        :param rows: number of rows in data
+        """
+
+        row_size = self._width * 3
+        for row in range(rows):
+            start = row * bytes_per_line
+            # each row is preceded by its filter type (0 = none)
+            compressed = self._compressor.compress(b"\x00" + data[start:start + row_size])
+            if compressed:
+                self._buffer.append(compressed)
+                self._buffer_size += len(compressed)
+                if self._buffer_size >= self.chunk_size:
+                    self._flush()
+        self._rows += rows
+
+    def close(self):
+        """
+        Finishes the PNG file.
+        """
+
+        if self._rows != self._height:
+            raise ValueError("{} rows written instead of {}".format(self._rows, self._height))
+        self._flush(final=True)
+        self._writeChunk(b"IEND", b"")
+
+
+class ScreenshotThread(QtCore.QThread):
+    """
+    Thread to export a scene to a PNG file.
+
+    The scene can only be rendered in the GUI thread: it is rendered
+    strip by strip by a timer, each strip being compressed and written
+    to the file by this thread while the next one is rendered.
+
+    :param scene: QGraphicsScene instance
+    :param path: path to the PNG file
+    :param source_rect: QRectF, area of the scene to export
+    :param scale: scale factor applied to the scene
+    :param max_strip_size: maximum size in bytes of a rendered strip
+    """
+
+    # signals to update the progress dialog.
+    error = QtCore.pyqtSignal(str, bool)
+    completed = QtCore.pyqtSignal()
+    update = QtCore.pyqtSignal(int)
+
+    def __init__(self, scene, path, source_rect, scale=1.0, max_strip_size=16 * 1024 * 1024):
+
+        QtCore.QThread.__init__(self)
+        self._is_running = False
+        self._scene = scene
+        self._path = path
+        self._source_rect = source_rect
+        self._scale = scale
+        self._width = max(1, int(source_rect.width() * scale))
+        self._height = max(1, int(source_rect.height() * scale))
+        self._strip_height = max(1, min(self._height, max_strip_size // (self._width * 4)))
+        self._next_row = 0
+
+        # only a couple of strips can wait to be written
+        self._strips = queue.Queue(maxsize=2)
+
+        # strips are rendered by the GUI thread
+        self._render_timer = QtCore.QTimer()
+        self._render_timer.timeout.connect(self._renderStripSlot)
+
+    def start(self):
+        """
+        Starts this thread and the rendering of the scene.
+        """
+
+        self._is_running = True
+        QtCore.QThread.start(self)
+        self._render_timer.start(0)
+
+    def _renderStripSlot(self):
+        """
+        Renders the next strip of the scene (called in the GUI thread).
+        """
+
+        if not self._is_running or self._next_row >= self._height:
+            self._render_timer.stop()
+            return
+
+        if self._strips.full():
+            # the writer is busy, try again later
+            return
+
+        height = min(self._strip_height, self._height - self._next_row)
+        image = QtGui.QImage(self._width, height, QtGui.QImage.Format_RGB32)
+        image.fill(QtCore.Qt.white)
+        painter = QtGui.QPainter(image)
+        painter.setRenderHint(QtGui.QPainter.Antialiasing, True)
+        painter.setRenderHint(QtGui.QPainter.TextAntialiasing, True)
+        painter.setRenderHint(QtGui.QPainter.SmoothPixmapTransform, True)
+        source = QtCore.QRectF(self._source_rect.x(),
+                               self._source_rect.y() + self._next_row / self._scale,
+                               self._width / self._scale,
+                               height / self._scale)
+        ImageCache.instance().setExporting(True)
+        try:
+            self._scene.render(painter, QtCore.QRectF(0, 0, self._width, height), source, QtCore.Qt.IgnoreAspectRatio)
+        finally:
+            ImageCache.instance().setExporting(False)
+        painter.end()
+
+        image = image.convertToFormat(QtGui.QImage.Format_RGB888)
+        data = image.constBits().asstring(image.byteCount())
+        self._strips.put((data, image.bytesPerLine(), height))
+        self._next_row += height
+
+    def run(self):
+        """
+        Thread starting point.
+        """
+
+        tmp_path = self._path + ".part"
+        written = 0
+        try:
+            with open(tmp_path, "wb") as f:
+                writer = PNGStreamWriter(f, self._width, self._height)
+                while written < self._height:
+                    if not self._is_running:
+                        break
+                    try:
+                        data, bytes_per_line, rows = self._strips.get(timeout=0.1)
+                    except queue.Empty:
+                        continue
+                    writer.writeRows(data, bytes_per_line, rows)
+                    written += rows
+                    self.update.emit(written * 100 // self._height)
+                else:
+                    writer.close()
+            if written == self._height:
+                os.replace(tmp_path, self._path)
+            else:
+                os.remove(tmp_path)
+                return
+        except (OSError, ValueError) as e:
+            log.error("could not create screenshot {}: {}".format(self._path, e))
+            self.error.emit("Could not create screenshot file {}: {}".format(self._path, e), True)
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            return
+
+        self.completed.emit()
+
+    def stop(self):
+        """
+        Stops this thread as soon as possible.
+        """
+
+        self._is_running = False
+        self._render_timer.stop()
@@ -126,7 +126,7 @@ class WebSocketClient(WebSocketBaseClient):
         Called when the connection with the server is successful.
         """
 
-        log.info("connected to {}:{}".format(self.host, self.port))
+        log.info("connected to %s:%s", self.host, self.port)
         self._connected = True
 
     def connect(self):
@@ -227,7 +227,7 @@ class WebSocketClient(WebSocketBaseClient):
         :param reason: reason (string)
         """
 
-        log.info("connection closed down: {} (code {})".format(reason, code))
+        log.info("connection closed down: %s (code %s)", reason, code)
         if self._heartbeat_timer is not None:
             self._heartbeat_timer.stop()
         self._connected = False
@@ -333,7 +333,7 @@ class WebSocketClient(WebSocketBaseClient):
         if self._fd_notifier:
             self._fd_notifier.setEnabled(False)
             self._fd_notifier = None
-        log.info("connection closed with server {}:{}".format(self.host, self.port))
+        log.info("connection closed with server %s:%s", self.host, self.port)
 
     def data_received(self, fd):
         """
@@ -418,13 +418,13 @@ class SecureWebSocketClient(WebSocketClient):
         self.check_server_version()
         data = urllib.parse.urlencode({'name': self._auth_user, 'password': self._auth_password}).encode('utf-8')
         f = self.opener.open(self.login_url, data, socket._GLOBAL_DEFAULT_TIMEOUT)
-        log.debug('login result: {}'.format(f.read()))
+        log.debug('login result: %s', f.read())
 
         self._connect()
         log.debug(self.sock)
 
         self._tunnel = tunnel.Tunnel(self.host, 22, username='root', client_key=self._ssh_pkey)
-        log.debug('tunnel status: {}'.format(self._tunnel.is_connected()))
+        log.debug('tunnel status: %s', self._tunnel.is_connected())
 
     @property
     def handshake_headers(self):
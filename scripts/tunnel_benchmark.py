@@ -0,0 +1,280 @@
+"""
+Benchmark of the SSH tunnel used to reach cloud servers (gns3/tunnel).
+
+A local paramiko SSH server stands in for a cloud server, it accepts
+any public key and supports 'direct-tcpip' channels. Echo servers are
+the tunnel targets. N endpoints with M concurrent connections each are
+driven with either bulk or interactive traffic and the throughput,
+latency percentiles and thread counts are reported.
+
+Example:
+    python scripts/tunnel_benchmark.py --endpoints 4 --connections 8 --pattern both
+"""
+
+import argparse
+import os
+import select
+import selectors
+import socket
+import sys
+import threading
+import time
+from io import StringIO
+
+import paramiko
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from gns3.tunnel.tunnel import Tunnel
+
+
+class StandInServer(paramiko.ServerInterface):
+    """
+    SSH server accepting any public key and 'direct-tcpip' channels.
+    """
+
+    def __init__(self):
+        self.destinations = {}
+
+    def get_allowed_auths(self, username):
+        return "publickey"
+
+    def check_auth_publickey(self, username, key):
+        return paramiko.AUTH_SUCCESSFUL
+
+    def check_channel_request(self, kind, chanid):
+        if kind == "session":
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_direct_tcpip_request(self, chanid, origin, destination):
+        self.destinations[chanid] = destination
+        return paramiko.OPEN_SUCCEEDED
+
+
+def forward_channel(chan, destination):
+    """
+    Relays a server side channel to its destination (stand-in only).
+    """
+
+    try:
+        sock = socket.create_connection(destination)
+    except OSError:
+        chan.close()
+        return
+    try:
+        while True:
+            readable, _, _ = select.select([chan, sock], [], [])
+            if chan in readable:
+                data = chan.recv(65536)
+                if not data:
+                    break
+                sock.sendall(data)
+            if sock in readable:
+                data = sock.recv(65536)
+                if not data:
+                    break
+                chan.sendall(data)
+    except OSError:
+        pass
+    finally:
+        chan.close()
+        sock.close()
+
+
+def run_ssh_server(listener, host_key):
+    """
+    Accepts SSH connections and forwards their channels.
+    """
+
+    while True:
+        client, _ = listener.accept()
+        transport = paramiko.Transport(client)
+        # the transport is a thread, it is not counted as a tunnel thread
+        transport.name = "bench-sshd-transport"
+        transport.add_server_key(host_key)
+        server = StandInServer()
+        transport.start_server(server=server)
+
+        def accept_channels(transport=transport, server=server):
+            while transport.is_active():
+                chan = transport.accept(1)
+                if chan is None:
+                    continue
+                destination = server.destinations.pop(chan.get_id(), None)
+                if destination is not None:
+                    threading.Thread(target=forward_channel,
+                                     args=(chan, destination),
+                                     name="bench-sshd-channel",
+                                     daemon=True).start()
+        threading.Thread(target=accept_channels, name="bench-sshd-accept", daemon=True).start()
+
+
+def run_echo_servers(listeners):
+    """
+    Echo servers for all the endpoints, in one thread.
+    """
+
+    selector = selectors.DefaultSelector()
+    for listener in listeners:
+        listener.setblocking(False)
+        selector.register(listener, selectors.EVENT_READ, None)
+    while True:
+        for key, _ in selector.select():
+            if key.data is None:
+                client, _ = key.fileobj.accept()
+                client.setblocking(True)
+                selector.register(client, selectors.EVENT_READ, client)
+                continue
+            client = key.data
+            try:
+                data = client.recv(65536)
+            except OSError:
+                data = b""
+            if not data:
+                selector.unregister(client)
+                client.close()
+                continue
+            client.sendall(data)
+
+
+def bulk_client(address, size, results):
+    sock = socket.create_connection(address)
+    payload = os.urandom(64 * 1024)
+    start = time.time()
+
+    def send():
+        remaining = size
+        while remaining > 0:
+            chunk = payload[:min(remaining, len(payload))]
+            sock.sendall(chunk)
+            remaining -= len(chunk)
+    sender = threading.Thread(target=send, name="bench-client-sender", daemon=True)
+    sender.start()
+
+    received = 0
+    while received < size:
+        data = sock.recv(1024 * 1024)
+        if not data:
+            break
+        received += len(data)
+    elapsed = time.time() - start
+    sock.close()
+    results.append((received, elapsed))
+
+
+def interactive_client(address, messages, message_size, results):
+    sock = socket.create_connection(address)
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    message = b"x" * message_size
+    for _ in range(messages):
+        start = time.time()
+        sock.sendall(message)
+        received = 0
+        while received < message_size:
+            data = sock.recv(message_size - received)
+            if not data:
+                sock.close()
+                return
+            received += len(data)
+        results.append(time.time() - start)
+    sock.close()
+
+
+def percentile(values, percent):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    index = min(len(values) - 1, int(round(percent / 100.0 * (len(values) - 1))))
+    return values[index]
+
+
+def tunnel_threads():
+    """
+    Returns the number of threads which are not part of the benchmark harness.
+    """
+
+    return len([thread for thread in threading.enumerate() if not thread.name.startswith("bench-")])
+
+
+def run_clients(target, args_list):
+    threads = [threading.Thread(target=target, args=args, name="bench-client") for args in args_list]
+    peak = 0
+    for thread in threads:
+        thread.start()
+    while any(thread.is_alive() for thread in threads):
+        peak = max(peak, tunnel_threads())
+        time.sleep(0.05)
+    return peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SSH tunnel throughput and latency benchmark")
+    parser.add_argument("--endpoints", type=int, default=4, help="number of tunnel endpoints")
+    parser.add_argument("--connections", type=int, default=4, help="concurrent connections per endpoint")
+    parser.add_argument("--pattern", choices=("bulk", "interactive", "both"), default="both")
+    parser.add_argument("--bulk-size", type=float, default=16, help="MB echoed by each bulk connection")
+    parser.add_argument("--messages", type=int, default=500, help="messages sent by each interactive connection")
+    parser.add_argument("--message-size", type=int, default=64, help="size of the interactive messages")
+    args = parser.parse_args()
+
+    host_key = paramiko.RSAKey.generate(2048)
+    client_key = paramiko.RSAKey.generate(2048)
+    client_key_data = StringIO()
+    client_key.write_private_key(client_key_data)
+
+    ssh_listener = socket.socket()
+    ssh_listener.bind(("127.0.0.1", 0))
+    ssh_listener.listen(5)
+    threading.Thread(target=run_ssh_server, args=(ssh_listener, host_key), name="bench-sshd", daemon=True).start()
+
+    echo_listeners = []
+    for _ in range(args.endpoints):
+        listener = socket.socket()
+        listener.bind(("127.0.0.1", 0))
+        listener.listen(128)
+        echo_listeners.append(listener)
+    threading.Thread(target=run_echo_servers, args=(echo_listeners,), name="bench-echo", daemon=True).start()
+
+    threads_before = tunnel_threads()
+    tunnel = Tunnel("127.0.0.1", ssh_listener.getsockname()[1], username="bench", client_key=client_key_data.getvalue())
+    endpoints = [tunnel.add_endpoint(*listener.getsockname()) for listener in echo_listeners]
+    addresses = [endpoint.get()[0] for endpoint in endpoints]
+    print("{} endpoints, {} connections each".format(args.endpoints, args.connections))
+
+    if args.pattern in ("bulk", "both"):
+        size = int(args.bulk_size * 1024 * 1024)
+        results = []
+        start = time.time()
+        peak = run_clients(bulk_client, [(address, size, results) for address in addresses for _ in range(args.connections)])
+        elapsed = time.time() - start
+        total = sum(received for received, _ in results)
+        print("bulk: {:.1f} MB echoed in {:.2f}s, {:.1f} MB/s each way, peak threads {}".format(total / 1048576.0,
+                                                                                                 elapsed,
+                                                                                                 total / 1048576.0 / elapsed,
+                                                                                                 peak))
+
+    if args.pattern in ("interactive", "both"):
+        latencies = []
+        start = time.time()
+        peak = run_clients(interactive_client, [(address, args.messages, args.message_size, latencies)
+                                                for address in addresses for _ in range(args.connections)])
+        elapsed = time.time() - start
+        print("interactive: {} round trips in {:.2f}s, latency p50 {:.2f}ms p90 {:.2f}ms p99 {:.2f}ms max {:.2f}ms, peak threads {}".format(
+            len(latencies),
+            elapsed,
+            percentile(latencies, 50) * 1000,
+            percentile(latencies, 90) * 1000,
+            percentile(latencies, 99) * 1000,
+            max(latencies or [0]) * 1000,
+            peak))
+
+    for endpoint in endpoints:
+        print("{}: {}".format(endpoint.getId(), endpoint.stats()))
+    for endpoint in endpoints:
+        tunnel.remove_endpoint(endpoint)
+    tunnel.disconnect()
+    print("threads (excluding the benchmark harness): {} before, {} after".format(threads_before, tunnel_threads()))
+
+
+if __name__ == "__main__":
+    main()
@@ -9,6 +9,7 @@ from gns3.cloud.rackspace_ctrl import RackspaceCtrl
 from gns3.cloud.exceptions import OverLimit, BadRequest, ServiceUnavailable
 from gns3.cloud.exceptions import Unauthorized, ApiError, KeyPairExists
 from gns3.cloud.exceptions import ItemNotFound
+from gns3.cloud.image_cache import ImageCache
 
 
 RACKSPACE_VALID_CREDENTIALS_RESPONSE = {
@@ -311,14 +312,34 @@ class TestRackspaceCtrl(unittest.TestCase):
         ])
         self.ctrl.storage_driver.create_container = mock.MagicMock(return_value=mock_container)
 
-        mock_container.get_object = mock.MagicMock(
-            return_value=MockStorageObject('', bytes(test_data_hash, 'utf8')))
+        # the hash is downloaded with the storage driver of the upload
+        self.ctrl.storage_driver.download_object_as_stream = mock.MagicMock(
+            return_value=iter([bytes(test_data_hash, 'utf8')]))
 
         return_value = self.ctrl.upload_file(test_file.name, 'test_folder/test.txt')
 
+        self.ctrl.storage_driver.get_object.assert_called_once_with(mock_container.name, 'test_folder/test.txt.md5')
         self.assertFalse(self.ctrl.storage_driver.upload_object_via_stream.called)
         self.assertEqual(return_value, False)
 
+    def test_upload_file__container_listed_once(self):
+        self.ctrl.storage_driver = mock.MagicMock()
+        mock_container = mock.MagicMock()
+        mock_container.list_objects = mock.MagicMock(return_value=[])
+        self.ctrl.storage_driver.create_container = mock.MagicMock(return_value=mock_container)
+
+        test_file = tempfile.NamedTemporaryFile()
+        with test_file.file as f:
+            f.write(b'abcdef')
+
+        self.assertEqual(self.ctrl.upload_file(test_file.name, 'images/test.img'), True)
+        self.assertEqual(self.ctrl.upload_file(test_file.name, 'images/test.img'), False)
+        self.assertEqual(self.ctrl.upload_file(test_file.name, 'images/other.img'), True)
+
+        self.assertEqual(mock_container.list_objects.call_count, 1)
+        self.assertFalse(mock_container.get_object.called)
+        self.assertEqual(self.ctrl.find_storage_image_names(['other.img']), {'other.img': 'images/other.img'})
+
     def test_download_file__exists__same_hash(self):
         test_data = b'abcdefghi'
         test_data_hash = hashlib.md5(test_data).hexdigest()
@@ -345,7 +366,8 @@ class TestRackspaceCtrl(unittest.TestCase):
 
     def test_download_file__exists__different_hash(self):
         test_data = b'abcdefghij'
-        test_data_hash = 'some_garbage_hash'
+        cloud_data = b'klmnopqrst'
+        test_data_hash = hashlib.md5(cloud_data).hexdigest()
         test_file = tempfile.NamedTemporaryFile()
         with test_file.file as f:
             f.write(test_data)
@@ -354,8 +376,7 @@ class TestRackspaceCtrl(unittest.TestCase):
         mock_container = mock.MagicMock()
         self.ctrl.storage_driver.get_container = mock.MagicMock(return_value=mock_container)
 
-        file_object = MockStorageObject('test_file.txt')
-        file_object.download = mock.MagicMock()
+        file_object = MockStorageObject('test_file.txt', cloud_data)
         file_hash_object = MockStorageObject('test_file.txt', bytes(test_data_hash, 'utf8'))
 
         mock_container.get_object = lambda name: {
@@ -365,7 +386,32 @@ class TestRackspaceCtrl(unittest.TestCase):
 
         self.ctrl.download_file('test_file.txt', test_file.name)
 
-        file_object.download.assert_called_once_with(test_file.name)
+        with open(test_file.name, 'rb') as f:
+            self.assertEqual(f.read(), cloud_data)
+        temp_files = [name for name in os.listdir(os.path.dirname(test_file.name))
+                      if name.startswith(os.path.basename(test_file.name) + '.') and name.endswith('.download')]
+        self.assertEqual(temp_files, [])
+
+    def test_download_file__contents(self):
+        cloud_data = b'abcdefghij' * 1000
+
+        self.ctrl.storage_driver = mock.MagicMock()
+        mock_container = mock.MagicMock()
+        self.ctrl.storage_driver.get_container = mock.MagicMock(return_value=mock_container)
+
+        file_object = MockStorageObject('test_file.txt', cloud_data)
+        file_hash_object = MockStorageObject('test_file.txt.md5', bytes('some_garbage_hash', 'utf8'))
+
+        mock_container.get_object = lambda name: {
+            'test_file.txt': file_object,
+            'test_file.txt.md5': file_hash_object
+        }[name]
+
+        self.assertRaises(ApiError, self.ctrl.download_file, 'test_file.txt')
+
+        file_object = MockStorageObject('test_file.txt', cloud_data)
+        file_hash_object = MockStorageObject('test_file.txt.md5', bytes(hashlib.md5(cloud_data).hexdigest(), 'utf8'))
+        self.assertEqual(self.ctrl.download_file('test_file.txt').read(), cloud_data)
 
     def test_find_storage_image_names(self):
         self.ctrl.storage_driver = mock.MagicMock()
@@ -402,6 +448,17 @@ class TestRackspaceCtrl(unittest.TestCase):
 
         self.assertRaises(Exception, self.ctrl.find_storage_image_names, ['test_image_1.image', 'test_image_2.img'])
 
+    def test_find_storage_image_names__duplicated_without_hash(self):
+        self.ctrl.storage_driver = mock.MagicMock()
+        mock_container = mock.MagicMock()
+        self.ctrl.storage_driver.get_container = mock.MagicMock(return_value=mock_container)
+        mock_container.list_objects = mock.MagicMock(return_value=[
+            MockStorageObject('images/IOS/test_image_1.image'),
+            MockStorageObject('images/IOU/test_image_1.image'),
+        ])
+
+        self.assertRaises(Exception, self.ctrl.find_storage_image_names, ['test_image_1.image'])
+
 
 class TestRackspaceCtrlDriver(unittest.TestCase):
 
@@ -510,5 +567,31 @@ class TestRackspaceCtrlDriver(unittest.TestCase):
         self.assertEqual({'foo', 'foo2', 'foo3', 'foo4'}, set(images.values()))
 
 
+
+class TestImageCache(unittest.TestCase):
+
+    def test_get_links_cached_image(self):
+        directory = tempfile.mkdtemp()
+        image = os.path.join(directory, 'c7200.image')
+        with open(image, 'wb') as f:
+            f.write(b'image data')
+        image_hash = hashlib.md5(b'image data').hexdigest()
+
+        cache = ImageCache(os.path.join(directory, '.cache'))
+        self.assertFalse(cache.get(image_hash, os.path.join(directory, 'copy.image')))
+        cache.add(image, image_hash)
+
+        destination = os.path.join(directory, 'IOS', 'copy.image')
+        os.makedirs(os.path.dirname(destination))
+        self.assertTrue(cache.get(image_hash, destination))
+        self.assertTrue(os.path.samefile(image, destination))
+
+        # entries of the images deleted are removed when the cache is opened
+        os.remove(image)
+        os.remove(destination)
+        cache = ImageCache(os.path.join(directory, '.cache'))
+        self.assertFalse(os.path.exists(cache.path(image_hash)))
+
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,58 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+from unittest import mock
+
+import os
+import tempfile
+
+from gns3.console_capture import ConsoleCapture
+
+
+class TestConsoleCapture(TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.capture = ConsoleCapture(max_bytes=64, backup_count=2, flush_interval=0.01)
+        self.capture.setEnabled(True)
+
+    def tearDown(self):
+        self.capture.stop()
+        self.tmpdir.cleanup()
+
+    def _capture(self, name, lines):
+        with mock.patch.object(ConsoleCapture, "directory", return_value=self.tmpdir.name):
+            session = self.capture.open(name, "127.0.0.1", 2000)
+        for line in lines:
+            session.write(line)
+        session.close()
+        self.capture.stop()
+        return session
+
+    def test_capture_rotation(self):
+        session = self._capture("R1", [("line %d\r\n" % i).encode() for i in range(20)])
+        self.assertTrue(os.path.isfile(session.path()))
+        self.assertTrue(os.path.isfile(session.path() + ".1"))
+        self.assertLessEqual(os.path.getsize(session.path()), 64)
+        index = ConsoleCapture.loadIndex(self.tmpdir.name)
+        self.assertEqual(index["R1.log"]["node"], "R1")
+        self.assertIn("end", index["R1.log"])
+
+    def test_search(self):
+        self._capture("R1", [b"booting\r\n", b"%SYS-5-RESTART\r\n"])
+        self._capture("R2", [b"booting\r\n"])
+        results = list(self.capture.search("RESTART", directory=self.tmpdir.name))
+        self.assertEqual(results, [("R1", "R1.log", 2, "%SYS-5-RESTART")])
+        results = list(self.capture.search("booting", nodes={"R2"}, directory=self.tmpdir.name))
+        self.assertEqual(len(results), 1)
+        self.assertEqual(results[0][0], "R2")
+
+    def test_shared_log_file(self):
+        with mock.patch.object(ConsoleCapture, "directory", return_value=self.tmpdir.name):
+            first = self.capture.open("R1", "127.0.0.1", 2000)
+            second = self.capture.open("R1", "127.0.0.1", 2000)
+        first.write(b"first\r\n")
+        first.close()
+        second.write(b"second\r\n")
+        second.close()
+        self.capture.stop()
+        with open(first.path(), "rb") as f:
+            self.assertEqual(f.read(), b"first\r\nsecond\r\n")
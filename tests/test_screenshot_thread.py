@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+import io
+import struct
+import zlib
+from unittest import TestCase
+
+from gns3.utils.screenshot_thread import PNGStreamWriter
+
+
+class TestPNGStreamWriter(TestCase):
+
+    def _chunks(self, data):
+        offset = len(PNGStreamWriter.signature)
+        while offset < len(data):
+            length, = struct.unpack("!I", data[offset:offset + 4])
+            chunk_type = data[offset + 4:offset + 8]
+            chunk_data = data[offset + 8:offset + 8 + length]
+            crc, = struct.unpack("!I", data[offset + 8 + length:offset + 12 + length])
+            self.assertEqual(crc, zlib.crc32(chunk_type + chunk_data) & 0xffffffff)
+            yield chunk_type, chunk_data
+            offset += 12 + length
+
+    def test_write_rows(self):
+        f = io.BytesIO()
+        writer = PNGStreamWriter(f, 2, 3)
+        # 2 pixels per row padded to 8 bytes per line
+        writer.writeRows(b"\x01\x02\x03\x04\x05\x06\x00\x00" * 2, 8, 2)
+        writer.writeRows(b"\x07\x08\x09\x0a\x0b\x0c\x00\x00", 8, 1)
+        writer.close()
+
+        data = f.getvalue()
+        self.assertTrue(data.startswith(PNGStreamWriter.signature))
+        chunks = list(self._chunks(data))
+        self.assertEqual(chunks[0][0], b"IHDR")
+        self.assertEqual(struct.unpack("!II", chunks[0][1][:8]), (2, 3))
+        self.assertEqual(chunks[-1], (b"IEND", b""))
+        pixels = zlib.decompress(b"".join(chunk_data for chunk_type, chunk_data in chunks if chunk_type == b"IDAT"))
+        self.assertEqual(pixels, b"\x00\x01\x02\x03\x04\x05\x06" * 2 + b"\x00\x07\x08\x09\x0a\x0b\x0c")
+
+    def test_missing_rows(self):
+        writer = PNGStreamWriter(io.BytesIO(), 1, 2)
+        writer.writeRows(b"\x00\x00\x00\x00", 4, 1)
+        self.assertRaises(ValueError, writer.close)
@@ -1,5 +1,6 @@
 # -*- coding: utf-8 -*-
 from unittest import TestCase
+from unittest import mock
 
 from gns3.topology import Topology
 from gns3.main_window import MainWindow
@@ -103,3 +104,50 @@ class TestTopology(TestCase):
         self.assertEqual(len(instances), 2)
         self.assertEqual(instances[0].name, 'Foo Instance')
         self.assertEqual(instances[1].name, 'Another Foo Instance')
+
+    def _make_node_item(self, node_id):
+        node_item = mock.MagicMock()
+        node_item.node.return_value.id.return_value = node_id
+        return node_item
+
+    def test_node_item_registry(self):
+        node_item = self._make_node_item(42)
+        self.t.addNodeItem(node_item)
+        self.assertIs(self.t.getNodeItem(42), node_item)
+        self.assertEqual(self.t.nodeItems(), [node_item])
+        self.t.removeNode(node_item.node())
+        self.assertIsNone(self.t.getNodeItem(42))
+        self.assertEqual(self.t.nodeItems(), [])
+
+    def test_link_item_registry(self):
+        source_item = self._make_node_item(1)
+        destination_item = self._make_node_item(2)
+        self.t.addNodeItem(source_item)
+        self.t.addNodeItem(destination_item)
+        link_item = mock.MagicMock()
+        link_item.link.return_value.id.return_value = 7
+        link_item.sourceItem.return_value = source_item
+        link_item.destinationItem.return_value = destination_item
+        self.t.addLinkItem(link_item)
+        self.assertIs(self.t.getLinkItem(7), link_item)
+        self.assertEqual(self.t.linkItems(1), [link_item])
+        self.assertEqual(self.t.linkItems(2), [link_item])
+        self.t.removeLink(link_item.link())
+        self.assertIsNone(self.t.getLinkItem(7))
+        self.assertEqual(self.t.linkItems(), [])
+        self.assertEqual(self.t.linkItems(1), [])
+
+    def test_dump_node_does_not_save_config(self):
+        node = mock.MagicMock()
+        node.dump.return_value = {"id": 3}
+        self.assertEqual(self.t.dumpNode(node), {"id": 3})
+        self.assertFalse(node.saveConfig.called)
+
+    def test_dump_without_saving_configs(self):
+        node = mock.MagicMock()
+        node.dump.return_value = {"id": 3}
+        self.t._nodes = [node]
+        self.t.dump(include_gui_data=False, save_configs=False)
+        self.assertFalse(node.saveConfig.called)
+        self.t.dump(include_gui_data=False)
+        self.assertTrue(node.saveConfig.called)
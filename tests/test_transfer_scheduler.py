@@ -0,0 +1,240 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+from unittest import mock
+import hashlib
+import io
+import json
+import os
+import tempfile
+import threading
+
+from gns3.cloud.transfer_scheduler import TransferScheduler, TransferCancelled, ProgressFile
+from gns3.cloud.segmented_transfer import SegmentedUpload, SegmentedDownload, blob_prefix
+from gns3.cloud.project_sync import ProjectUpload, ProjectDownload, block_name
+
+
+class FakeProvider(object):
+    def __init__(self):
+        self.sessions = []
+
+    def new_storage_driver(self):
+        session = object()
+        self.sessions.append(session)
+        return session
+
+
+def upload(data, failures=0):
+    attempts = []
+
+    def function(storage_driver, progress, cancelled):
+        attempts.append(storage_driver)
+        file = ProgressFile(io.BytesIO(data), progress, cancelled)
+        while file.read(1000):
+            if len(attempts) <= failures:
+                raise OSError("connection reset")
+        return True
+    return function
+
+
+class TestTransferScheduler(TestCase):
+    def test_parallel_transfers_progress(self):
+        provider = FakeProvider()
+        progress = []
+        scheduler = TransferScheduler(provider, max_workers=3, backoff=0,
+                                      progress_callback=lambda transferred, total: progress.append((transferred, total)))
+        for size in (5000, 7000, 3000, 9000):
+            scheduler.add("file", size, upload(b"x" * size))
+        transfers = scheduler.run()
+
+        self.assertEqual([transfer.result for transfer in transfers], [True] * 4)
+        self.assertEqual(progress[-1], (24000, 24000))
+        self.assertEqual(scheduler.transferred(), 24000)
+        self.assertLessEqual(len(provider.sessions), 3)
+
+    def test_retry_then_fail(self):
+        scheduler = TransferScheduler(FakeProvider(), retries=2, backoff=0)
+        retried = scheduler.add("retried", 4000, upload(b"x" * 4000, failures=2))
+        failed = scheduler.add("failed", 4000, upload(b"x" * 4000, failures=10))
+        self.assertRaises(OSError, scheduler.run)
+        self.assertEqual(retried.attempts, 3)
+        self.assertEqual(retried.transferred, 4000)
+        self.assertEqual(failed.attempts, 3)
+        self.assertEqual(failed.transferred, 0)
+
+    def test_cancel(self):
+        scheduler = TransferScheduler(FakeProvider(), max_workers=1)
+        started = threading.Event()
+
+        def blocked(storage_driver, progress, cancelled):
+            started.set()
+            cancelled.wait()
+            ProgressFile(io.BytesIO(b"x"), progress, cancelled).read()
+
+        scheduler.add("blocked", 1, blocked)
+        scheduler.add("queued", 1, upload(b"x"))
+        threading.Thread(target=lambda: started.wait() and scheduler.cancel()).start()
+        self.assertRaises(TransferCancelled, scheduler.run)
+        self.assertEqual(scheduler.transferred(), 0)
+
+
+class MemoryStorageDriver(object):
+    """
+    Stands in for a libcloud storage driver, objects are kept in a dictionary.
+    """
+
+    class Object(object):
+        def __init__(self, driver, name):
+            self.driver = driver
+            self.name = name
+
+        def as_stream(self):
+            return iter([self.driver.objects[self.name]])
+
+    def __init__(self, objects, fail_on=None):
+        self.objects = objects
+        self.fail_on = fail_on
+        self.uploaded = []
+
+    def upload_object_via_stream(self, iterator, container, object_name):
+        data = b"".join(chunk if isinstance(chunk, bytes) else chunk.encode() for chunk in iterator)
+        if object_name == self.fail_on:
+            raise OSError("connection reset")
+        self.objects[object_name] = data
+        self.uploaded.append(object_name)
+
+    def get_object(self, container_name, object_name):
+        return self.Object(self, object_name)
+
+    def download_object_as_stream(self, obj):
+        data = self.objects[obj.name]
+        return iter([data[i:i + 100] for i in range(0, len(data), 100)])
+
+
+class MemoryIndex(object):
+    def __init__(self, driver):
+        self.container = mock.Mock()
+        self.container.name = "GNS3"
+        self.container.get_object = lambda name: MemoryStorageDriver.Object(driver, name)
+        self.names = set()
+
+    def __contains__(self, name):
+        return name in self.names
+
+    def add(self, name, md5=None):
+        self.names.add(name)
+
+
+class MemoryProvider(object):
+    def __init__(self, driver):
+        self.driver = driver
+        self.index = MemoryIndex(driver)
+        self.manifests = {}
+
+    def new_storage_driver(self):
+        return self.driver
+
+    def container_index(self, create=False):
+        return self.index
+
+    def put_manifest(self, storage_driver, container, object_name, segments_prefix):
+        self.manifests[object_name] = segments_prefix
+
+
+class TestSegmentedTransfer(TestCase):
+    def test_resume_upload_and_download(self):
+        data = os.urandom(10000)
+        directory = tempfile.mkdtemp()
+        path = os.path.join(directory, "image.img")
+        with open(path, "wb") as f:
+            f.write(data)
+        file_hash = hashlib.md5(data).hexdigest()
+
+        driver = MemoryStorageDriver({}, fail_on=blob_prefix(file_hash) + "00000003")
+        provider = MemoryProvider(driver)
+        scheduler = TransferScheduler(provider, retries=0, journal_dir=directory)
+        scheduler.add_segmented("images/image.img", SegmentedUpload(provider, path, "images/image.img", file_hash,
+                                                                    directory, segment_size=3000))
+        self.assertRaises(OSError, scheduler.run)
+        self.assertNotIn("images/image.img", provider.manifests)
+
+        # the parts already uploaded are not uploaded again
+        driver.fail_on = None
+        driver.uploaded = []
+        scheduler = TransferScheduler(provider, journal_dir=directory)
+        scheduler.add_segmented("images/image.img", SegmentedUpload(provider, path, "images/image.img", file_hash,
+                                                                    directory, segment_size=3000))
+        scheduler.run()
+        self.assertEqual(driver.uploaded, [blob_prefix(file_hash) + "00000003",
+                                           "blobs/{}.segments".format(file_hash),
+                                           "images/image.img.md5"])
+        self.assertEqual(scheduler.transferred(), len(data))
+        self.assertEqual(provider.manifests["images/image.img"], blob_prefix(file_hash))
+
+        # the same content under another name is not uploaded again
+        driver.uploaded = []
+        scheduler = TransferScheduler(provider, journal_dir=directory)
+        scheduler.add_segmented("images/copy.img", SegmentedUpload(provider, path, "images/copy.img", file_hash,
+                                                                   directory, segment_size=3000, complete=True))
+        scheduler.run()
+        self.assertEqual(driver.uploaded, ["images/copy.img.md5"])
+        self.assertEqual(provider.manifests["images/copy.img"], blob_prefix(file_hash))
+
+        segments = json.loads(driver.objects["blobs/{}.segments".format(file_hash)].decode())
+        destination = os.path.join(directory, "downloaded.img")
+        scheduler = TransferScheduler(provider, max_workers=2)
+        scheduler.add_segmented("images/image.img", SegmentedDownload(provider, "images/image.img", destination, segments))
+        scheduler.run()
+        with open(destination, "rb") as f:
+            self.assertEqual(f.read(), data)
+        self.assertFalse(os.path.exists(destination + ".journal"))
+
+
+class TestProjectSync(TestCase):
+    def test_incremental_upload_and_download(self):
+        directory = tempfile.mkdtemp()
+        project_dir = os.path.join(directory, "project")
+        os.makedirs(os.path.join(project_dir, "configs"))
+        project_path = os.path.join(project_dir, "project.gns3")
+        config_path = os.path.join(project_dir, "configs", "r1.cfg")
+        with open(project_path, "wb") as f:
+            f.write(b"{}")
+        with open(config_path, "wb") as f:
+            f.write(os.urandom(2500))
+
+        driver = MemoryStorageDriver({})
+        provider = MemoryProvider(driver)
+        scheduler = TransferScheduler(provider)
+        ProjectUpload(provider, project_path, directory, block_size=1000).add_to(scheduler)
+        scheduler.run()
+        self.assertEqual(len(driver.uploaded), 5)
+
+        # only the modified block and the manifest are uploaded again
+        with open(config_path, "r+b") as f:
+            f.seek(1500)
+            f.write(b"changed")
+        driver.uploaded = []
+        scheduler = TransferScheduler(provider)
+        ProjectUpload(provider, project_path, directory, block_size=1000).add_to(scheduler)
+        scheduler.run()
+        with open(config_path, "rb") as f:
+            f.seek(1000)
+            self.assertEqual(driver.uploaded, [block_name(hashlib.md5(f.read(1000)).hexdigest()),
+                                               "projects/project.gns3.sync.json"])
+
+        manifest = json.loads(driver.objects["projects/project.gns3.sync.json"].decode())
+        destination = tempfile.mkdtemp()
+        scheduler = TransferScheduler(provider)
+        ProjectDownload(provider, manifest, destination).add_to(scheduler)
+        scheduler.run()
+        for path in (project_path, config_path):
+            with open(path, "rb") as f, open(os.path.join(destination, os.path.relpath(path, directory)), "rb") as g:
+                self.assertEqual(f.read(), g.read())
+
+    def test_download_outside_of_destination(self):
+        destination = tempfile.mkdtemp()
+        manifest = {"block_size": 1000, "directories": ["project"],
+                    "files": {"project/../../evil.cfg": {"size": 0, "mtime": 0, "md5": "", "blocks": []}}}
+        self.assertRaises(OSError, ProjectDownload(MemoryProvider(MemoryStorageDriver({})), manifest,
+                                                   destination).add_to, TransferScheduler(FakeProvider()))
+        self.assertEqual(os.listdir(destination), [])
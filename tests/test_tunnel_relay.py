@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+import socket
+import threading
+
+from gns3.tunnel.endpoint import Endpoint
+from gns3.tunnel.relay import Relay
+
+
+class EchoServer(object):
+    def __init__(self):
+        self.sock = socket.socket()
+        self.sock.bind(("127.0.0.1", 0))
+        self.sock.listen(5)
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                client, _ = self.sock.accept()
+            except OSError:
+                return
+            threading.Thread(target=self._echo, args=(client,), daemon=True).start()
+
+    def _echo(self, client):
+        while True:
+            data = client.recv(65536)
+            if not data:
+                break
+            client.sendall(data)
+        client.close()
+
+
+class SocketTransport(object):
+    """
+    Stands in for a paramiko transport, channels are plain sockets.
+    """
+
+    def open_channel(self, kind, remote_address, peer_address):
+        return socket.create_connection(remote_address)
+
+
+class TestTunnelRelay(TestCase):
+    def setUp(self):
+        self.server = EchoServer()
+        self.relay = Relay(buffer_size=64 * 1024, recv_size=16 * 1024)
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        local_address = sock.getsockname()
+        sock.close()
+        self.endpoint = Endpoint(local_address, self.server.sock.getsockname(), SocketTransport(), self.relay)
+        self.endpoint.enable()
+
+    def tearDown(self):
+        self.endpoint.disable()
+        self.server.sock.close()
+
+    def _transfer(self, payload):
+        client = socket.create_connection(self.endpoint.local_address)
+        threading.Thread(target=client.sendall, args=(payload,), daemon=True).start()
+        received = bytearray()
+        while len(received) < len(payload):
+            data = client.recv(65536)
+            if not data:
+                break
+            received += data
+        client.close()
+        return bytes(received)
+
+    def test_relay_larger_than_buffers(self):
+        payload = bytes(range(256)) * 4096
+        self.assertEqual(self._transfer(payload), payload)
+        stats = self.endpoint.stats()
+        self.assertEqual(stats["connections"], 1)
+        self.assertEqual(stats["bytes_to_remote"], len(payload))
+
+    def test_concurrent_connections(self):
+        payload = b"x" * 100000
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(self._transfer(payload))) for _ in range(5)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(results, [payload] * 5)
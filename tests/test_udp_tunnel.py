@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+from unittest import TestCase
+
+import select
+import socket
+import subprocess
+import sys
+
+from gns3.tunnel.udp_tunnel import HELPER_SCRIPT, HEADER, PORT, OPEN_PORTS, OPEN, OPENED, DATA, CLOSE, FAILED
+
+
+class TestUDPTunnelHelper(TestCase):
+    """
+    Runs the helper started on the cloud servers, its frames
+    are exchanged over the pipes of a subprocess.
+    """
+
+    def setUp(self):
+        self.helper = subprocess.Popen([sys.executable, "-u", "-c", HELPER_SCRIPT],
+                                       stdin=subprocess.PIPE, stdout=subprocess.PIPE)
+        self.incoming = b""
+        # stands in for a cloud node
+        self.node = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.node.bind(("127.0.0.1", 0))
+        self.node.settimeout(5)
+
+    def tearDown(self):
+        if self.helper.poll() is None:
+            self.helper.kill()
+        self.helper.stdin.close()
+        self.helper.stdout.close()
+        self.helper.wait()
+        self.node.close()
+
+    def _write(self, data):
+        self.helper.stdin.write(data)
+        self.helper.stdin.flush()
+
+    def _frame(self, kind, flow, payload=b""):
+        return HEADER.pack(kind, flow, len(payload)) + payload
+
+    def _read_frame(self):
+        while True:
+            if len(self.incoming) >= HEADER.size:
+                kind, flow, size = HEADER.unpack_from(self.incoming)
+                if len(self.incoming) >= HEADER.size + size:
+                    payload = self.incoming[HEADER.size:HEADER.size + size]
+                    self.incoming = self.incoming[HEADER.size + size:]
+                    return kind, flow, payload
+            readable, _, _ = select.select([self.helper.stdout], [], [], 5)
+            self.assertTrue(readable, "no frame from the helper")
+            data = self.helper.stdout.raw.read(65536)
+            self.assertTrue(data, "the helper has exited")
+            self.incoming += data
+
+    def _open(self, flow, bind_port=0):
+        self._write(self._frame(OPEN, flow, OPEN_PORTS.pack(self.node.getsockname()[1], bind_port)))
+        return self._read_frame()
+
+    def test_open_and_exchange_datagrams(self):
+        kind, flow, payload = self._open(1)
+        self.assertEqual((kind, flow), (OPENED, 1))
+        helper_port = PORT.unpack(payload)[0]
+
+        # two frames in one write, the second one split over two writes
+        frames = self._frame(DATA, 1, b"first") + self._frame(DATA, 1, b"second")
+        self._write(frames[:-3])
+        self._write(frames[-3:])
+        self.assertEqual(self.node.recvfrom(65535), (b"first", ("127.0.0.1", helper_port)))
+        self.assertEqual(self.node.recvfrom(65535), (b"second", ("127.0.0.1", helper_port)))
+
+        self.node.sendto(b"reply", ("127.0.0.1", helper_port))
+        self.assertEqual(self._read_frame(), (DATA, 1, b"reply"))
+
+        # an empty datagram is a frame without payload
+        self.node.sendto(b"", ("127.0.0.1", helper_port))
+        self.assertEqual(self._read_frame(), (DATA, 1, b""))
+
+    def test_open_requested_port(self):
+        sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+
+        self.assertEqual(self._open(1, port), (OPENED, 1, PORT.pack(port)))
+        # the port is now used by the first flow
+        self.assertEqual(self._open(2, port), (FAILED, 2, b""))
+
+    def test_close_flow(self):
+        kind, _, payload = self._open(1)
+        self.assertEqual(kind, OPENED)
+        helper_port = PORT.unpack(payload)[0]
+
+        self._write(self._frame(CLOSE, 1) + self._frame(DATA, 1, b"dropped"))
+        # the helper keeps serving the other flows
+        self.assertEqual(self._open(2, helper_port), (OPENED, 2, PORT.pack(helper_port)))
+        self.node.settimeout(0.2)
+        self.assertRaises(socket.timeout, self.node.recvfrom, 65535)
+
+    def test_exit_on_end_of_input(self):
+        self.assertEqual(self._open(1)[0], OPENED)
+        self.helper.stdin.close()
+        self.assertEqual(self.helper.wait(5), 0)